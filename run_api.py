@@ -48,14 +48,18 @@ def main():
         logger.info(f"   Diff Viewer: {settings.webapp_base_url}/diff-viewer/")
 
     # Create app
-    app = create_app()
+    app = create_app(settings)
 
-    # Run server
+    # Run server (uvloop + httptools come with uvicorn[standard]; request them
+    # explicitly so a broken install fails loudly instead of silently falling
+    # back to asyncio/h11)
     uvicorn.run(
         app,
         host="0.0.0.0",
         port=8000,
         log_level="info",
+        loop="uvloop",
+        http="httptools",
     )
 
 
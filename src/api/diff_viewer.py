@@ -1,13 +1,16 @@
 """Diff viewer API endpoint for Telegram Web App."""
 
-import datetime
+import hashlib
 import logging
+import os
+import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import Optional
+from typing import AsyncIterator, Optional, Tuple
+from urllib.parse import quote
 
-import jwt
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 
 from src.bot.features.git_integration import GitError, GitIntegration
 from src.config.settings import Settings
@@ -16,13 +19,47 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Diff output is streamed to the client in chunks of this size
+DIFF_CHUNK_SIZE = 64 * 1024
+NO_CHANGES_MESSAGE = "No changes to show"
+# Starts the line reporting a git failure partway through the diff
+DIFF_ERROR_MARKER = "Diff incomplete, git error:"
 
-class DiffResponse(BaseModel):
-    """Response model for diff endpoint."""
+# Verified tokens, keyed by SHA-256 of (secret, token) so raw tokens are never
+# kept in memory. Values are (repo_path, exp, cached_at); failures are not cached.
+_TOKEN_CACHE_MAXSIZE = 1024
+_TOKEN_CACHE_TTL_SECONDS = 30.0
+_token_cache: "OrderedDict[bytes, Tuple[Path, float, float]]" = OrderedDict()
 
-    diff: str
-    repo_path: str
-    branch: Optional[str] = None
+
+def get_settings(request: Request) -> Settings:
+    """Get application settings stored on the app at startup."""
+    return request.app.state.settings
+
+
+def get_git_integration(request: Request) -> GitIntegration:
+    """Get the git integration shared by all requests."""
+    return request.app.state.git_integration
+
+
+def _resolve_and_check(raw: str, approved: str) -> Optional[str]:
+    """Resolve a repository path and check it lies within the approved directory.
+
+    Paths are resolved on every request, so a symlink or directory changed
+    since the last one is checked as it is now.
+
+    Args:
+        raw: Repository path as stored in the token
+        approved: Approved base directory
+
+    Returns:
+        Resolved repository path, or None if it is outside the approved directory
+    """
+    real = os.path.realpath(raw)
+    approved = os.path.realpath(approved)
+    if real == approved or real.startswith(approved.rstrip(os.sep) + os.sep):
+        return real
+    return None
 
 
 def generate_diff_token(repo_path: Path, secret: str, expiry_hours: int = 1) -> str:
@@ -36,10 +73,13 @@ def generate_diff_token(repo_path: Path, secret: str, expiry_hours: int = 1) ->
     Returns:
         Encoded JWT token
     """
+    import jwt
+
+    now = int(time.time())
     payload = {
         "repo_path": str(repo_path),
-        "exp": datetime.datetime.now(datetime.UTC) + datetime.timedelta(hours=expiry_hours),
-        "iat": datetime.datetime.now(datetime.UTC),
+        "iat": now,
+        "exp": now + expiry_hours * 3600,
     }
     return jwt.encode(payload, secret, algorithm="HS256")
 
@@ -57,34 +97,63 @@ def verify_diff_token(token: str, secret: str) -> Path:
     Raises:
         HTTPException: If token is invalid or expired
     """
+    key = hashlib.sha256(f"{secret}\0{token}".encode()).digest()
+    now = time.time()
+
+    cached = _token_cache.get(key)
+    if cached is not None:
+        repo_path, exp, cached_at = cached
+        if now - cached_at < _TOKEN_CACHE_TTL_SECONDS:
+            # Expiry is still enforced on cache hits
+            if exp <= now:
+                del _token_cache[key]
+                raise HTTPException(status_code=401, detail="Token expired")
+            _token_cache.move_to_end(key)
+            return repo_path
+        del _token_cache[key]
+
+    import jwt
+
     try:
-        payload = jwt.decode(token, secret, algorithms=["HS256"])
+        payload = jwt.decode(
+            token,
+            secret,
+            algorithms=["HS256"],
+            options={"require": ["exp", "repo_path"], "verify_exp": True},
+        )
         repo_path = Path(payload["repo_path"])
-        return repo_path
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.InvalidTokenError as e:
         raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
 
+    _token_cache[key] = (repo_path, float(payload["exp"]), now)
+    if len(_token_cache) > _TOKEN_CACHE_MAXSIZE:
+        _token_cache.popitem(last=False)
+
+    return repo_path
+
 
 @router.get("/diff/{token}")
-async def get_diff(token: str) -> DiffResponse:
+async def get_diff(
+    token: str,
+    settings: Settings = Depends(get_settings),
+    git_integration: GitIntegration = Depends(get_git_integration),
+) -> StreamingResponse:
     """Get git diff by token.
 
     Args:
         token: JWT token containing repository path
+        settings: Application settings
+        git_integration: Shared git integration
 
     Returns:
-        DiffResponse with git diff output
+        Plain-text git diff streamed from git's stdout, with the branch and
+        repository path in the X-Git-Branch and X-Repo-Path headers
 
     Raises:
         HTTPException: If token invalid, expired, or git operation fails
     """
-    # Get settings (in production, inject via dependency)
-    from src.config.loader import load_config
-
-    settings = load_config()
-
     if not settings.diff_viewer_secret_str:
         raise HTTPException(
             status_code=500, detail="Diff viewer not configured (missing secret)"
@@ -95,31 +164,36 @@ async def get_diff(token: str) -> DiffResponse:
 
     # Validate path is within approved directory
     try:
-        repo_path = repo_path.resolve()
-        if not repo_path.is_relative_to(settings.approved_directory):
-            raise HTTPException(status_code=403, detail="Access denied")
-    except Exception:
+        resolved = _resolve_and_check(
+            str(repo_path), str(settings.approved_directory)
+        )
+    except (OSError, ValueError):
         raise HTTPException(status_code=400, detail="Invalid repository path")
+    if resolved is None:
+        raise HTTPException(status_code=403, detail="Access denied")
+    repo_path = Path(resolved)
 
     # Get git diff
     try:
-        git_integration = GitIntegration(settings)
-
         # Get current branch
         status = await git_integration.get_status(repo_path)
         branch = status.branch
 
-        # Get diff output (raw, without emoji formatting for diff2html)
-        diff_output, _ = await git_integration.execute_git_command(
-            ["git", "diff", "--no-color"], repo_path
+        # Stream raw diff output (without emoji formatting for diff2html)
+        diff_chunks = await git_integration.stream_git_command(
+            ["git", "diff", "--no-color"], repo_path, chunk_size=DIFF_CHUNK_SIZE
         )
 
-        if not diff_output.strip():
-            diff_output = "No changes to show"
-
-        logger.info(f"Generated diff for {repo_path}, branch={branch}")
+        logger.info(f"Streaming diff for {repo_path}, branch={branch}")
 
-        return DiffResponse(diff=diff_output, repo_path=str(repo_path), branch=branch)
+        return StreamingResponse(
+            _diff_body(diff_chunks),
+            media_type="text/plain; charset=utf-8",
+            headers={
+                "X-Git-Branch": quote(branch),
+                "X-Repo-Path": quote(str(repo_path)),
+            },
+        )
 
     except GitError as e:
         logger.error(f"Git error getting diff: {e}")
@@ -127,3 +201,22 @@ async def get_diff(token: str) -> DiffResponse:
     except Exception as e:
         logger.error(f"Unexpected error getting diff: {e}")
         raise HTTPException(status_code=500, detail=f"Internal error: {str(e)}")
+
+
+async def _diff_body(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Pass diff chunks through, substituting a message for an empty diff.
+
+    A git failure after the response has started is appended to the body,
+    since the status code has already been sent.
+    """
+    empty = True
+    try:
+        async for chunk in chunks:
+            empty = False
+            yield chunk
+    except GitError as e:
+        logger.error(f"Git error streaming diff: {e}")
+        yield f"\n{DIFF_ERROR_MARKER} {e}\n".encode()
+        return
+    if empty:
+        yield NO_CHANGES_MESSAGE.encode()
@@ -1,30 +1,77 @@
 """FastAPI server for Telegram Web App endpoints."""
 
 import logging
+import os
+import re
 from pathlib import Path
+from typing import Optional
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import FileResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 
 from src.api.diff_viewer import router as diff_router
+from src.bot.features.git_integration import GitIntegration
+from src.config.settings import Settings
 
 logger = logging.getLogger(__name__)
 
+# Assets whose filename carries a content hash (e.g. app.3f2a9c1b.js) never
+# change under the same URL and can be cached forever
+_HASHED_ASSET_RE = re.compile(r"\.[0-9a-f]{8,}\.[A-Za-z0-9]+$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
 
-def create_app() -> FastAPI:
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles that sets Cache-Control on every file response.
+
+    Hashed assets are cached for a year; everything else must be revalidated
+    with the ETag, which Starlette answers with 304 when unchanged.
+    """
+
+    def file_response(
+        self,
+        full_path: "os.PathLike[str] | str",
+        stat_result: os.stat_result,
+        scope,
+        status_code: int = 200,
+    ) -> Response:
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        if _HASHED_ASSET_RE.search(os.fspath(full_path)):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        else:
+            response.headers["Cache-Control"] = REVALIDATE_CACHE_CONTROL
+        return response
+
+
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
     """Create and configure FastAPI application.
 
+    Args:
+        settings: Application settings (loaded from environment if not given)
+
     Returns:
         Configured FastAPI application
     """
+    if settings is None:
+        from src.config.loader import load_config
+
+        settings = load_config()
+
     app = FastAPI(
         title="Claude Code Telegram Bot API",
         description="Web App endpoints for Telegram bot",
         version="0.1.0",
+        default_response_class=ORJSONResponse,
     )
 
+    # Settings and git integration are created once and shared with handlers
+    app.state.settings = settings
+    app.state.git_integration = GitIntegration(settings)
+
     # Configure CORS for Telegram Web App
     app.add_middleware(
         CORSMiddleware,
@@ -32,12 +79,18 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["GET", "POST"],
         allow_headers=["*"],
+        expose_headers=["X-Git-Branch", "X-Repo-Path"],
     )
 
+    # Compress diffs and static assets; added last so it wraps CORS
+    app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
     # Mount static files for webapp
     webapp_dir = Path(__file__).parent.parent.parent / "webapp"
     if webapp_dir.exists():
-        app.mount("/static", StaticFiles(directory=str(webapp_dir)), name="static")
+        app.mount(
+            "/static", CachedStaticFiles(directory=str(webapp_dir)), name="static"
+        )
         logger.info(f"Mounted static files from {webapp_dir}")
 
     # Register API routers
@@ -49,12 +102,25 @@ def create_app() -> FastAPI:
         return {"message": "Claude Code Telegram Bot API", "status": "running"}
 
     @app.get("/diff-viewer/")
-    async def diff_viewer_app():
+    async def diff_viewer_app(request: Request):
         """Serve diff viewer Web App."""
         index_path = webapp_dir / "diff-viewer" / "index.html"
         if not index_path.exists():
             return {"error": "Diff viewer not found"}
-        return FileResponse(index_path)
+        response = FileResponse(
+            index_path,
+            headers={"Cache-Control": REVALIDATE_CACHE_CONTROL},
+            stat_result=index_path.stat(),
+        )
+        if request.headers.get("if-none-match") == response.headers.get("etag"):
+            return Response(
+                status_code=304,
+                headers={
+                    "ETag": response.headers["etag"],
+                    "Cache-Control": REVALIDATE_CACHE_CONTROL,
+                },
+            )
+        return response
 
     return app
 
@@ -63,4 +129,4 @@ if __name__ == "__main__":
     import uvicorn
 
     app = create_app()
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(app, host="0.0.0.0", port=8000, loop="uvloop", http="httptools")
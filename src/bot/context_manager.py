@@ -5,13 +5,17 @@ scoped to the specific chat thread (topic) rather than just the user.
 """
 
 from pathlib import Path
-from typing import Any, Dict, Optional, Tuple
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
 
 from telegram import Update
 from telegram.ext import ContextTypes
 
 from ..config.settings import Settings
 
+# Read-only stand-in for missing state, so getters never create entries
+_EMPTY: Mapping[str, Any] = MappingProxyType({})
+
 
 class ContextManager:
     """Manages bot context and state across topics."""
@@ -20,94 +24,98 @@ class ContextManager:
     def get_context_key(update: Update) -> str:
         """Get unique key for the current context (chat_id + thread_id)."""
         chat_id = update.effective_chat.id
-        thread_id = update.effective_message.message_thread_id if update.effective_message else None
-        
-        if thread_id:
+        msg = update.effective_message
+        thread_id = msg.message_thread_id if msg else None
+
+        if thread_id is not None:
             return f"{chat_id}:{thread_id}"
         return str(chat_id)
 
     @staticmethod
     def get_state(context: ContextTypes.DEFAULT_TYPE, key: str) -> Dict[str, Any]:
-        """Get state dictionary for the given key from chat_data."""
-        if "topic_states" not in context.chat_data:
-            context.chat_data["topic_states"] = {}
-        
-        if key not in context.chat_data["topic_states"]:
-            context.chat_data["topic_states"][key] = {}
-            
-        return context.chat_data["topic_states"][key]
+        """Get state dictionary for the given key, creating it if needed."""
+        return context.chat_data.setdefault("topic_states", {}).setdefault(key, {})
+
+    @staticmethod
+    def _read_state(context: ContextTypes.DEFAULT_TYPE, key: str) -> Mapping[str, Any]:
+        """Get state for the given key without creating it if missing."""
+        return context.chat_data.get("topic_states", _EMPTY).get(key, _EMPTY)
+
+    @classmethod
+    def _read_topic_state(
+        cls, update: Update, context: ContextTypes.DEFAULT_TYPE
+    ) -> Mapping[str, Any]:
+        """Get state for the current topic without creating it if missing."""
+        return cls._read_state(context, cls.get_context_key(update))
+
+    @classmethod
+    def get_topic_state(
+        cls, update: Update, context: ContextTypes.DEFAULT_TYPE
+    ) -> Dict[str, Any]:
+        """Get the state dictionary for the current topic, creating it if needed.
+
+        Callers that read and write several fields should hold on to the
+        returned dict instead of calling the individual getters/setters.
+        """
+        return cls.get_state(context, cls.get_context_key(update))
 
     @classmethod
     def get_current_directory(
         cls, update: Update, context: ContextTypes.DEFAULT_TYPE, settings: Settings
     ) -> Path:
         """Get current working directory for the current topic."""
-        key = cls.get_context_key(update)
-        state = cls.get_state(context, key)
-        return state.get("current_directory", settings.approved_directory)
+        return cls._read_topic_state(update, context).get(
+            "current_directory", settings.approved_directory
+        )
 
     @classmethod
     def set_current_directory(
         cls, update: Update, context: ContextTypes.DEFAULT_TYPE, path: Path
     ) -> None:
         """Set current working directory for the current topic."""
-        key = cls.get_context_key(update)
-        state = cls.get_state(context, key)
-        state["current_directory"] = path
+        cls.get_topic_state(update, context)["current_directory"] = path
 
     @classmethod
     def get_session_id(
         cls, update: Update, context: ContextTypes.DEFAULT_TYPE
     ) -> Optional[str]:
         """Get Claude session ID for the current topic."""
-        key = cls.get_context_key(update)
-        state = cls.get_state(context, key)
-        return state.get("claude_session_id")
+        return cls._read_topic_state(update, context).get("claude_session_id")
 
     @classmethod
     def set_session_id(
         cls, update: Update, context: ContextTypes.DEFAULT_TYPE, session_id: Optional[str]
     ) -> None:
         """Set Claude session ID for the current topic."""
-        key = cls.get_context_key(update)
-        state = cls.get_state(context, key)
-        state["claude_session_id"] = session_id
+        cls.get_topic_state(update, context)["claude_session_id"] = session_id
 
     @classmethod
     def get_session_started(
         cls, update: Update, context: ContextTypes.DEFAULT_TYPE
     ) -> bool:
         """Check if session is started for the current topic."""
-        key = cls.get_context_key(update)
-        state = cls.get_state(context, key)
-        return state.get("session_started", False)
+        return cls._read_topic_state(update, context).get("session_started", False)
 
     @classmethod
     def set_session_started(
         cls, update: Update, context: ContextTypes.DEFAULT_TYPE, started: bool
     ) -> None:
         """Set session started status for the current topic."""
-        key = cls.get_context_key(update)
-        state = cls.get_state(context, key)
-        state["session_started"] = started
+        cls.get_topic_state(update, context)["session_started"] = started
 
     @classmethod
     def get_pinned_message_id(
         cls, update: Update, context: ContextTypes.DEFAULT_TYPE
     ) -> Optional[int]:
         """Get pinned status message ID for the current topic."""
-        key = cls.get_context_key(update)
-        state = cls.get_state(context, key)
-        return state.get("pinned_message_id")
+        return cls._read_topic_state(update, context).get("pinned_message_id")
 
     @classmethod
     def set_pinned_message_id(
         cls, update: Update, context: ContextTypes.DEFAULT_TYPE, message_id: Optional[int]
     ) -> None:
         """Set pinned status message ID for the current topic."""
-        key = cls.get_context_key(update)
-        state = cls.get_state(context, key)
-        state["pinned_message_id"] = message_id
+        cls.get_topic_state(update, context)["pinned_message_id"] = message_id
 
     @classmethod
     def get_current_status(
@@ -118,9 +126,7 @@ class ContextManager:
         Returns:
             One of: "ready", "processing", "error"
         """
-        key = cls.get_context_key(update)
-        state = cls.get_state(context, key)
-        return state.get("current_status", "ready")
+        return cls._read_topic_state(update, context).get("current_status", "ready")
 
     @classmethod
     def set_current_status(
@@ -131,7 +137,4 @@ class ContextManager:
         Args:
             status: One of "ready", "processing", "error"
         """
-        key = cls.get_context_key(update)
-        state = cls.get_state(context, key)
-        state["current_status"] = status
-
+        cls.get_topic_state(update, context)["current_status"] = status
@@ -10,6 +10,7 @@ Features:
 import asyncio
 from typing import Any, Callable, Dict, Optional
 
+import httpx
 import structlog
 from telegram import BotCommand, Update
 from telegram.ext import (
@@ -38,6 +39,7 @@ class ClaudeCodeBot:
         self.app: Optional[Application] = None
         self.is_running = False
         self.feature_registry: Optional[FeatureRegistry] = None
+        self.http_client: Optional[httpx.AsyncClient] = None
 
     async def initialize(self) -> None:
         """Initialize bot application."""
@@ -65,6 +67,14 @@ class ClaudeCodeBot:
         # Add feature registry to dependencies
         self.deps["features"] = self.feature_registry
 
+        # One connection pool for handlers' own HTTP requests (Telegram API
+        # calls go through the application's pool)
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+            timeout=30,
+        )
+        self.deps["http_client"] = self.http_client
+
         # Set bot commands for menu
         await self._set_bot_commands()
 
@@ -128,20 +138,24 @@ class ClaudeCodeBot:
         self.app.add_handler(
             MessageHandler(
                 filters.TEXT & ~filters.COMMAND,
-                self._inject_deps(message.handle_text_message),
+                self._inject_deps(message.queued_per_chat(message.handle_text_message)),
             ),
             group=10,
         )
 
         self.app.add_handler(
             MessageHandler(
-                filters.Document.ALL, self._inject_deps(message.handle_document)
+                filters.Document.ALL,
+                self._inject_deps(message.queued_per_chat(message.handle_document)),
             ),
             group=10,
         )
 
         self.app.add_handler(
-            MessageHandler(filters.PHOTO, self._inject_deps(message.handle_photo)),
+            MessageHandler(
+                filters.PHOTO,
+                self._inject_deps(message.queued_per_chat(message.handle_photo)),
+            ),
             group=10,
         )
 
@@ -286,10 +300,20 @@ class ClaudeCodeBot:
                 if self.app.updater.running:
                     await self.app.updater.stop()
 
+                # Stop handlers still running in the per-chat queues, then let
+                # their interaction saves finish before storage is closed
+                from .handlers.message import cancel_chat_queues, wait_background_tasks
+
+                await cancel_chat_queues()
+                await wait_background_tasks()
+
                 # Stop the application
                 await self.app.stop()
                 await self.app.shutdown()
 
+            if self.http_client:
+                await self.http_client.aclose()
+
             logger.info("Bot stopped successfully")
         except Exception as e:
             logger.error("Error stopping bot", error=str(e))
@@ -3,15 +3,29 @@
 Scans and manages custom commands from both global and project-specific locations.
 """
 
-import json
+import asyncio
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
+import aiofiles
+import orjson
 import structlog
 
 logger = structlog.get_logger()
 
+# Command directory relative to a project, and the user-wide one (resolved
+# once, since Path.home() looks up the user database)
+_COMMANDS_SUBDIR = Path(".claude", "commands")
+_GLOBAL_COMMANDS_DIR = Path.home() / _COMMANDS_SUBDIR
+
+# Command directories change rarely, so the file listing of each directory is
+# cached until the directory's mtime changes, and each parsed command is cached
+# until the file's mtime or size changes. A stat() is much cheaper than
+# re-reading and re-parsing the JSON.
+_listing_cache: Dict[Path, Tuple[int, List[Path]]] = {}
+_command_cache: Dict[Tuple[Path, str], Tuple[int, int, Optional["CustomCommand"]]] = {}
+
 
 @dataclass
 class CustomCommand:
@@ -24,7 +38,7 @@ class CustomCommand:
     file_path: Path
 
 
-def scan_commands(working_directory: Path) -> List[CustomCommand]:
+async def scan_commands(working_directory: Path) -> List[CustomCommand]:
     """Scan for custom commands from both global and project directories.
     
     Args:
@@ -36,23 +50,25 @@ def scan_commands(working_directory: Path) -> List[CustomCommand]:
     commands = {}
     
     # Scan global commands
-    global_dir = Path.home() / ".claude" / "commands"
-    if global_dir.exists() and global_dir.is_dir():
-        for cmd in _scan_directory(global_dir, "global"):
+    global_dir = _GLOBAL_COMMANDS_DIR
+    if global_dir.is_dir():
+        for cmd in await _scan_directory(global_dir, "global"):
             commands[cmd.name] = cmd
     
     # Scan project commands (override global if same name)
-    project_dir = working_directory / ".claude" / "commands"
-    if project_dir.exists() and project_dir.is_dir():
-        for cmd in _scan_directory(project_dir, "project"):
+    project_dir = working_directory / _COMMANDS_SUBDIR
+    if project_dir.is_dir():
+        for cmd in await _scan_directory(project_dir, "project"):
             commands[cmd.name] = cmd
     
     return sorted(commands.values(), key=lambda c: c.name)
 
 
-def _scan_directory(directory: Path, source: str) -> List[CustomCommand]:
+async def _scan_directory(directory: Path, source: str) -> List[CustomCommand]:
     """Scan a single directory for command files.
     
+    Files that changed since the last scan are read concurrently.
+    
     Args:
         directory: Directory to scan
         source: Source identifier ("global" or "project")
@@ -63,10 +79,13 @@ def _scan_directory(directory: Path, source: str) -> List[CustomCommand]:
     commands = []
     
     try:
-        for file_path in directory.glob("*.json"):
-            cmd = _load_command(file_path, source)
-            if cmd:
-                commands.append(cmd)
+        loaded = await asyncio.gather(
+            *(
+                _load_command_cached(file_path, source)
+                for file_path in _list_command_files(directory)
+            )
+        )
+        commands = [cmd for cmd in loaded if cmd]
     except Exception as e:
         logger.warning(
             "Failed to scan command directory",
@@ -77,7 +96,54 @@ def _scan_directory(directory: Path, source: str) -> List[CustomCommand]:
     return commands
 
 
-def _load_command(file_path: Path, source: str) -> Optional[CustomCommand]:
+def _list_command_files(directory: Path) -> List[Path]:
+    """List command files in a directory, cached by directory mtime.
+    
+    Args:
+        directory: Directory to list
+        
+    Returns:
+        Paths of the JSON files in the directory
+    """
+    mtime = directory.stat().st_mtime_ns
+    cached = _listing_cache.get(directory)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    
+    files = list(directory.glob("*.json"))
+    _listing_cache[directory] = (mtime, files)
+    return files
+
+
+async def _load_command_cached(
+    file_path: Path, source: str
+) -> Optional[CustomCommand]:
+    """Load a command, reusing the parsed result while the file is unchanged.
+    
+    Args:
+        file_path: Path to command JSON file
+        source: Source identifier ("global" or "project")
+        
+    Returns:
+        CustomCommand if the file exists and is valid, None otherwise
+    """
+    try:
+        stat = file_path.stat()
+    except OSError:
+        _command_cache.pop((file_path, source), None)
+        return None
+    
+    key = (file_path, source)
+    cached = _command_cache.get(key)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+    
+    cmd = await _load_command(file_path, source)
+    _command_cache[key] = (stat.st_mtime_ns, stat.st_size, cmd)
+    return cmd
+
+
+async def _load_command(file_path: Path, source: str) -> Optional[CustomCommand]:
     """Load a command from a JSON file.
     
     Args:
@@ -88,8 +154,8 @@ def _load_command(file_path: Path, source: str) -> Optional[CustomCommand]:
         CustomCommand if valid, None if invalid
     """
     try:
-        with open(file_path, "r") as f:
-            data = json.load(f)
+        async with aiofiles.open(file_path, "rb") as f:
+            data = orjson.loads(await f.read())
         
         # Validate required fields
         if "description" not in data or "prompt" not in data:
@@ -110,7 +176,7 @@ def _load_command(file_path: Path, source: str) -> Optional[CustomCommand]:
             file_path=file_path,
         )
     
-    except json.JSONDecodeError as e:
+    except orjson.JSONDecodeError as e:
         logger.warning(
             "Failed to parse command JSON",
             file=str(file_path),
@@ -126,7 +192,7 @@ def _load_command(file_path: Path, source: str) -> Optional[CustomCommand]:
         return None
 
 
-def get_command_by_name(
+async def get_command_by_name(
     name: str, working_directory: Path
 ) -> Optional[CustomCommand]:
     """Get a specific command by name.
@@ -141,17 +207,11 @@ def get_command_by_name(
         CustomCommand if found, None otherwise
     """
     # Check project directory first
-    project_file = working_directory / ".claude" / "commands" / f"{name}.json"
-    if project_file.exists():
-        cmd = _load_command(project_file, "project")
-        if cmd:
-            return cmd
+    file_name = f"{name}.json"
+    project_file = working_directory / _COMMANDS_SUBDIR / file_name
+    cmd = await _load_command_cached(project_file, "project")
+    if cmd:
+        return cmd
     
     # Check global directory
-    global_file = Path.home() / ".claude" / "commands" / f"{name}.json"
-    if global_file.exists():
-        cmd = _load_command(global_file, "global")
-        if cmd:
-            return cmd
-    
-    return None
+    return await _load_command_cached(_GLOBAL_COMMANDS_DIR / file_name, "global")
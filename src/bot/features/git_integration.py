@@ -6,7 +6,7 @@ import re
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional, Set, Tuple
+from typing import AsyncIterator, List, Optional, Set, Tuple
 
 from src.config.settings import Settings
 from src.exceptions import SecurityError
@@ -103,26 +103,7 @@ class GitIntegration:
             SecurityError: If command is unsafe
             GitError: If git command fails
         """
-        # Validate command safety
-        if not command or command[0] != "git":
-            raise SecurityError("Only git commands allowed")
-
-        if len(command) < 2 or command[1] not in self.SAFE_COMMANDS:
-            raise SecurityError(f"Unsafe git command: {command[1]}")
-
-        # Check for dangerous patterns
-        cmd_str = " ".join(command)
-        for pattern in self.DANGEROUS_PATTERNS:
-            if re.search(pattern, cmd_str, re.IGNORECASE):
-                raise SecurityError(f"Dangerous pattern detected: {pattern}")
-
-        # Validate working directory
-        try:
-            cwd = cwd.resolve()
-            if not cwd.is_relative_to(self.approved_dir):
-                raise SecurityError("Repository outside approved directory")
-        except Exception:
-            raise SecurityError("Invalid repository path")
+        cwd = self._validate_command(command, cwd)
 
         # Execute command
         try:
@@ -146,6 +127,128 @@ class GitIntegration:
             logger.error(f"Git command error: {e}")
             raise GitError(f"Failed to execute git command: {e}")
 
+    async def stream_git_command(
+        self, command: List[str], cwd: Path, chunk_size: int = 64 * 1024
+    ) -> AsyncIterator[bytes]:
+        """Execute safe git command and stream its stdout.
+
+        The command is validated and started, and its first chunk read, before
+        this returns, so security and startup errors, and failures without any
+        output, are raised here rather than mid-stream.
+
+        Args:
+            command: Git command parts
+            cwd: Working directory
+            chunk_size: Maximum size of each yielded chunk
+
+        Returns:
+            Async iterator over raw stdout chunks
+
+        Raises:
+            SecurityError: If command is unsafe
+            GitError: If git command cannot be started or fails without
+                output; the iterator raises it if the command fails later
+        """
+        cwd = self._validate_command(command, cwd)
+
+        # Running the iterator to its first, empty, chunk starts git and
+        # waits for its output. Once started, the iterator is also closed by
+        # the event loop if it is dropped unread, which stops git
+        chunks = self._iter_stdout(command, cwd, chunk_size)
+        await chunks.__anext__()
+        return chunks
+
+    async def _iter_stdout(
+        self, command: List[str], cwd: Path, chunk_size: int
+    ) -> AsyncIterator[bytes]:
+        """Run a git command and yield its stdout in chunks.
+
+        An empty chunk comes first, once git has produced output or exited
+        successfully. The process is killed if the iterator is abandoned.
+
+        Raises:
+            GitError: If the command cannot be started or exits with an error
+        """
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *command,
+                cwd=cwd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+        except Exception as e:
+            logger.error(f"Git command error: {e}")
+            raise GitError(f"Failed to execute git command: {e}")
+
+        # Stderr is read alongside stdout so a full pipe cannot stall git
+        stderr = asyncio.create_task(process.stderr.read())
+        finished = False
+        try:
+            chunk = await process.stdout.read(chunk_size)
+            if not chunk:
+                await process.wait()
+                if process.returncode != 0:
+                    raise GitError(f"Git command failed: {(await stderr).decode()}")
+            yield b""
+
+            while chunk:
+                yield chunk
+                chunk = await process.stdout.read(chunk_size)
+            finished = True
+        finally:
+            if not finished:
+                stderr.cancel()
+                if process.returncode is None:
+                    try:
+                        process.kill()
+                    except ProcessLookupError:
+                        pass
+                # Unread output keeps the pipe open, and wait() with it
+                await process.stdout.read()
+            await process.wait()
+
+        if process.returncode != 0:
+            logger.error(
+                f"Git command {' '.join(command)} exited with {process.returncode}"
+            )
+            raise GitError(f"Git command failed: {(await stderr).decode()}")
+
+    def _validate_command(self, command: List[str], cwd: Path) -> Path:
+        """Validate git command safety and working directory.
+
+        Args:
+            command: Git command parts
+            cwd: Working directory
+
+        Returns:
+            Resolved working directory
+
+        Raises:
+            SecurityError: If command or directory is unsafe
+        """
+        # Validate command safety
+        if not command or command[0] != "git":
+            raise SecurityError("Only git commands allowed")
+
+        if len(command) < 2 or command[1] not in self.SAFE_COMMANDS:
+            raise SecurityError(f"Unsafe git command: {command[1]}")
+
+        # Check for dangerous patterns
+        cmd_str = " ".join(command)
+        for pattern in self.DANGEROUS_PATTERNS:
+            if re.search(pattern, cmd_str, re.IGNORECASE):
+                raise SecurityError(f"Dangerous pattern detected: {pattern}")
+
+        # Validate working directory
+        try:
+            cwd = cwd.resolve()
+            if not cwd.is_relative_to(self.approved_dir):
+                raise SecurityError("Repository outside approved directory")
+        except Exception:
+            raise SecurityError("Invalid repository path")
+
+        return cwd
+
     async def get_status(self, repo_path: Path) -> GitStatus:
         """Get repository status.
 
@@ -214,6 +317,109 @@ class GitIntegration:
             behind=behind,
         )
 
+    async def get_full_status(
+        self, repo_path: Path
+    ) -> Tuple[GitStatus, List[Tuple[str, int, int]]]:
+        """Get repository status and per-file diff stats in two git calls.
+
+        Uses ``git status --porcelain=v2 --branch`` for branch, tracking and
+        file state, and ``git diff --numstat`` for line counts, instead of the
+        separate branch/status/rev-list/diff invocations.
+
+        Args:
+            repo_path: Repository path
+
+        Returns:
+            Tuple of (status, changed_files) where changed_files is a list of
+            (filename, added_lines, deleted_lines)
+        """
+        (status_out, _), (numstat_out, _) = await asyncio.gather(
+            self.execute_git_command(
+                ["git", "status", "--porcelain=v2", "--branch", "-z"], repo_path
+            ),
+            self.execute_git_command(["git", "diff", "--numstat", "-z"], repo_path),
+        )
+        return self._parse_status_v2(status_out), self._parse_numstat_z(numstat_out)
+
+    @staticmethod
+    def _parse_status_v2(output: str) -> GitStatus:
+        """Parse NUL-separated ``git status --porcelain=v2 --branch`` output."""
+        branch = "HEAD"
+        ahead = behind = 0
+        modified: List[str] = []
+        added: List[str] = []
+        deleted: List[str] = []
+        untracked: List[str] = []
+
+        entries = iter(output.split("\0"))
+        for entry in entries:
+            if not entry:
+                continue
+
+            kind = entry[0]
+            if kind == "#":
+                header = entry.split(" ")
+                if header[1] == "branch.head" and header[2] != "(detached)":
+                    branch = header[2]
+                elif header[1] == "branch.ab":
+                    ahead = int(header[2].lstrip("+"))
+                    behind = int(header[3].lstrip("-"))
+                continue
+
+            if kind == "?":
+                untracked.append(entry[2:])
+                continue
+
+            if kind == "1":
+                status, filename = entry[2:4], entry.split(" ", 8)[8]
+            elif kind == "2":
+                status, filename = entry[2:4], entry.split(" ", 9)[9]
+                next(entries, None)  # Original path of the rename/copy
+            elif kind == "u":
+                status, filename = entry[2:4], entry.split(" ", 10)[10]
+            else:
+                continue
+
+            if "M" in status:
+                modified.append(filename)
+            elif "A" in status:
+                added.append(filename)
+            elif "D" in status:
+                deleted.append(filename)
+
+        return GitStatus(
+            branch=branch,
+            modified=modified,
+            added=added,
+            deleted=deleted,
+            untracked=untracked,
+            ahead=ahead,
+            behind=behind,
+        )
+
+    @staticmethod
+    def _parse_numstat_z(output: str) -> List[Tuple[str, int, int]]:
+        """Parse NUL-separated ``git diff --numstat`` output."""
+        files = []
+        entries = iter(output.split("\0"))
+        for entry in entries:
+            parts = entry.split("\t")
+            if len(parts) != 3:
+                continue
+
+            filename = parts[2]
+            if not filename:
+                # Rename: old and new paths follow as separate entries
+                next(entries, None)
+                filename = next(entries, "")
+
+            # Binary files report "-" for both counts
+            added = int(parts[0]) if parts[0] != "-" else 0
+            deleted = int(parts[1]) if parts[1] != "-" else 0
+            files.append((filename, added, deleted))
+
+        return files
+
     async def get_diff(
         self, repo_path: Path, staged: bool = False, file_path: Optional[str] = None
     ) -> str:
@@ -153,7 +153,9 @@ class QuickActionManager:
             
             # Add custom commands if working directory is provided
             if working_directory:
-                custom_actions = self._get_custom_command_actions(working_directory)
+                custom_actions = await self._get_custom_command_actions(
+                    working_directory
+                )
                 available_actions.extend(custom_actions)
 
             # Sort by priority and return top N
@@ -235,7 +237,9 @@ class QuickActionManager:
                 return False
         return True
     
-    def _get_custom_command_actions(self, working_directory: Path) -> List[QuickAction]:
+    async def _get_custom_command_actions(
+        self, working_directory: Path
+    ) -> List[QuickAction]:
         """Convert custom commands to QuickAction objects.
         
         Args:
@@ -247,7 +251,7 @@ class QuickActionManager:
         custom_actions = []
         
         try:
-            commands = scan_commands(working_directory)
+            commands = await scan_commands(working_directory)
             
             # Limit to 3 custom commands to avoid clutter
             for i, cmd in enumerate(commands[:3]):
@@ -16,6 +16,7 @@ from .git_integration import GitIntegration
 from .image_handler import ImageHandler
 from .quick_actions import QuickActionManager
 from .session_export import SessionExporter
+from .status_pin import PinnedMessageManager
 
 logger = structlog.get_logger(__name__)
 
@@ -54,6 +55,17 @@ class FeatureRegistry:
             except Exception as e:
                 logger.error("Failed to initialize git integration", error=str(e))
 
+        # Pinned status messages - always enabled, shared by all handlers so
+        # they reuse one git integration and serialize updates to the same
+        # topic's pinned message on that topic's lock
+        try:
+            self.features["status_pin"] = PinnedMessageManager(
+                git_integration=self.features.get("git")
+            )
+            logger.info("Pinned status feature enabled")
+        except Exception as e:
+            logger.error("Failed to initialize pinned status", error=str(e))
+
         # Quick actions - conditionally enabled
         if self.config.enable_quick_actions:
             try:
@@ -104,6 +116,10 @@ class FeatureRegistry:
         """Get git integration feature"""
         return self.get_feature("git")
 
+    def get_pinned_message_manager(self) -> Optional[PinnedMessageManager]:
+        """Get pinned status message manager"""
+        return self.get_feature("status_pin")
+
     def get_quick_actions(self) -> Optional[QuickActionManager]:
         """Get quick actions feature"""
         return self.get_feature("quick_actions")
@@ -5,19 +5,38 @@ Format: 🟢main +42/-27 ~/...src
 """
 
 import asyncio
+import hashlib
 import logging
+import time
+from collections import defaultdict
+from itertools import islice
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Dict, Optional, Tuple
 
 from telegram import Chat, Message, InlineKeyboardButton, InlineKeyboardMarkup, WebAppInfo
 from telegram.error import TelegramError
 from telegram.ext import ContextTypes
 
 from ...config.settings import Settings
+from ..context_manager import ContextManager
 from .git_integration import GitIntegration, GitError
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of changed files listed under the status line
+MAX_FILE_LINES = 20
+
+# Common branch prefixes and their short forms: (prefix, short_prefix, len(prefix))
+_BRANCH_PREFIXES = tuple(
+    (long_prefix, short_prefix, len(long_prefix))
+    for long_prefix, short_prefix in (
+        ("feature/", "feat/"),
+        ("bugfix/", "bug/"),
+        ("hotfix/", "hot/"),
+        ("release/", "rel/"),
+    )
+)
+
 
 class StatusFormatter:
     """Formats status information in compact form for pinned messages."""
@@ -67,20 +86,17 @@ class StatusFormatter:
         short_path = StatusFormatter._shorten_path(current_path, approved_directory)
         parts.append(short_path)
 
-        # First line: compact status
+        # First line: compact status, then file details if available
         lines = [" ".join(parts)]
-        
-        # Add file details if available
         if changed_files:
-            for filename, added, deleted in changed_files[:20]:  # Limit to 20 files
-                # Shorten long filenames
-                if len(filename) > 40:
-                    filename = "..." + filename[-37:]
-                file_stats = f"+{added}/-{deleted}"
-                lines.append(f"{filename} {file_stats}")
-            
-            if len(changed_files) > 20:
-                lines.append(f"... and {len(changed_files) - 20} more files")
+            lines.extend(
+                f"{'...' + name[-37:] if len(name) > 40 else name} +{added}/-{deleted}"
+                for name, added, deleted in islice(changed_files, MAX_FILE_LINES)
+            )
+            if len(changed_files) > MAX_FILE_LINES:
+                lines.append(
+                    f"... and {len(changed_files) - MAX_FILE_LINES} more files"
+                )
 
         return "\n".join(lines)
 
@@ -97,16 +113,9 @@ class StatusFormatter:
             return branch
 
         # Try common prefixes
-        prefix_map = {
-            "feature/": "feat/",
-            "bugfix/": "bug/",
-            "hotfix/": "hot/",
-            "release/": "rel/",
-        }
-
-        for long_prefix, short_prefix in prefix_map.items():
+        for long_prefix, short_prefix, prefix_len in _BRANCH_PREFIXES:
             if branch.startswith(long_prefix):
-                rest = branch[len(long_prefix):]
+                rest = branch[prefix_len:]
                 shortened = short_prefix + rest
                 if len(shortened) <= StatusFormatter.MAX_BRANCH_LENGTH:
                     return shortened
@@ -200,9 +209,27 @@ class StatusFormatter:
         return emoji_map.get(status, "🟢")
 
 
+def _text_hash(text: str) -> bytes:
+    """Get a short digest of a status text for change detection."""
+    return hashlib.blake2b(text.encode(), digest_size=8).digest()
+
+
+def _remember_sent_text(state: Dict, text_hash: bytes) -> None:
+    """Record which status text the pinned message now shows."""
+    state["pinned_message_text_hash"] = text_hash
+    state["pinned_message_sent_at"] = time.time()
+
+
 class PinnedMessageManager:
     """Manages pinned status message updates."""
 
+    GIT_STATS_TTL_SECONDS = 1.5
+    # Unchanged status is still re-sent this often, so the View Diff button
+    # gets a new token before the old one (valid for an hour) expires
+    REFRESH_INTERVAL_SECONDS = 30 * 60
+    # Idle per-topic locks are dropped once this many have accumulated
+    MAX_LOCKS = 10000
+
     def __init__(self, git_integration: Optional[GitIntegration] = None):
         """Initialize pinned message manager.
 
@@ -210,7 +237,48 @@ class PinnedMessageManager:
             git_integration: Git integration instance for stats
         """
         self.git_integration = git_integration
-        self._update_lock = asyncio.Lock()
+        # One lock per chat/thread, so only updates to the same pinned
+        # message are serialized
+        self._locks: defaultdict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        # Recent git stats per repository and git state, so bursts of status
+        # updates for the same repo share one round of git calls
+        self._git_cache: Dict[Tuple[Path, tuple], Tuple[float, tuple]] = {}
+
+    def _get_lock(self, context_key: str) -> asyncio.Lock:
+        """Get the update lock for a chat/thread, pruning idle locks if needed.
+
+        Args:
+            context_key: Context key for this chat/thread
+
+        Returns:
+            Lock guarding this context's pinned message
+        """
+        if len(self._locks) > self.MAX_LOCKS and context_key not in self._locks:
+            for key in [k for k, lock in self._locks.items() if not lock.locked()]:
+                del self._locks[key]
+        return self._locks[context_key]
+
+    @staticmethod
+    def _git_state(repo_path: Path) -> tuple:
+        """Get modification times of the git HEAD and index for a path.
+
+        A checkout, commit or staging change updates one of these, so cached
+        stats keyed by them are not reused across such changes.
+
+        Args:
+            repo_path: Path inside a git repository
+
+        Returns:
+            HEAD and index modification times, empty if no git dir was found
+        """
+        for directory in (repo_path, *repo_path.parents):
+            git_dir = directory / ".git"
+            if git_dir.is_dir():
+                return tuple(
+                    path.stat().st_mtime_ns if path.exists() else None
+                    for path in (git_dir / "HEAD", git_dir / "index")
+                )
+        return ()
 
     def _create_inline_keyboard(
         self, current_path: Path, settings: Settings
@@ -277,7 +345,7 @@ class PinnedMessageManager:
         Returns:
             Pinned message object or None
         """
-        async with self._update_lock:
+        async with self._get_lock(context_key):
             try:
                 # Get status emoji
                 status_emoji = StatusFormatter.get_status_emoji(status)
@@ -305,17 +373,23 @@ class PinnedMessageManager:
 
                 logger.info(f"Formatted status: '{status_text[:100]}...' (branch={branch}, +{added}/-{deleted}, {len(changed_files) if changed_files else 0} files, path={current_path})")
 
-                # Create inline keyboard with Web App button
-                reply_markup = self._create_inline_keyboard(current_path, settings)
+                state = ContextManager.get_state(context, context_key)
+                pinned_msg_id = state.get("pinned_message_id")
 
-                # Get state
-                if "topic_states" not in context.chat_data:
-                    context.chat_data["topic_states"] = {}
-                if context_key not in context.chat_data["topic_states"]:
-                    context.chat_data["topic_states"][context_key] = {}
+                # Skip the edit if the pinned message already shows this text,
+                # unless its diff link is due for a fresh token
+                text_hash = _text_hash(status_text)
+                if (
+                    pinned_msg_id
+                    and state.get("pinned_message_text_hash") == text_hash
+                    and time.time() - state.get("pinned_message_sent_at", 0)
+                    < self.REFRESH_INTERVAL_SECONDS
+                ):
+                    logger.debug("Pinned status unchanged, skipping edit")
+                    return None
 
-                state = context.chat_data["topic_states"][context_key]
-                pinned_msg_id = state.get("pinned_message_id")
+                # Create inline keyboard with Web App button
+                reply_markup = self._create_inline_keyboard(current_path, settings)
 
                 # Try to update existing pinned message
                 if pinned_msg_id:
@@ -327,6 +401,7 @@ class PinnedMessageManager:
                             text=status_text,
                             reply_markup=reply_markup,
                         )
+                        _remember_sent_text(state, text_hash)
                         logger.debug(f"Updated pinned status: {status_text[:50]}...")
                         return None  # We don't have the message object, but update succeeded
                     except TelegramError as e:
@@ -345,6 +420,7 @@ class PinnedMessageManager:
                     msg = await chat.send_message(status_text[:4000])
 
                 # Pin the message (silently, without notification)
+                _remember_sent_text(state, _text_hash(status_text))
                 try:
                     await msg.pin(disable_notification=True)
                     state["pinned_message_id"] = msg.message_id
@@ -389,15 +465,9 @@ class PinnedMessageManager:
         Returns:
             Pinned message object or None
         """
-        async with self._update_lock:
+        async with self._get_lock(context_key):
             try:
-                # Get state
-                if "topic_states" not in context.chat_data:
-                    context.chat_data["topic_states"] = {}
-                if context_key not in context.chat_data["topic_states"]:
-                    context.chat_data["topic_states"][context_key] = {}
-
-                state = context.chat_data["topic_states"][context_key]
+                state = ContextManager.get_state(context, context_key)
                 old_pinned_msg_id = state.get("pinned_message_id")
 
                 # Unpin old message if exists
@@ -413,6 +483,7 @@ class PinnedMessageManager:
 
                 # Clear the old pinned message ID
                 state["pinned_message_id"] = None
+                state.pop("pinned_message_text_hash", None)
 
                 # Get status emoji
                 status_emoji = StatusFormatter.get_status_emoji(status)
@@ -470,6 +541,7 @@ class PinnedMessageManager:
                     msg = await chat.send_message(status_text[:4000])
 
                 # Pin the message (silently, without notification)
+                _remember_sent_text(state, _text_hash(status_text))
                 try:
                     await msg.pin(disable_notification=True)
                     state["pinned_message_id"] = msg.message_id
@@ -502,22 +574,38 @@ class PinnedMessageManager:
             logger.info("No git integration available")
             return None, None, None, None
 
+        now = time.monotonic()
+        cache_key = (repo_path, self._git_state(repo_path))
+        cached = self._git_cache.get(cache_key)
+        if cached and now - cached[0] < self.GIT_STATS_TTL_SECONDS:
+            logger.debug(f"Using cached git stats for {repo_path}")
+            return cached[1]
+
         try:
             # Just try to get git status - git itself will determine if we're in a repo
             # This works from any subdirectory of a git repository
-            status = await self.git_integration.get_status(repo_path)
+            status, changed_files = await self.git_integration.get_full_status(
+                repo_path
+            )
             branch = status.branch
-            logger.info(f"Git branch: {branch}")
-
-            # Get diff stats
-            added, deleted, _ = await self.git_integration.get_diff_stats(repo_path)
-            logger.info(f"Git diff stats: +{added}/-{deleted}")
-
-            # Get list of changed files
-            changed_files = await self.git_integration.get_changed_files(repo_path)
-            logger.info(f"Changed files: {len(changed_files)} files")
+            added = sum(file_added for _, file_added, _ in changed_files)
+            deleted = sum(file_deleted for _, _, file_deleted in changed_files)
+            logger.info(
+                f"Git stats: branch={branch}, +{added}/-{deleted}, "
+                f"{len(changed_files)} files"
+            )
 
-            return branch, added, deleted, changed_files
+            stats = (branch, added, deleted, changed_files)
+            # Expired entries are dropped here, so the cache only holds
+            # repos updated within the TTL
+            for key in [
+                k
+                for k, (cached_at, _) in self._git_cache.items()
+                if now - cached_at >= self.GIT_STATS_TTL_SECONDS
+            ]:
+                del self._git_cache[key]
+            self._git_cache[cache_key] = (now, stats)
+            return stats
 
         except GitError as e:
             # Not a git repo or git command failed
@@ -526,3 +614,27 @@ class PinnedMessageManager:
         except Exception as e:
             logger.warning(f"Unexpected error getting git stats: {e}")
             return None, None, None, None
+
+
+def get_pinned_message_manager(
+    context: ContextTypes.DEFAULT_TYPE,
+) -> PinnedMessageManager:
+    """Get the bot-wide pinned message manager.
+
+    Uses the instance from the feature registry, falling back to one manager
+    (without git stats) stored in bot_data when features are not available.
+
+    Args:
+        context: Bot context
+
+    Returns:
+        Shared PinnedMessageManager
+    """
+    features = context.bot_data.get("features")
+    manager = features.get_pinned_message_manager() if features else None
+    if manager is None:
+        manager = context.bot_data.get("pinned_message_manager")
+        if manager is None:
+            manager = PinnedMessageManager()
+            context.bot_data["pinned_message_manager"] = manager
+    return manager
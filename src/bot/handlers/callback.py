@@ -361,20 +361,18 @@ async def _handle_new_session_start_action(
     )
 
     # Clear session using ContextManager
-    ContextManager.set_session_id(mock_update, context, None)
-    ContextManager.set_session_started(mock_update, context, True)
+    state = ContextManager.get_topic_state(mock_update, context)
+    state["claude_session_id"] = None
+    state["session_started"] = True
 
     current_dir = ContextManager.get_current_directory(mock_update, context, settings)
     relative_path = current_dir.relative_to(settings.approved_directory)
 
     # Create new pinned status message
     try:
-        from ..features.status_pin import PinnedMessageManager
+        from ..features.status_pin import get_pinned_message_manager
 
-        features = context.bot_data.get("features")
-        git_integration = features.get_git_integration() if features else None
-
-        pinned_manager = PinnedMessageManager(git_integration=git_integration)
+        pinned_manager = get_pinned_message_manager(context)
         context_key = ContextManager.get_context_key(mock_update)
 
         await pinned_manager.create_new_pinned_message(
@@ -1257,7 +1255,7 @@ async def handle_custom_command_callback(
             working_directory = settings.approved_directory
         
         # Load command
-        command = get_command_by_name(command_name, working_directory)
+        command = await get_command_by_name(command_name, working_directory)
         
         if not command:
             await query.edit_message_text(
@@ -18,12 +18,9 @@ async def _update_pinned_status(
 ) -> None:
     """Helper to update pinned status message."""
     try:
-        from ..features.status_pin import PinnedMessageManager
+        from ..features.status_pin import get_pinned_message_manager
         
-        features = context.bot_data.get("features")
-        git_integration = features.get_git_integration() if features else None
-        
-        pinned_manager = PinnedMessageManager(git_integration=git_integration)
+        pinned_manager = get_pinned_message_manager(context)
         context_key = ContextManager.get_context_key(update)
         current_dir = ContextManager.get_current_directory(update, context, settings)
         current_status = ContextManager.get_current_status(update, context)
@@ -147,13 +144,10 @@ async def new_session(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
 
     # Create new pinned status message with session info and buttons
     try:
-        from ..features.status_pin import PinnedMessageManager
+        from ..features.status_pin import get_pinned_message_manager
         from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
-        features = context.bot_data.get("features")
-        git_integration = features.get_git_integration() if features else None
-
-        pinned_manager = PinnedMessageManager(git_integration=git_integration)
+        pinned_manager = get_pinned_message_manager(context)
         context_key = ContextManager.get_context_key(update)
 
         # Create custom keyboard with session options
@@ -486,11 +480,10 @@ async def change_directory(update: Update, context: ContextTypes.DEFAULT_TYPE) -
             )
             return
 
-        # Update current directory in context
-        ContextManager.set_current_directory(update, context, resolved_path)
-
-        # Clear Claude session on directory change
-        ContextManager.set_session_id(update, context, None)
+        # Update current directory and clear Claude session on directory change
+        state = ContextManager.get_topic_state(update, context)
+        state["current_directory"] = resolved_path
+        state["claude_session_id"] = None
 
         # Send confirmation
         relative_path = resolved_path.relative_to(settings.approved_directory)
@@ -759,8 +752,9 @@ async def end_session(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
     relative_path = current_dir.relative_to(settings.approved_directory)
 
     # Clear session data
-    ContextManager.set_session_id(update, context, None)
-    ContextManager.set_session_started(update, context, False)
+    state = ContextManager.get_topic_state(update, context)
+    state["claude_session_id"] = None
+    state["session_started"] = False
     # context.user_data["last_message"] = None  # This might be user-specific still? Let's keep it commented or remove if unused
 
     # Create quick action buttons
@@ -882,7 +876,7 @@ async def list_custom_commands(
         
         # Scan commands
         from ..features.custom_commands import scan_commands
-        commands = scan_commands(working_directory)
+        commands = await scan_commands(working_directory)
         
         if not commands:
             await update.message.reply_text(
@@ -1,22 +1,267 @@
 """Message handlers for non-command inputs."""
 
 import asyncio
-from typing import Optional
-
+import codecs
+import functools
+import io
+import logging
+import os
+import re
+from collections import deque
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
+
+import httpx
 import structlog
-from telegram import Update
+from telegram import File, Update
+from telegram.error import NetworkError, RetryAfter, TelegramError
 from telegram.ext import ContextTypes
 
-from ...claude.exceptions import ClaudeToolValidationError
+from ...claude.exceptions import ClaudeError, ClaudeToolValidationError
 from ...claude import ClaudeIntegration
+from ...claude.response_cache import ResponseCache
 from ...claude.types import StreamUpdate
 from ...config.settings import Settings
 from ...security.audit import AuditLogger
 from ...security.rate_limiter import RateLimiter
 from ...security.validators import SecurityValidator
 from ..context_manager import ContextManager
+from ..utils.formatting import FormattedMessage, ResponseFormatter
 
 logger = structlog.get_logger()
+# Underlying stdlib logger, for cheap level checks on hot paths
+_stdlib_logger = logging.getLogger(__name__)
+
+# Streamed output is edited into Telegram at most once per this many seconds
+STREAM_FLUSH_INTERVAL = 0.4
+# Streamed output is split into messages of this size (Telegram allows 4096)
+STREAM_CHUNK_SIZE = 4000
+# Finished events beyond this many are folded into plain text to bound memory
+MAX_STREAM_EVENTS = 500
+# First reply, sent before Claude starts and edited once output streams in
+STREAM_PLACEHOLDER = "🤖 _Working..._"
+# Uploaded text files are cut to this many characters for the prompt
+MAX_FILE_CONTENT_LENGTH = 50000
+# Bytes of an upload checked for UTF-8 before decoding the whole file
+DECODE_PROBE_SIZE = 4096
+# Larger uploads are streamed in chunks of this size and cut off once enough
+# bytes for MAX_FILE_CONTENT_LENGTH characters have arrived
+DOWNLOAD_CHUNK_SIZE = 16 * 1024
+# Upload progress messages skip phases shown sooner than this after the last
+PROGRESS_EDIT_INTERVAL = 0.8
+# Telegram shows "typing" for about 5 seconds per chat action
+TYPING_INTERVAL = 4
+# Markdown markers removed from streamed text once Telegram rejects its Markdown
+_MD_STRIP = str.maketrans("", "", "*_`")
+
+# Fixed instructions for every turn, sent as a system prompt so they stay
+# part of the cached prompt prefix; the caption and file contents of uploads
+# go in the message. Every turn of a session shares one Claude process,
+# started with this prompt, so text turns get it too
+BOT_SYSTEM_PROMPT = (
+    "The user is chatting through a Telegram bot and may upload files or "
+    "images. For an upload, the user's request comes first in their message, "
+    "followed by the uploaded file's name and contents. Replies are shown in "
+    "Telegram, so keep them concise."
+)
+
+# Phrases that indicate Claude changed directory, fused into one pattern so a
+# response is scanned once; exactly one named group holds the path
+_DIR_CHANGE_RE = re.compile(
+    r"cd\s+(?P<cd>\S+)"  # cd command
+    r"|Changed directory to:?\s*(?P<changed>\S+)"  # explicit change
+    r"|Current directory:?\s*(?P<current>\S+)"  # current directory
+    r"|Working directory:?\s*(?P<working>\S+)",  # working directory
+    re.IGNORECASE,
+)
+# Words every _DIR_CHANGE_RE match contains, in lowercase
+_DIR_CHANGE_WORDS = ("cd", "directory")
+# Tools that run shell commands, the only way Claude can change directory
+_SHELL_TOOLS = frozenset({"Bash", "Shell"})
+# Tools with side effects; replaying a cached reply would not repeat them
+_MUTATING_TOOLS = _SHELL_TOOLS | {
+    "Write",
+    "WriteFile",
+    "Edit",
+    "EditFile",
+    "MultiEdit",
+    "NotebookEdit",
+}
+
+# Caption tag that bypasses the cache of replies to file uploads
+NO_CACHE_TAG = "#nocache"
+
+# Reply to photos when no image handler is configured
+_PHOTO_UNSUPPORTED_MSG = (
+    "📸 **Photo Upload**\n\n"
+    "Photo processing is not yet supported.\n\n"
+    "**Currently supported:**\n"
+    "• Text files (.py, .js, .md, etc.)\n"
+    "• Configuration files\n"
+    "• Documentation files\n\n"
+    "**Coming soon:**\n"
+    "• Image analysis\n"
+    "• Screenshot processing\n"
+    "• Diagram interpretation"
+)
+
+# Failures an upload can hit that are reported to the user; anything else
+# (including cancellation) propagates to the per-chat queue worker
+_UPLOAD_ERRORS = (
+    TelegramError,
+    httpx.HTTPError,
+    OSError,
+    UnicodeDecodeError,
+    ClaudeError,
+)
+
+# Fire-and-forget tasks, referenced here so they are not garbage collected
+_background_tasks: Set["asyncio.Task[Any]"] = set()
+
+
+# Queues of pending updates per chat topic, each drained by one worker task
+_chat_queues: Dict[str, "asyncio.Queue[Tuple[Callable, Update, Any]]"] = {}
+_chat_workers: Dict[str, "asyncio.Task[None]"] = {}
+
+
+def queued_per_chat(handler: Callable) -> Callable:
+    """Wrap a long-running handler to run in its chat topic's queue.
+
+    The wrapper returns as soon as the update is queued, so other chats are
+    served while it runs; updates within one topic still run one at a time,
+    in the order they arrived.
+    """
+
+    @functools.wraps(handler)
+    async def enqueue(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        key = ContextManager.get_context_key(update)
+        queue = _chat_queues.get(key)
+        if queue is None:
+            queue = _chat_queues[key] = asyncio.Queue()
+            _chat_workers[key] = asyncio.create_task(_drain_chat_queue(key, queue))
+        queue.put_nowait((handler, update, context))
+
+    return enqueue
+
+
+async def cancel_chat_queues() -> None:
+    """Cancel the workers of all chat queues, dropping their pending updates."""
+    workers = list(_chat_workers.values())
+    _chat_workers.clear()
+    _chat_queues.clear()
+    for task in workers:
+        task.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+
+
+async def _drain_chat_queue(
+    key: str, queue: "asyncio.Queue[Tuple[Callable, Update, Any]]"
+) -> None:
+    """Run a topic's queued updates in order, exiting once the queue is empty."""
+    while True:
+        handler, update, context = await queue.get()
+        try:
+            await handler(update, context)
+        except Exception as e:
+            # The application's error handlers never see errors raised here,
+            # since the update was already handled when it was queued
+            logger.exception("Queued handler failed", handler=handler.__name__)
+            await context.application.process_error(update, e)
+        if queue.empty():
+            del _chat_queues[key]
+            del _chat_workers[key]
+            return
+
+
+async def wait_background_tasks() -> None:
+    """Wait for fire-and-forget tasks, such as interaction saves, to finish."""
+    # Failures are already logged by the tasks' done callbacks
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
+
+
+def _on_interaction_saved(task: "asyncio.Task[Any]") -> None:
+    """Log a failed background write of a Claude interaction."""
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(
+            "Failed to log interaction to storage", error=str(task.exception())
+        )
+
+
+# Icons shown next to tool calls in streamed output
+TOOL_ICONS: Dict[str, str] = {
+    "Bash": "💻",
+    "Read": "📄",
+    "ReadFile": "📄",
+    "Write": "✏️",
+    "WriteFile": "✏️",
+    "Edit": "📝",
+    "EditFile": "📝",
+    "Glob": "🔍",
+    "LS": "📂",
+    "ls": "📂",
+}
+FILE_TOOLS = frozenset({"Read", "ReadFile", "Write", "WriteFile", "Edit", "EditFile"})
+_PATH_KEYS = ("path", "file_path", "file")
+
+
+def _bash_details(tool_input: Dict[str, Any]) -> str:
+    """Show a Bash call's command, shortened to fit one line."""
+    cmd = tool_input.get("command")
+    if cmd is None:
+        return ""
+    cmd = cmd.strip()
+    if len(cmd) > 40:
+        cmd = cmd[:37] + "..."
+    return f": `{cmd}`"
+
+
+def _file_details(tool_input: Dict[str, Any]) -> str:
+    """Show the file a file tool operates on."""
+    # Tools name the path argument differently
+    path = next((tool_input[key] for key in _PATH_KEYS if tool_input.get(key)), None)
+    if not path:
+        paths = tool_input.get("paths")
+        if isinstance(paths, list) and paths:
+            path = paths[0] + (f" (+{len(paths) - 1})" if len(paths) > 1 else "")
+    if not path:
+        logger.warning("No path found in tool input", keys=list(tool_input))
+        return ""
+    return f": `{path}`"
+
+
+def _glob_details(tool_input: Dict[str, Any]) -> str:
+    """Show a Glob call's pattern."""
+    pattern = tool_input.get("pattern") or tool_input.get("include")
+    return f": `{pattern}`" if pattern else ""
+
+
+_TOOL_DETAILS: Dict[str, Callable[[Dict[str, Any]], str]] = {
+    "Bash": _bash_details,
+    "Glob": _glob_details,
+    **{name: _file_details for name in FILE_TOOLS},
+}
+
+
+def _format_tool_details(name: str, tool_input: Dict[str, Any]) -> str:
+    """Format the short detail suffix shown after a tool name."""
+    formatter = _TOOL_DETAILS.get(name)
+    return formatter(tool_input) if formatter else ""
+
+
+def _render_stream_event(event: Dict[str, Any]) -> str:
+    """Render one stream event as a line (tool) or block (text)."""
+    if event["type"] == "text":
+        if event["after_tool"]:
+            return "\n---\n\n" + event["content"]
+        return event["content"]
+
+    name = event["name"]
+    status_icon = "⏳" if event["status"] == "running" else "✓"
+    type_icon = TOOL_ICONS.get(name, "🔧")
+    details = _format_tool_details(name, event["input"] or {})
+    return f"{event['number']}. {status_icon} {type_icon} **{name}**{details}"
 
 
 async def _format_progress_update(update_obj) -> Optional[str]:
@@ -86,48 +331,58 @@ async def _format_progress_update(update_obj) -> Optional[str]:
     return None
 
 
+# Known error substrings, in priority order, and the message shown for each
+# (None means the error text is already user-friendly)
+_ERROR_MESSAGES: Dict[str, Optional[str]] = {
+    # Usage limit error - already user-friendly from integration.py
+    "usage limit reached": None,
+    # Tool validation error - already handled in facade.py
+    "tool not allowed": None,
+    "no conversation found": (
+        "🔄 **Session Not Found**\n\n"
+        "The Claude session could not be found or has expired.\n\n"
+        "**What you can do:**\n"
+        "• Use `/new` to start a fresh session\n"
+        "• Try your request again\n"
+        "• Use `/status` to check your current session"
+    ),
+    "rate limit": (
+        "⏱️ **Rate Limit Reached**\n\n"
+        "Too many requests in a short time period.\n\n"
+        "**What you can do:**\n"
+        "• Wait a moment before trying again\n"
+        "• Use simpler requests\n"
+        "• Check your current usage with `/status`"
+    ),
+    "timeout": (
+        "⏰ **Request Timeout**\n\n"
+        "Your request took too long to process and timed out.\n\n"
+        "**What you can do:**\n"
+        "• Try breaking down your request into smaller parts\n"
+        "• Use simpler commands\n"
+        "• Try again in a moment"
+    ),
+}
+_ERROR_PATTERN = re.compile("|".join(map(re.escape, _ERROR_MESSAGES)), re.IGNORECASE)
+
+# Icons that mark a formatted response as an error
+_ERROR_ICON_PATTERN = re.compile("[❌🚫]")
+
+
 def _format_error_message(error_str: str) -> str:
     """Format error messages for user-friendly display."""
-    if "usage limit reached" in error_str.lower():
-        # Usage limit error - already user-friendly from integration.py
-        return error_str
-    elif "tool not allowed" in error_str.lower():
-        # Tool validation error - already handled in facade.py
-        return error_str
-    elif "no conversation found" in error_str.lower():
-        return (
-            f"🔄 **Session Not Found**\n\n"
-            f"The Claude session could not be found or has expired.\n\n"
-            f"**What you can do:**\n"
-            f"• Use `/new` to start a fresh session\n"
-            f"• Try your request again\n"
-            f"• Use `/status` to check your current session"
-        )
-    elif "rate limit" in error_str.lower():
-        return (
-            f"⏱️ **Rate Limit Reached**\n\n"
-            f"Too many requests in a short time period.\n\n"
-            f"**What you can do:**\n"
-            f"• Wait a moment before trying again\n"
-            f"• Use simpler requests\n"
-            f"• Check your current usage with `/status`"
-        )
-    elif "timeout" in error_str.lower():
-        return (
-            f"⏰ **Request Timeout**\n\n"
-            f"Your request took too long to process and timed out.\n\n"
-            f"**What you can do:**\n"
-            f"• Try breaking down your request into smaller parts\n"
-            f"• Use simpler commands\n"
-            f"• Try again in a moment"
-        )
-    else:
-        # Generic error handling
-        return (
-            f"❌ **Claude Code Error**\n\n"
-            f"Failed to process your request: {error_str}\n\n"
-            f"Please try again or contact the administrator if the problem persists."
-        )
+    # One scan finds every known substring; the table order decides which wins
+    found = {match.group(0).lower() for match in _ERROR_PATTERN.finditer(error_str)}
+    for key, message in _ERROR_MESSAGES.items():
+        if key in found:
+            return error_str if message is None else message
+
+    # Generic error handling
+    return (
+        f"❌ **Claude Code Error**\n\n"
+        f"Failed to process your request: {error_str}\n\n"
+        f"Please try again or contact the administrator if the problem persists."
+    )
 
 
 async def handle_text_message(
@@ -174,16 +429,18 @@ async def handle_text_message(
             )
             return
 
+        # Reply right away; streamed output replaces this placeholder
+        placeholder = await update.message.reply_text(
+            STREAM_PLACEHOLDER, parse_mode="Markdown"
+        )
+
         # Get current directory
         current_dir = ContextManager.get_current_directory(update, context, settings)
 
         # Update pinned status message (initial - ready state)
         try:
-            features = context.bot_data.get("features")
-            git_integration = features.get_git_integration() if features else None
-            
-            from ..features.status_pin import PinnedMessageManager
-            pinned_manager = PinnedMessageManager(git_integration=git_integration)
+            from ..features.status_pin import get_pinned_message_manager
+            pinned_manager = get_pinned_message_manager(context)
             
             # Update to processing status
             ContextManager.set_current_status(update, context, "processing")
@@ -202,236 +459,385 @@ async def handle_text_message(
         # Get existing session ID
         session_id = ContextManager.get_session_id(update, context)
 
-        # Enhanced stream updates handler with progress tracking and text streaming
-        import time
+        # Checked once per message so per-event debug logs cost nothing when off
+        debug_enabled = _stdlib_logger.isEnabledFor(logging.DEBUG)
+        # Loop clock shared by the stream and typing tasks
+        now = asyncio.get_running_loop().time
         
-        # Stream handler for real-time updates
+        # Stream state shared by the handler, the flusher and the typing task
         stream_state = {
-            "last_update_time": 0,
-            "current_message": None,
-            "last_typing_time": 0,
-            "events": [],  # Chronological list of {type: "tool"|"text", ...}
-            "update_lock": asyncio.Lock(),
+            "accumulated_text": "",  # Full text of the last render
+            "events": deque(),  # Chronological {type: "tool"|"text", ...} dicts
+            "retired_text": "",  # Rendered text of events dropped from "events"
+            "retired_count": 0,
+            "messages": [placeholder], # List of message objects
+            "message_contents": [STREAM_PLACEHOLDER], # Content of each message
+            "dirty": asyncio.Event(),  # Set when events changed since last flush
+            "stale": [],  # Events whose "rendered" text must be rebuilt
+            "flipped": [],  # Rendered tools that finished since the last flush
+            "tool_count": 0,
+            "tool_index": {},  # Tool events by tool call id
+            "failed_chunk": None,  # First chunk whose last edit failed
+            "use_plain": False,  # Set once Telegram rejects the Markdown
+            "last_visible_edit": 0.0,  # Loop time of the last successful edit
         }
 
+        # Stream handler for real-time updates
+
         async def stream_handler(update_obj: StreamUpdate):
+            """Record a stream event; the flusher task renders it."""
             nonlocal stream_state
             try:
-                current_time = asyncio.get_event_loop().time()
-                
                 # Log all events for debugging
-                logger.debug("Stream event", type=update_obj.type, has_content=bool(update_obj.content), has_tools=bool(update_obj.tool_calls))
+                if debug_enabled:
+                    logger.debug(
+                        "Stream event",
+                        type=update_obj.type,
+                        has_content=bool(update_obj.content),
+                        has_tools=bool(update_obj.tool_calls),
+                    )
                 
                 # Handle different update types
                 if update_obj.type == "assistant" and update_obj.tool_calls:
                     # Tool call - add to events with input data
                     for tool_call in update_obj.tool_calls:
-                        logger.info("Tool call received", name=tool_call.get("name"), input=tool_call.get("input"))
-                        stream_state["events"].append({
+                        stream_state["tool_count"] += 1
+                        event = {
                             "type": "tool",
                             "name": tool_call.get("name"),
                             "input": tool_call.get("input", {}),
                             "id": tool_call.get("id"),
-                            "status": "running"
-                        })
+                            "status": "running",
+                            "number": stream_state["tool_count"],
+                            "index": stream_state["retired_count"]
+                            + len(stream_state["events"]),
+                            "rendered": None,
+                        }
+                        stream_state["events"].append(event)
+                        stream_state["stale"].append(event)
+                        # Calls without an id still need an entry for the
+                        # final "result" sweep
+                        key = event["id"] if event["id"] is not None else event["index"]
+                        stream_state["tool_index"][key] = event
                     
-                    await _update_stream_message()
+                    logger.info(
+                        "Tool calls received",
+                        count=len(update_obj.tool_calls),
+                        names=update_obj.get_tool_names(),
+                    )
+                    if debug_enabled:
+                        logger.debug(
+                            "Tool call inputs",
+                            inputs=[c.get("input") for c in update_obj.tool_calls],
+                        )
+                    stream_state["dirty"].set()
                 
                 elif update_obj.type == "tool_result" and update_obj.tool_calls:
                     # Tool finished - update status
+                    tool_index = stream_state["tool_index"]
                     for result in update_obj.tool_calls:
-                        tool_id = result.get("tool_use_id")
-                        for event in stream_state["events"]:
-                            if event["type"] == "tool" and event.get("id") == tool_id:
-                                event["status"] = "done"
-                                break
+                        event = tool_index.get(result.get("tool_use_id"))
+                        if event and event["status"] == "running":
+                            _mark_done(event)
                     
-                    await _update_stream_message()
+                    stream_state["dirty"].set()
 
                 elif update_obj.type == "result":
                     # Mark ALL running tools as complete (SDK sends one result after all tools finish)
                     # This is a fallback in case we missed individual updates
-                    for event in stream_state["events"]:
-                        if event["type"] == "tool" and event["status"] == "running":
-                            event["status"] = "done"
+                    for event in stream_state["tool_index"].values():
+                        if event["status"] == "running":
+                            _mark_done(event)
                     
-                    await _update_stream_message()
+                    stream_state["dirty"].set()
                         
                 elif update_obj.type == "assistant" and update_obj.content:
                     # Text content - append to last text event or create new one
                     new_content = update_obj.content
                     
                     # Text update - merge with previous if it was text
-                    if stream_state["events"] and stream_state["events"][-1]["type"] == "text":
-                        stream_state["events"][-1]["content"] += update_obj.content
+                    events = stream_state["events"]
+                    if events and events[-1]["type"] == "text":
+                        event = events[-1]
+                        event["content"] += update_obj.content
+                        event["rendered"] = None
                     else:
-                        stream_state["events"].append({
+                        # Text after tool calls is set off by a separator
+                        event = {
                             "type": "text",
-                            "content": update_obj.content
-                        })
+                            "content": update_obj.content,
+                            "after_tool": bool(events),
+                            "index": stream_state["retired_count"] + len(events),
+                            "rendered": None,
+                        }
+                        events.append(event)
+                    stream_state["stale"].append(event)
                     
-                    # Throttling for text updates (0.5s or 50+ chars)
-                    if (current_time - stream_state["last_update_time"] >= 0.5) or len(update_obj.content) > 50:
-                        await _update_stream_message()
-                        stream_state["last_update_time"] = current_time
+                    stream_state["dirty"].set()
                             
             except Exception as e:
-                logger.warning("Failed to update stream", error=str(e), error_type=type(e).__name__)
-                # If it's a Markdown parsing error, try to send without parse_mode
-                if "Can't parse entities" in str(e):
-                    logger.info("Detected Markdown parsing error, retrying without parse_mode")
-                    try:
-                        # Use the last known accumulated text for retry
-                        content_for_retry = stream_state["accumulated_text"]
-                        if not stream_state.get("current_message"):
-                            logger.info("Creating new message without parse_mode")
-                            stream_state["current_message"] = await update.message.reply_text(
-                                content_for_retry,
-                                parse_mode=None,
-                            )
-                        else:
-                            logger.info("Editing existing message without parse_mode", content_preview=content_for_retry[:100])
-                            await stream_state["current_message"].edit_text(
-                                content_for_retry,
-                                parse_mode=None,
-                            )
-                        logger.info("Successfully sent message without parse_mode")
-                    except Exception as retry_error:
-                        logger.error("Failed to update stream even without parse_mode", error=str(retry_error))
-        
-        # Initialize stream state
-        stream_state = {
-            "accumulated_text": "",
-            "events": [],  # List of {type: "tool"|"text", ...}
-            "messages": [], # List of message objects
-            "message_contents": [], # List of content strings corresponding to messages
-            "update_lock": asyncio.Lock(),
-            "update_pending": False
-        }
+                logger.warning(
+                    "Failed to process stream event",
+                    error=str(e),
+                    error_type=type(e).__name__,
+                )
         
-        # Tool icons mapping
-        TOOL_ICONS = {
-            "Bash": "💻",
-            "Read": "📄", 
-            "ReadFile": "📄",
-            "Write": "✏️",
-            "WriteFile": "✏️", 
-            "Edit": "📝",
-            "EditFile": "📝",
-            "Glob": "🔍",
-            "LS": "📂",
-            "ls": "📂",
-        }
+        def _mark_done(event):
+            """Mark a running tool finished.
+
+            Tools already on screen only need their status icon swapped, so
+            they are queued for _patch_status_flips instead of a re-render.
+            """
+            event["status"] = "done"
+            if event["rendered"] is not None:
+                stream_state["flipped"].append(event)
+            # Otherwise the event is still stale and renders as done
+
+        def _patch_status_flips():
+            """Swap the status icon of flipped tools in the sent chunks.
+
+            Both icons are one character, so no other text moves and only the
+            chunks holding a flipped line change.
+
+            Returns:
+                New content by chunk index, or None if a full render is needed
+            """
+            contents = stream_state["message_contents"]
+            patched = {}
+            for event in stream_state["flipped"]:
+                if "offset" not in event:
+                    return None
+                icon_at = event["offset"] + len(f"{event['number']}. ")
+                i, pos = divmod(icon_at, STREAM_CHUNK_SIZE)
+                if i >= len(contents):
+                    return None
+                chunk = patched.get(i, contents[i])
+                if chunk[pos : pos + 1] != "⏳":
+                    return None
+                patched[i] = chunk[:pos] + "✓" + chunk[pos + 1 :]
+            for event in stream_state["flipped"]:
+                event["rendered"] = event["rendered"].replace("⏳", "✓", 1)
+            return patched
+
+        def _retire_old_events():
+            """Drop finished events beyond MAX_STREAM_EVENTS, keeping their text.
+
+            Their rendered text moves into retired_text, so the output is
+            unchanged while tool inputs (which can hold whole files) are freed.
+            """
+            events = stream_state["events"]
+            retired = []
+            while len(events) > MAX_STREAM_EVENTS and (
+                events[0]["type"] == "text" or events[0]["status"] == "done"
+            ):
+                event = events.popleft()
+                retired.append(event["rendered"])
+                if event["type"] == "tool":
+                    key = event["id"] if event["id"] is not None else event["index"]
+                    stream_state["tool_index"].pop(key, None)
+            if retired:
+                retired.append("")
+                stream_state["retired_text"] += "\n".join(retired)
+                stream_state["retired_count"] += len(retired) - 1
+
+        def _outgoing(chunk):
+            """Get the text and parse mode to send a chunk with.
+
+            After a Markdown error everything goes out as stripped plain text.
+            """
+            if stream_state["use_plain"]:
+                return chunk.translate(_MD_STRIP), None
+            return chunk, "Markdown"
+
+        async def _send_edits(edits):
+            """Concurrently edit sent messages given (chunk index, content) pairs."""
+            messages = stream_state["messages"]
+            contents = stream_state["message_contents"]
+
+            def edit(i, chunk):
+                text, parse_mode = _outgoing(chunk)
+                return messages[i].edit_text(text, parse_mode=parse_mode)
+
+            results = await asyncio.gather(
+                *(edit(i, chunk) for i, chunk in edits), return_exceptions=True
+            )
+            for (i, chunk), result in zip(edits, results):
+                if isinstance(result, Exception):
+                    # Retry on the next flush, as plain text if the
+                    # Markdown was rejected
+                    if "Can't parse entities" in str(result):
+                        stream_state["use_plain"] = True
+                    if stream_state["failed_chunk"] is None:
+                        stream_state["failed_chunk"] = i
+                else:
+                    contents[i] = chunk
+                    stream_state["last_visible_edit"] = now()
+
+        async def _update_stream_message(force=False):
+            """Update the stream message with current events in chronological order.
 
-        async def _update_stream_message():
-            """Helper to update the stream message with current events in chronological order."""
+            Args:
+                force: Resend chunks that previously failed even if no event
+                    changed since the last flush
+            """
             nonlocal stream_state
             
-            # Acquire lock to prevent concurrent updates
-            async with stream_state["update_lock"]:
-                if not stream_state["events"]:
-                    return  # Nothing to show yet
-                
-                # Build message from events in chronological order
-                message_parts = []
-                tool_counter = 0
-                has_separator = False
-                
-                for event in stream_state["events"]:
-                    if event["type"] == "tool":
-                        tool_counter += 1
-                        status_icon = "⏳" if event["status"] == "running" else "✓"
-                        
-                        # Format tool with icon and details
-                        tool_name = event["name"]
-                        tool_input = event.get("input", {})
-                        type_icon = TOOL_ICONS.get(tool_name, "🔧")
-                        
-                        details = ""
-                        if tool_name == "Bash" and "command" in tool_input:
-                            cmd = tool_input["command"].strip()
-                            if len(cmd) > 40:
-                                cmd = cmd[:37] + "..."
-                            details = f": `{cmd}`"
-                        elif tool_name in ["Read", "ReadFile", "Write", "WriteFile", "Edit", "EditFile"]:
-                            # Try different keys for path
-                            path = tool_input.get("path") or tool_input.get("file_path") or tool_input.get("file")
-                            if not path and "paths" in tool_input:
-                                paths = tool_input["paths"]
-                                if isinstance(paths, list) and paths:
-                                    path = paths[0] + (f" (+{len(paths)-1})" if len(paths) > 1 else "")
-                            
-                            if path:
-                                details = f": `{path}`"
-                            else:
-                                # Debug: show keys if no path found
-                                logger.warning("No path found in tool input", tool=tool_name, keys=list(tool_input.keys()))
-                                
-                        elif tool_name in ["Glob"]:
-                            pattern = tool_input.get("pattern") or tool_input.get("include")
-                            if pattern:
-                                details = f": `{pattern}`"
-                            
-                        message_parts.append(f"{tool_counter}. {status_icon} {type_icon} **{tool_name}**{details}")
-                        has_separator = False
-                    elif event["type"] == "text":
-                        # Add separator before text if there were tools before and no separator yet
-                        if tool_counter > 0 and not has_separator:
-                            message_parts.append("\n---\n")
-                            has_separator = True
-                        message_parts.append(event["content"])
-                
-                combined_text = "\n".join(message_parts)
-                
-                if not combined_text.strip():
+            stale = stream_state["stale"]
+            flipped = stream_state["flipped"]
+            if flipped:
+                # Tools that only finished are patched into the sent text,
+                # unless other changes need a full render anyway
+                patched = None
+                if not stale and not force and stream_state["failed_chunk"] is None:
+                    patched = _patch_status_flips()
+                if patched is None:
+                    for event in flipped:
+                        event["rendered"] = None
+                    stale.extend(flipped)
+                flipped.clear()
+                if patched is not None:
+                    await _send_edits(list(patched.items()))
                     return
+            if not stale and not force and stream_state["failed_chunk"] is None:
+                return  # Nothing changed since the last flush
+            
+            # Re-render only events that are new or changed since last time
+            events = stream_state["events"]
+            first_changed = min(
+                (event["index"] for event in stale),
+                default=stream_state["retired_count"] + len(events),
+            )
+            for event in stale:
+                if event["rendered"] is None:
+                    event["rendered"] = _render_stream_event(event)
+            stale.clear()
+            
+            # Write the text in one pass, recording where each event starts
+            # for patching status flips
+            retired_text = stream_state["retired_text"]
+            buf = io.StringIO()
+            offset = buf.write(retired_text)
+            for n, event in enumerate(events):
+                if n:
+                    offset += buf.write("\n")
+                event["offset"] = offset
+                offset += buf.write(event["rendered"])
+            combined_text = buf.getvalue()
+            
+            if not combined_text.strip():
+                return
+            stream_state["accumulated_text"] = combined_text
+
+            # Chunks are fixed slices of the text, so only those from the
+            # first changed event onward can differ from what was sent; also
+            # revisit chunks whose edit failed or that were never sent
+            live_changed = max(first_changed - stream_state["retired_count"], 0)
+            if live_changed < len(events):
+                changed_from = events[live_changed]["offset"]
+            else:
+                changed_from = len(combined_text)
+            _retire_old_events()
+            start_chunk = min(
+                changed_from // STREAM_CHUNK_SIZE, len(stream_state["messages"])
+            )
+            if stream_state["failed_chunk"] is not None:
+                start_chunk = min(start_chunk, stream_state["failed_chunk"])
+                stream_state["failed_chunk"] = None
+
+            # Most replies fit in one message, which needs no slicing
+            if len(combined_text) <= STREAM_CHUNK_SIZE:
+                chunks = ((0, combined_text),)
+            else:
+                offsets = range(
+                    start_chunk * STREAM_CHUNK_SIZE,
+                    len(combined_text),
+                    STREAM_CHUNK_SIZE,
+                )
+                chunks = (
+                    (i, combined_text[offset : offset + STREAM_CHUNK_SIZE])
+                    for i, offset in enumerate(offsets, start_chunk)
+                )
 
-                # Split text into chunks (Telegram limit is 4096, use 4000 for safety)
-                CHUNK_SIZE = 4000
-                chunks = [combined_text[i:i+CHUNK_SIZE] for i in range(0, len(combined_text), CHUNK_SIZE)]
-                
-                # Update or send messages for each chunk
-                for i, chunk in enumerate(chunks):
-                    # Check if we have a message for this chunk
-                    if i < len(stream_state["messages"]):
-                        # Only edit if content changed
-                        if i < len(stream_state["message_contents"]) and stream_state["message_contents"][i] == chunk:
-                            continue
-                            
-                        try:
-                            await stream_state["messages"][i].edit_text(
-                                chunk,
-                                parse_mode="Markdown",
-                            )
-                            # Update stored content
-                            if i < len(stream_state["message_contents"]):
-                                stream_state["message_contents"][i] = chunk
-                            else:
-                                stream_state["message_contents"].append(chunk)
-                        except Exception:
-                            pass  # Ignore if same content or other error
-                    else:
-                        # Send new message
-                        msg = await update.message.reply_text(
-                            chunk,
-                            parse_mode="Markdown",
-                        )
-                        stream_state["messages"].append(msg)
-                        stream_state["message_contents"].append(chunk)
+            # Sort chunks into edits of existing messages and new messages
+            messages = stream_state["messages"]
+            contents = stream_state["message_contents"]
+            edits = []
+            new_chunks = []
+            for i, chunk in chunks:
+                if i < len(messages):
+                    # Only edit if content changed
+                    previous = contents[i]
+                    if len(previous) != len(chunk) or previous != chunk:
+                        edits.append((i, chunk))
+                else:
+                    new_chunks.append(chunk)
 
+            # Edits are independent, so they go out concurrently
+            if edits:
+                await _send_edits(edits)
 
-        # Background task to keep typing status active
+            # New messages are sent in order so they appear in sequence
+            for chunk in new_chunks:
+                text, parse_mode = _outgoing(chunk)
+                try:
+                    msg = await update.message.reply_text(
+                        text, parse_mode=parse_mode
+                    )
+                except Exception as e:
+                    if parse_mode is None or "Can't parse entities" not in str(e):
+                        raise
+                    stream_state["use_plain"] = True
+                    text, parse_mode = _outgoing(chunk)
+                    msg = await update.message.reply_text(
+                        text, parse_mode=parse_mode
+                    )
+                messages.append(msg)
+                contents.append(chunk)
+                stream_state["last_visible_edit"] = now()
+
+        async def _flush_stream(final=False):
+            """Render pending events, logging failures rather than raising.
+
+            Failed edits are retried on the next flush, as plain text once
+            Telegram rejected the Markdown; the final flush retries them
+            right away, since no other flush follows it.
+            """
+            try:
+                await _update_stream_message()
+                if final and stream_state["failed_chunk"] is not None:
+                    await _update_stream_message(force=True)
+            except Exception as e:
+                logger.warning(
+                    "Failed to update stream",
+                    error=str(e),
+                    error_type=type(e).__name__,
+                )
+
+        async def stream_flusher():
+            """Coalesce stream events into at most one edit per flush interval."""
+            dirty = stream_state["dirty"]
+            while True:
+                await dirty.wait()
+                await asyncio.sleep(STREAM_FLUSH_INTERVAL)
+                dirty.clear()
+                await _flush_stream()
+
+        # Background task to keep typing status active while nothing visible
+        # has been sent recently (a fresh edit already shows progress)
         async def keep_typing():
             try:
                 while True:
-                    await update.message.chat.send_action("typing")
-                    await asyncio.sleep(4)
+                    await asyncio.sleep(TYPING_INTERVAL)
+                    idle = now() - stream_state["last_visible_edit"]
+                    if idle > TYPING_INTERVAL:
+                        await update.message.chat.send_action("typing")
             except asyncio.CancelledError:
                 pass
             except Exception as e:
                 logger.warning("Typing task failed", error=str(e))
 
         typing_task = asyncio.create_task(keep_typing())
+        flusher_task = asyncio.create_task(stream_flusher())
 
         # Run Claude command
         try:
@@ -441,6 +847,7 @@ async def handle_text_message(
                 user_id=user_id,
                 session_id=session_id,
                 on_stream=stream_handler,
+                system_prompt=_bot_system_prompt(settings),
             )
 
             # Update session ID
@@ -451,18 +858,19 @@ async def handle_text_message(
                 claude_response, update, context, settings, user_id
             )
 
-            # Log interaction to storage
+            # Log interaction to storage without holding up the reply
             if storage:
-                try:
-                    await storage.save_claude_interaction(
+                task = asyncio.create_task(
+                    storage.save_claude_interaction(
                         user_id=user_id,
                         session_id=claude_response.session_id,
                         prompt=message_text,
                         response=claude_response,
                         ip_address=None,  # Telegram doesn't provide IP
                     )
-                except Exception as e:
-                    logger.warning("Failed to log interaction to storage", error=str(e))
+                )
+                _background_tasks.add(task)
+                task.add_done_callback(_on_interaction_saved)
 
             # Update pinned status to ready
             try:
@@ -488,13 +896,11 @@ async def handle_text_message(
                 blocked_tools=e.blocked_tools,
             )
             # Error message already formatted, create FormattedMessage
-            from ..utils.formatting import FormattedMessage
             formatted_messages = [FormattedMessage(str(e), parse_mode="Markdown")]
             
         except Exception as e:
             # Generic error
             logger.error("Error running Claude command", error=str(e), user_id=user_id)
-            from ..utils.formatting import FormattedMessage
             
             # Update pinned status to error
             try:
@@ -519,24 +925,25 @@ async def handle_text_message(
             ]
 
         finally:
-            # Stop typing task
+            # Stop typing and flusher tasks, then show the final stream state
             typing_task.cancel()
-            try:
-                await typing_task
-            except asyncio.CancelledError:
-                pass
+            flusher_task.cancel()
+            for task in (typing_task, flusher_task):
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+            await _flush_stream(final=True)
 
             # Format response if not already formatted (success case)
             if 'formatted_messages' not in locals():
                 if 'claude_response' in locals():
-                    from ..utils.formatting import ResponseFormatter
-                    formatter = ResponseFormatter(settings)
+                    formatter = _get_formatter(context, settings)
                     formatted_messages = formatter.format_claude_response(
                         claude_response.content
                     )
                 else:
                     # Fallback if claude_response is not defined (should be handled by except blocks, but just in case)
-                    from ..utils.formatting import FormattedMessage
                     formatted_messages = [
                         FormattedMessage(
                             "❌ **Error**\n\nFailed to get response from Claude.",
@@ -549,13 +956,23 @@ async def handle_text_message(
         should_send = False
         if 'formatted_messages' in locals():
             # Check if it's an error message
-            if any(icon in msg.text for msg in formatted_messages for icon in ["❌", "🚫"]):
+            if any(_ERROR_ICON_PATTERN.search(msg.text) for msg in formatted_messages):
+                should_send = True
+            # Or if we didn't stream anything over the placeholder
+            elif not stream_state["accumulated_text"]:
                 should_send = True
-            # Or if we didn't stream any messages (no messages were sent via streaming)
-            elif not stream_state.get("messages"):
+            # Or if the streamed reply could not be shown in full
+            elif stream_state["failed_chunk"] is not None:
                 should_send = True
 
         if should_send:
+            if stream_state["message_contents"][0] == STREAM_PLACEHOLDER:
+                # The placeholder was never replaced; the response takes its place
+                try:
+                    await placeholder.delete()
+                except Exception as e:
+                    logger.debug("Failed to delete placeholder", error=str(e))
+
             for i, message in enumerate(formatted_messages):
                 try:
                     try:
@@ -676,12 +1093,205 @@ async def handle_text_message(
         logger.error("Error processing text message", error=str(e), user_id=user_id)
 
 
+async def _download_capped(
+    file: File,
+    file_size: Optional[int],
+    limit: int,
+    client: Optional[httpx.AsyncClient] = None,
+) -> Tuple[bytearray, bool]:
+    """Download a Telegram file, stopping after ``limit`` bytes.
+
+    Files known to fit, and files served locally by a self-hosted Bot API
+    server, are downloaded as usual; larger ones are streamed so the part
+    that would be truncated anyway is never fetched.
+
+    Args:
+        client: Shared HTTP client to stream with; a temporary one is used
+            if not given
+
+    Returns:
+        The downloaded bytes and whether they are the whole file
+    """
+    fits = file_size is not None and file_size <= limit
+    if fits or not file.file_path.startswith(("http://", "https://")):
+        return await file.download_as_bytearray(), True
+
+    if client is None:
+        async with httpx.AsyncClient() as client:
+            return await _download_capped(file, file_size, limit, client)
+
+    buf = bytearray()
+    try:
+        async with client.stream("GET", file.file_path) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                buf += chunk
+                if len(buf) >= limit:
+                    del buf[limit:]
+                    return buf, False
+    except httpx.HTTPStatusError as e:
+        # The file URL contains the bot token, so it must not reach the
+        # error message shown to the user and logged
+        raise NetworkError(
+            f"File download failed with HTTP {e.response.status_code}"
+        ) from None
+    except httpx.HTTPError as e:
+        raise NetworkError(f"File download failed ({type(e).__name__})") from None
+    return buf, True
+
+
+def _decode_and_build_prompt(
+    file_bytes: Union[bytes, bytearray],
+    file_name: str,
+    caption: str,
+    max_len: int,
+    complete: bool = True,
+) -> Optional[str]:
+    """Build a Claude prompt from an uploaded file's contents.
+
+    Args:
+        file_bytes: Raw file contents
+        file_name: Name of the uploaded file
+        caption: User's request about the file
+        max_len: Maximum number of characters of content to include
+        complete: False if file_bytes is only the start of the file, which
+            may end partway through a character
+
+    Returns:
+        Prompt with the (possibly truncated) contents, or None if the file
+        is not UTF-8 text
+    """
+    # A UTF-8 character is at most 4 bytes, so nothing past this is shown
+    byte_limit = max_len * 4
+    if len(file_bytes) > byte_limit:
+        file_bytes = memoryview(file_bytes)[:byte_limit]
+        complete = False
+
+    try:
+        # Binary files almost always fail within the first few KB; check
+        # those before decoding (and allocating for) the rest
+        if len(file_bytes) > DECODE_PROBE_SIZE:
+            codecs.getincrementaldecoder("utf-8")().decode(
+                file_bytes[:DECODE_PROBE_SIZE]
+            )
+        content = codecs.getincrementaldecoder("utf-8")().decode(
+            file_bytes, final=complete
+        )
+    except UnicodeDecodeError:
+        return None
+
+    if len(content) > max_len or not complete:
+        content = content[:max_len] + "\n... (file truncated for processing)"
+
+    return f"{caption}\n\n**File:** `{file_name}`\n\n```\n{content}\n```"
+
+
+async def _show_phase(message: Any, text: str, shown_at: float) -> float:
+    """Edit a progress message to show a new phase.
+
+    Telegram allows about one edit per second per chat, so a phase shown
+    within PROGRESS_EDIT_INTERVAL of the previous one is skipped.
+
+    Args:
+        message: Progress message to edit
+        text: Markdown text of the new phase
+        shown_at: Loop time the message was last sent or edited
+
+    Returns:
+        Loop time the message was last edited
+    """
+    now = asyncio.get_running_loop().time()
+    if now - shown_at < PROGRESS_EDIT_INTERVAL:
+        return shown_at
+    await message.edit_text(text, parse_mode="Markdown")
+    return now
+
+
+async def _send_formatted(
+    update: Update, formatted_messages: List[FormattedMessage]
+) -> None:
+    """Send the parts of a formatted response, the first as a reply.
+
+    Parts go out back to back so they stay in order; instead of a fixed delay
+    between them, a part hitting Telegram's flood control is retried after
+    the wait Telegram asks for.
+    """
+    for i, message in enumerate(formatted_messages):
+        kwargs = dict(
+            parse_mode=message.parse_mode,
+            reply_markup=message.reply_markup,
+            reply_to_message_id=(update.message.message_id if i == 0 else None),
+        )
+        try:
+            await update.message.reply_text(message.text, **kwargs)
+        except RetryAfter as e:
+            delay = e.retry_after
+            if isinstance(delay, timedelta):
+                delay = delay.total_seconds()
+            logger.warning("Flood control hit, retrying", delay=delay, part=i)
+            await asyncio.sleep(delay)
+            await update.message.reply_text(message.text, **kwargs)
+
+
+def _get_upload_cache(
+    context: ContextTypes.DEFAULT_TYPE, settings: Settings, name: str
+) -> Optional[ResponseCache]:
+    """Get a shared file upload cache kept in bot_data, if caching is enabled.
+
+    Args:
+        name: bot_data key of the cache ("response_cache" for Claude's
+            replies, "upload_prompt_cache" for prompts built from files)
+    """
+    if settings.file_response_cache_ttl_seconds <= 0:
+        return None
+    cache = context.bot_data.get(name)
+    if cache is None:
+        cache = ResponseCache(settings.file_response_cache_ttl_seconds, maxsize=512)
+        context.bot_data[name] = cache
+    return cache
+
+
+def _get_formatter(
+    context: ContextTypes.DEFAULT_TYPE, settings: Settings
+) -> ResponseFormatter:
+    """Get the response formatter shared through bot_data, creating it once."""
+    formatter = context.bot_data.get("response_formatter")
+    if formatter is None:
+        formatter = ResponseFormatter(settings)
+        context.bot_data["response_formatter"] = formatter
+    return formatter
+
+
+def _bot_system_prompt(settings: Settings) -> Optional[str]:
+    """Get the system prompt for Claude turns, if caching is enabled."""
+    return BOT_SYSTEM_PROMPT if settings.claude_prompt_cache_enabled else None
+
+
+async def _report_unexpected_upload_error(
+    update: Update, progress_msg: Optional[Any], kind: str
+) -> None:
+    """Tell the user an upload failed, in its progress message if shown."""
+    text = f"❌ **Error processing {kind}**\n\nAn unexpected error occurred."
+    try:
+        if progress_msg:
+            await progress_msg.edit_text(text, parse_mode="Markdown")
+        else:
+            await update.message.reply_text(text, parse_mode="Markdown")
+    except TelegramError as e:
+        logger.warning("Failed to report upload error", error=str(e))
+
+
 async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle file uploads."""
     user_id = update.effective_user.id
     document = update.message.document
     settings: Settings = context.bot_data["settings"]
 
+    # "#nocache" in the caption asks for a fresh reply instead of a cached one
+    caption = update.message.caption or ""
+    use_cache = NO_CACHE_TAG not in caption
+    caption = caption.replace(NO_CACHE_TAG, "").strip() or "Please review this file:"
+
     # Get services
     security_validator: Optional[SecurityValidator] = context.bot_data.get(
         "security_validator"
@@ -696,6 +1306,7 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         file_size=document.file_size,
     )
 
+    progress_msg = None
     try:
         # Validate filename using security validator
         if security_validator:
@@ -738,28 +1349,38 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         # Send processing indicator
         await update.message.chat.send_action("upload_document")
 
+        # One progress message is edited through the phases, then deleted
         progress_msg = await update.message.reply_text(
             f"📄 Processing file: `{document.file_name}`...", parse_mode="Markdown"
         )
+        progress_shown_at = asyncio.get_running_loop().time()
+
+        # A file re-sent with the same caption needs no download; Telegram's
+        # file_unique_id identifies the same file across uploads
+        prompt_cache = _get_upload_cache(context, settings, "upload_prompt_cache")
+        prompt = (
+            prompt_cache.get(document.file_unique_id, caption) if prompt_cache else None
+        )
 
         # Check if enhanced file handler is available
         features = context.bot_data.get("features")
         file_handler = features.get_file_handler() if features else None
 
-        if file_handler:
+        if prompt is not None:
+            logger.info("Reusing prompt for re-uploaded file", user_id=user_id)
+        elif file_handler:
             # Use enhanced file handler
             try:
                 processed_file = await file_handler.handle_document_upload(
-                    document,
-                    user_id,
-                    update.message.caption or "Please review this file:",
+                    document, user_id, caption
                 )
                 prompt = processed_file.prompt
 
                 # Update progress message with file type info
-                await progress_msg.edit_text(
+                progress_shown_at = await _show_phase(
+                    progress_msg,
                     f"📄 Processing {processed_file.type} file: `{document.file_name}`...",
-                    parse_mode="Markdown",
+                    progress_shown_at,
                 )
 
             except Exception as e:
@@ -769,28 +1390,26 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                 )
                 file_handler = None  # Fall back to basic handling
 
-        if not file_handler:
+        if prompt is None and not file_handler:
             # Fall back to basic file handling
             file = await document.get_file()
-            file_bytes = await file.download_as_bytearray()
-
-            # Try to decode as text
-            try:
-                content = file_bytes.decode("utf-8")
-
-                # Check content length
-                max_content_length = 50000  # 50KB of text
-                if len(content) > max_content_length:
-                    content = (
-                        content[:max_content_length]
-                        + "\n... (file truncated for processing)"
-                    )
-
-                # Create prompt with file content
-                caption = update.message.caption or "Please review this file:"
-                prompt = f"{caption}\n\n**File:** `{document.file_name}`\n\n```\n{content}\n```"
+            file_bytes, complete = await _download_capped(
+                file,
+                document.file_size,
+                MAX_FILE_CONTENT_LENGTH * 4,
+                context.bot_data.get("http_client"),
+            )
 
-            except UnicodeDecodeError:
+            # Decoding large files would stall other chats, so it runs in a thread
+            prompt = await asyncio.to_thread(
+                _decode_and_build_prompt,
+                file_bytes,
+                document.file_name,
+                caption,
+                MAX_FILE_CONTENT_LENGTH,
+                complete,
+            )
+            if prompt is None:
                 await progress_msg.edit_text(
                     "❌ **File Format Not Supported**\n\n"
                     "File must be text-based and UTF-8 encoded.\n\n"
@@ -802,19 +1421,18 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                 )
                 return
 
-        # Delete progress message
-        await progress_msg.delete()
+        if prompt_cache:
+            prompt_cache.put(document.file_unique_id, caption, prompt)
 
-        # Create a new progress message for Claude processing
-        claude_progress_msg = await update.message.reply_text(
-            "🤖 Processing file with Claude...", parse_mode="Markdown"
+        progress_shown_at = await _show_phase(
+            progress_msg, "🤖 Processing file with Claude...", progress_shown_at
         )
 
         # Get Claude integration from context
         claude_integration = context.bot_data.get("claude_integration")
 
         if not claude_integration:
-            await claude_progress_msg.edit_text(
+            await progress_msg.edit_text(
                 "❌ **Claude integration not available**\n\n"
                 "The Claude Code integration is not properly configured.",
                 parse_mode="Markdown",
@@ -825,48 +1443,70 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         current_dir = ContextManager.get_current_directory(update, context, settings)
         session_id = ContextManager.get_session_id(update, context)
 
+        # The same file with the same request gets the same review, within a
+        # Claude session that has already seen the file
+        response_cache = None
+        if use_cache:
+            response_cache = _get_upload_cache(context, settings, "response_cache")
+        cached_content = (
+            response_cache.get(f"{user_id}:{session_id}:{current_dir}", prompt)
+            if response_cache and session_id
+            else None
+        )
+
         # Process with Claude
         try:
-            claude_response = await claude_integration.run_command(
-                prompt=prompt,
-                working_directory=current_dir,
-                user_id=user_id,
-                session_id=session_id,
-            )
+            if cached_content is not None:
+                logger.info("Using cached reply to file upload", user_id=user_id)
+                response_content = cached_content
+            else:
+                claude_response = await claude_integration.run_command(
+                    prompt=prompt,
+                    working_directory=current_dir,
+                    user_id=user_id,
+                    session_id=session_id,
+                    system_prompt=_bot_system_prompt(settings),
+                )
+                response_content = claude_response.content
 
-            # Update session ID
-            ContextManager.set_session_id(update, context, claude_response.session_id)
+                # Update session ID
+                ContextManager.set_session_id(
+                    update, context, claude_response.session_id
+                )
 
-            # Check if Claude changed the working directory and update our tracking
-            _update_working_directory_from_claude_response(
-                claude_response, update, context, settings, user_id
-            )
+                # Check if Claude changed the working directory and update our tracking
+                _update_working_directory_from_claude_response(
+                    claude_response, update, context, settings, user_id
+                )
 
-            # Format and send response
-            from ..utils.formatting import ResponseFormatter
+                # Replies that changed something are not cached, since
+                # replaying them would claim changes that never happen
+                if (
+                    response_cache
+                    and not claude_response.is_error
+                    and not any(
+                        tool["name"] in _MUTATING_TOOLS
+                        for tool in claude_response.tools_used
+                    )
+                ):
+                    response_cache.put(
+                        f"{user_id}:{claude_response.session_id}:{current_dir}",
+                        prompt,
+                        response_content,
+                    )
 
-            formatter = ResponseFormatter(settings)
-            formatted_messages = formatter.format_claude_response(
-                claude_response.content
-            )
+            # Format and send response
+            formatter = _get_formatter(context, settings)
+            formatted_messages = formatter.format_claude_response(response_content)
 
             # Delete progress message
-            await claude_progress_msg.delete()
+            await progress_msg.delete()
 
             # Send responses
-            for i, message in enumerate(formatted_messages):
-                await update.message.reply_text(
-                    message.text,
-                    parse_mode=message.parse_mode,
-                    reply_markup=message.reply_markup,
-                    reply_to_message_id=(update.message.message_id if i == 0 else None),
-                )
-
-                if i < len(formatted_messages) - 1:
-                    await asyncio.sleep(0.5)
+            await _send_formatted(update, formatted_messages)
 
-        except Exception as e:
-            await claude_progress_msg.edit_text(
+        except ClaudeError as e:
+            await progress_msg.edit_text(
                 _format_error_message(str(e)), parse_mode="Markdown"
             )
             logger.error("Claude file processing failed", error=str(e), user_id=user_id)
@@ -881,11 +1521,12 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                 file_size=document.file_size,
             )
 
-    except Exception as e:
-        try:
-            await progress_msg.delete()
-        except:
-            pass
+    except _UPLOAD_ERRORS as e:
+        if progress_msg:
+            try:
+                await progress_msg.delete()
+            except TelegramError:
+                pass
 
         error_msg = f"❌ **Error processing file**\n\n{str(e)}"
         await update.message.reply_text(error_msg, parse_mode="Markdown")
@@ -901,6 +1542,10 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             )
 
         logger.error("Error processing document", error=str(e), user_id=user_id)
+    except Exception:
+        # A bug of ours; still answer instead of leaving the progress stuck
+        logger.exception("Unexpected error processing document", user_id=user_id)
+        await _report_unexpected_upload_error(update, progress_msg, "file")
 
 
 async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -913,11 +1558,13 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     image_handler = features.get_image_handler() if features else None
 
     if image_handler:
+        progress_msg = None
         try:
-            # Send processing indicator
+            # Send processing indicator, edited through the phases
             progress_msg = await update.message.reply_text(
                 "📸 Processing image...", parse_mode="Markdown"
             )
+            progress_shown_at = asyncio.get_running_loop().time()
 
             # Get the largest photo size
             photo = update.message.photo[-1]
@@ -927,19 +1574,15 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
                 photo, update.message.caption
             )
 
-            # Delete progress message
-            await progress_msg.delete()
-
-            # Create Claude progress message
-            claude_progress_msg = await update.message.reply_text(
-                "🤖 Analyzing image with Claude...", parse_mode="Markdown"
+            progress_shown_at = await _show_phase(
+                progress_msg, "🤖 Analyzing image with Claude...", progress_shown_at
             )
 
             # Get Claude integration
             claude_integration = context.bot_data.get("claude_integration")
 
             if not claude_integration:
-                await claude_progress_msg.edit_text(
+                await progress_msg.edit_text(
                     "❌ **Claude integration not available**\n\n"
                     "The Claude Code integration is not properly configured.",
                     parse_mode="Markdown",
@@ -957,93 +1600,81 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
                     working_directory=current_dir,
                     user_id=user_id,
                     session_id=session_id,
+                    system_prompt=_bot_system_prompt(settings),
                 )
 
                 # Update session ID
                 ContextManager.set_session_id(update, context, claude_response.session_id)
 
                 # Format and send response
-                from ..utils.formatting import ResponseFormatter
-
-                formatter = ResponseFormatter(settings)
+                formatter = _get_formatter(context, settings)
                 formatted_messages = formatter.format_claude_response(
                     claude_response.content
                 )
 
                 # Delete progress message
-                await claude_progress_msg.delete()
+                await progress_msg.delete()
 
                 # Send responses
-                for i, message in enumerate(formatted_messages):
-                    await update.message.reply_text(
-                        message.text,
-                        parse_mode=message.parse_mode,
-                        reply_markup=message.reply_markup,
-                        reply_to_message_id=(
-                            update.message.message_id if i == 0 else None
-                        ),
-                    )
+                await _send_formatted(update, formatted_messages)
 
-                    if i < len(formatted_messages) - 1:
-                        await asyncio.sleep(0.5)
-
-            except Exception as e:
-                await claude_progress_msg.edit_text(
+            except ClaudeError as e:
+                await progress_msg.edit_text(
                     _format_error_message(str(e)), parse_mode="Markdown"
                 )
                 logger.error(
                     "Claude image processing failed", error=str(e), user_id=user_id
                 )
 
-        except Exception as e:
+        except _UPLOAD_ERRORS as e:
             logger.error("Image processing failed", error=str(e), user_id=user_id)
             await update.message.reply_text(
                 f"❌ **Error processing image**\n\n{str(e)}", parse_mode="Markdown"
             )
+        except Exception:
+            logger.exception("Unexpected error processing image", user_id=user_id)
+            await _report_unexpected_upload_error(update, progress_msg, "image")
     else:
         # Fall back to unsupported message
-        await update.message.reply_text(
-            "📸 **Photo Upload**\n\n"
-            "Photo processing is not yet supported.\n\n"
-            "**Currently supported:**\n"
-            "• Text files (.py, .js, .md, etc.)\n"
-            "• Configuration files\n"
-            "• Documentation files\n\n"
-            "**Coming soon:**\n"
-            "• Image analysis\n"
-            "• Screenshot processing\n"
-            "• Diagram interpretation"
+        await update.message.reply_text(_PHOTO_UNSUPPORTED_MSG, parse_mode="Markdown")
+
+
+# Words that mark a complex request, matched anywhere in the text (so
+# "refactoring" counts as "refactor") in a single pass
+_COMPLEX_KEYWORDS_RE = re.compile(
+    "|".join(
+        (
+            "analyze",
+            "generate",
+            "create",
+            "build",
+            "implement",
+            "refactor",
+            "optimize",
+            "debug",
+            "explain",
+            "document",
         )
+    ),
+    re.IGNORECASE,
+)
 
 
+@functools.lru_cache(maxsize=256)
 def _estimate_text_processing_cost(text: str) -> float:
-    """Estimate cost for processing text message."""
+    """Estimate cost for processing text message.
+
+    Cached because short prompts ("continue", "yes", ...) repeat often.
+    """
     # Base cost
     base_cost = 0.001
 
     # Additional cost based on length
     length_cost = len(text) * 0.00001
 
-    # Additional cost for complex requests
-    complex_keywords = [
-        "analyze",
-        "generate",
-        "create",
-        "build",
-        "implement",
-        "refactor",
-        "optimize",
-        "debug",
-        "explain",
-        "document",
-    ]
-
-    text_lower = text.lower()
-    complexity_multiplier = 1.0
-
-    for keyword in complex_keywords:
-        if keyword in text_lower:
-            complexity_multiplier += 0.5
+    # Additional cost for each distinct complex-request keyword
+    hits = len({match.lower() for match in _COMPLEX_KEYWORDS_RE.findall(text)})
+    complexity_multiplier = 1.0 + 0.5 * hits
 
     return (base_cost + length_cost) * min(complexity_multiplier, 3.0)
 
@@ -1059,6 +1690,63 @@ def _estimate_file_processing_cost(file_size: int) -> float:
     return base_cost + size_cost
 
 
+_WORD_RE = re.compile(r"[a-z]+")
+
+# Placeholder replies by intent, checked in order; each template takes the
+# current directory as {relative_path}
+_PLACEHOLDER_INTENTS: Tuple[Tuple[frozenset, str], ...] = (
+    (
+        frozenset({"list", "show", "see", "directory", "files"}),
+        "🤖 **Claude Code Response** _(Placeholder)_\n\n"
+        "I understand you want to see files. Try using the `/ls` command to "
+        "list files in your current directory (`{relative_path}/`).\n\n"
+        "**Available commands:**\n"
+        "• `/ls` - List files\n"
+        "• `/cd <dir>` - Change directory\n"
+        "• `/projects` - Show projects\n\n"
+        "_Note: Full Claude Code integration will be available in the next phase._",
+    ),
+    (
+        frozenset({"create", "generate", "make", "build"}),
+        "🤖 **Claude Code Response** _(Placeholder)_\n\n"
+        "I understand you want to create something! Once the Claude Code "
+        "integration is complete, I'll be able to:\n\n"
+        "• Generate code files\n"
+        "• Create project structures\n"
+        "• Write documentation\n"
+        "• Build complete applications\n\n"
+        "**Current directory:** `{relative_path}/`\n\n"
+        "_Full functionality coming soon!_",
+    ),
+    (
+        frozenset({"help", "how", "what", "explain"}),
+        "🤖 **Claude Code Response** _(Placeholder)_\n\n"
+        "I'm here to help! Try using `/help` for available commands.\n\n"
+        "**What I can do now:**\n"
+        "• Navigate directories (`/cd`, `/ls`, `/pwd`)\n"
+        "• Show projects (`/projects`)\n"
+        "• Manage sessions (`/new`, `/status`)\n\n"
+        "**Coming soon:**\n"
+        "• Full Claude Code integration\n"
+        "• Code generation and editing\n"
+        "• File operations\n"
+        "• Advanced programming assistance",
+    ),
+)
+
+_PLACEHOLDER_DEFAULT = (
+    "🤖 **Claude Code Response** _(Placeholder)_\n\n"
+    'I received your message: "{preview}"\n\n'
+    "**Current Status:**\n"
+    "• Directory: `{relative_path}/`\n"
+    "• Bot core: ✅ Active\n"
+    "• Claude integration: 🔄 Coming soon\n\n"
+    "Once Claude Code integration is complete, I'll be able to process your "
+    "requests fully and help with coding tasks!\n\n"
+    "For now, try the available commands like `/ls`, `/cd`, and `/help`."
+)
+
+
 async def _generate_placeholder_response(
     message_text: str, context: ContextTypes.DEFAULT_TYPE
 ) -> dict:
@@ -1069,120 +1757,75 @@ async def _generate_placeholder_response(
     )
     relative_path = current_dir.relative_to(settings.approved_directory)
 
-    # Analyze the message for intent
-    message_lower = message_text.lower()
-
-    if any(
-        word in message_lower for word in ["list", "show", "see", "directory", "files"]
-    ):
-        response_text = (
-            f"🤖 **Claude Code Response** _(Placeholder)_\n\n"
-            f"I understand you want to see files. Try using the `/ls` command to list files "
-            f"in your current directory (`{relative_path}/`).\n\n"
-            f"**Available commands:**\n"
-            f"• `/ls` - List files\n"
-            f"• `/cd <dir>` - Change directory\n"
-            f"• `/projects` - Show projects\n\n"
-            f"_Note: Full Claude Code integration will be available in the next phase._"
-        )
-
-    elif any(word in message_lower for word in ["create", "generate", "make", "build"]):
-        response_text = (
-            f"🤖 **Claude Code Response** _(Placeholder)_\n\n"
-            f"I understand you want to create something! Once the Claude Code integration "
-            f"is complete, I'll be able to:\n\n"
-            f"• Generate code files\n"
-            f"• Create project structures\n"
-            f"• Write documentation\n"
-            f"• Build complete applications\n\n"
-            f"**Current directory:** `{relative_path}/`\n\n"
-            f"_Full functionality coming soon!_"
-        )
-
-    elif any(word in message_lower for word in ["help", "how", "what", "explain"]):
-        response_text = (
-            f"🤖 **Claude Code Response** _(Placeholder)_\n\n"
-            f"I'm here to help! Try using `/help` for available commands.\n\n"
-            f"**What I can do now:**\n"
-            f"• Navigate directories (`/cd`, `/ls`, `/pwd`)\n"
-            f"• Show projects (`/projects`)\n"
-            f"• Manage sessions (`/new`, `/status`)\n\n"
-            f"**Coming soon:**\n"
-            f"• Full Claude Code integration\n"
-            f"• Code generation and editing\n"
-            f"• File operations\n"
-            f"• Advanced programming assistance"
-        )
-
+    # Classify the message by the first intent sharing a word with it
+    words = set(_WORD_RE.findall(message_text.lower()))
+    for keywords, template in _PLACEHOLDER_INTENTS:
+        if keywords & words:
+            response_text = template.format(relative_path=relative_path)
+            break
     else:
-        response_text = (
-            f"🤖 **Claude Code Response** _(Placeholder)_\n\n"
-            f"I received your message: \"{message_text[:100]}{'...' if len(message_text) > 100 else ''}\"\n\n"
-            f"**Current Status:**\n"
-            f"• Directory: `{relative_path}/`\n"
-            f"• Bot core: ✅ Active\n"
-            f"• Claude integration: 🔄 Coming soon\n\n"
-            f"Once Claude Code integration is complete, I'll be able to process your "
-            f"requests fully and help with coding tasks!\n\n"
-            f"For now, try the available commands like `/ls`, `/cd`, and `/help`."
+        preview = message_text[:100] + ("..." if len(message_text) > 100 else "")
+        response_text = _PLACEHOLDER_DEFAULT.format(
+            preview=preview, relative_path=relative_path
         )
 
     return {"text": response_text, "parse_mode": "Markdown"}
 
 
+def _is_within(path: str, directory: str) -> bool:
+    """Check a normalized absolute path is the directory or inside it."""
+    return os.path.commonpath((path, directory)) == directory
+
+
 def _update_working_directory_from_claude_response(
     claude_response, update, context, settings, user_id
 ):
     """Update the working directory based on Claude's response content."""
-    import re
-    from pathlib import Path
-
-    # Look for directory changes in Claude's response
-    # This searches for common patterns that indicate directory changes
-    patterns = [
-        r"(?:^|\n).*?cd\s+([^\s\n]+)",  # cd command
-        r"(?:^|\n).*?Changed directory to:?\s*([^\s\n]+)",  # explicit directory change
-        r"(?:^|\n).*?Current directory:?\s*([^\s\n]+)",  # current directory indication
-        r"(?:^|\n).*?Working directory:?\s*([^\s\n]+)",  # working directory indication
-    ]
-
-    content = claude_response.content.lower()
-    current_dir = ContextManager.get_current_directory(update, context, settings)
+    # Only a shell command can have changed directory
+    if not any(tool.get("name") in _SHELL_TOOLS for tool in claude_response.tools_used):
+        return
 
-    for pattern in patterns:
-        matches = re.findall(pattern, content, re.MULTILINE | re.IGNORECASE)
-        for match in matches:
-            try:
-                # Clean up the path
-                new_path = match.strip().strip("\"'`")
-
-                # Handle relative paths
-                if new_path.startswith("./") or new_path.startswith("../"):
-                    new_path = (current_dir / new_path).resolve()
-                elif not new_path.startswith("/"):
-                    # Relative path without ./
-                    new_path = (current_dir / new_path).resolve()
-                else:
-                    # Absolute path
-                    new_path = Path(new_path).resolve()
+    # Paths are matched in the original case; lowercasing would break them
+    content = claude_response.content
 
-                # Validate that the new path is within the approved directory
-                if (
-                    new_path.is_relative_to(settings.approved_directory)
-                    and new_path.exists()
-                ):
-                    ContextManager.set_current_directory(update, context, new_path)
-                    logger.info(
-                        "Updated working directory from Claude response",
-                        old_dir=str(current_dir),
-                        new_dir=str(new_path),
-                        user_id=user_id,
-                    )
-                    return  # Take the first valid match
+    # Most replies never mention a directory change; every pattern contains
+    # one of these words, and substring search is far cheaper than the regex
+    content_lower = content.lower()
+    if not any(word in content_lower for word in _DIR_CHANGE_WORDS):
+        return
 
-            except (ValueError, OSError) as e:
-                # Invalid path, skip this match
-                logger.debug(
-                    "Invalid path in Claude response", path=match, error=str(e)
-                )
+    current_dir = ContextManager.get_current_directory(update, context, settings)
+
+    # Already resolved when settings are loaded
+    approved = str(settings.approved_directory)
+
+    for found in _DIR_CHANGE_RE.finditer(content):
+        match = found[found.lastgroup]
+        try:
+            # Clean up the path; relative paths are taken from the current
+            # directory (joining ignores it for absolute paths)
+            cleaned = match.strip().strip("\"'`")
+            candidate = os.path.normpath(os.path.join(current_dir, cleaned))
+
+            # Most matches are not directories inside the approved one, so
+            # rule them out lexically and with a single stat before
+            # resolving symlinks, which stats every path component
+            if not _is_within(candidate, approved) or not os.path.isdir(candidate):
                 continue
+            new_path = Path(os.path.realpath(candidate))
+
+            # Validate that the new path is within the approved directory
+            if _is_within(str(new_path), approved):
+                ContextManager.set_current_directory(update, context, new_path)
+                logger.info(
+                    "Updated working directory from Claude response",
+                    old_dir=str(current_dir),
+                    new_dir=str(new_path),
+                    user_id=user_id,
+                )
+                return  # Take the first valid match
+
+        except (ValueError, OSError) as e:
+            # Invalid path, skip this match
+            logger.debug("Invalid path in Claude response", path=match, error=str(e))
+            continue
@@ -18,6 +18,26 @@ logger = structlog.get_logger()
 # States
 WAITING_FOR_TOPIC_NAME = 1
 
+MAX_TOPIC_NAME_LENGTH = 128
+
+_PERMISSION_ERROR_MSG = (
+    "❌ **Permission Error**\n\n"
+    "I don't have permission to create topics.\n"
+    "Please promote me to **Admin** with 'Manage Topics' rights."
+)
+_TOPICS_DISABLED_MSG = (
+    "❌ **Topics Not Enabled**\n\n"
+    "This group does not have Topics enabled.\n"
+    "Please enable 'Topics' in Group Settings."
+)
+
+# Replies for known topic creation failures, by text in the (lowercased) error
+_TOPIC_ERRORS = (
+    ("not enough rights", _PERMISSION_ERROR_MSG),
+    ("forum not enabled", _TOPICS_DISABLED_MSG),
+    ("not a forum", _TOPICS_DISABLED_MSG),
+)
+
 
 class CreateTopicHandler:
     """Handler for creating new forum topics."""
@@ -53,14 +73,22 @@ class CreateTopicHandler:
     @staticmethod
     async def handle_topic_name(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Handle the topic name input and create the topic."""
-        topic_name = update.message.text
+        topic_name = update.message.text.strip()
         chat_id = update.effective_chat.id
         user = update.effective_user
 
-        if len(topic_name) > 128:
+        if not topic_name:
+            await update.message.reply_text(
+                "❌ **Name Required**\n\n"
+                "Topic name cannot be empty. Please try again."
+            )
+            return WAITING_FOR_TOPIC_NAME
+
+        if len(topic_name) > MAX_TOPIC_NAME_LENGTH:
             await update.message.reply_text(
                 "❌ **Name Too Long**\n\n"
-                "Topic name must be 128 characters or less. Please try again."
+                f"Topic name must be {MAX_TOPIC_NAME_LENGTH} characters or less. "
+                "Please try again."
             )
             return WAITING_FOR_TOPIC_NAME
 
@@ -94,23 +122,13 @@ class CreateTopicHandler:
 
         except Exception as e:
             error_msg = str(e)
-            if "not enough rights" in error_msg.lower():
-                await update.message.reply_text(
-                    "❌ **Permission Error**\n\n"
-                    "I don't have permission to create topics.\n"
-                    "Please promote me to **Admin** with 'Manage Topics' rights."
-                )
-            elif "forum not enabled" in error_msg.lower() or "not a forum" in error_msg.lower():
-                await update.message.reply_text(
-                    "❌ **Topics Not Enabled**\n\n"
-                    "This group does not have Topics enabled.\n"
-                    "Please enable 'Topics' in Group Settings."
-                )
-            else:
-                await update.message.reply_text(
-                    f"❌ **Error**\n\nFailed to create topic: {error_msg}"
-                )
-            
+            error_lower = error_msg.lower()
+            reply = next(
+                (msg for needle, msg in _TOPIC_ERRORS if needle in error_lower),
+                f"❌ **Error**\n\nFailed to create topic: {error_msg}",
+            )
+            await update.message.reply_text(reply)
+
             logger.error("Failed to create topic", error=error_msg, chat_id=chat_id)
 
         return ConversationHandler.END
@@ -11,6 +11,7 @@ from .agent import ClaudeAgentClient
 from .facade import ClaudeIntegration
 from .monitor import ToolMonitor
 from .parser import OutputParser, ResponseFormatter
+from .response_cache import ResponseCache
 from .session import (
     ClaudeSession,
     InMemorySessionStorage,
@@ -39,4 +40,5 @@ __all__ = [
     "ToolMonitor",
     "OutputParser",
     "ResponseFormatter",
+    "ResponseCache",
 ]
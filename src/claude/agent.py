@@ -4,16 +4,30 @@ Wraps the official claude-agent-sdk to provide a compatible interface for the bo
 """
 
 import asyncio
+import io
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import AsyncIterator, Dict, List, Optional, Union
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterator,
+    Optional,
+    Set,
+    Tuple,
+)
 
 import structlog
 from claude_agent_sdk import (
     AssistantMessage,
     ClaudeAgentOptions,
     ClaudeSDKClient,
+    ClaudeSDKError,
     ResultMessage,
-    SystemMessage,
     TextBlock,
     ToolResultBlock,
     ToolUseBlock,
@@ -21,9 +35,112 @@ from claude_agent_sdk import (
 )
 
 from ..config.settings import Settings
-from .types import ClaudeResponse, StreamUpdate
+from .types import StreamUpdate
 
 logger = structlog.get_logger()
+# Underlying stdlib logger, for cheap level checks on hot paths
+_stdlib_logger = logging.getLogger(__name__)
+
+# Stream updates read ahead of the consumer before reading pauses
+STREAM_QUEUE_SIZE = 32
+# Sessions whose replay state is kept; the least recently used is dropped
+MAX_SESSION_STATES = 256
+# Characters kept from the end of streamed text to recognize it when a
+# longer version of the same block arrives
+TEXT_TAIL_LENGTH = 64
+_NOTHING_SENT = (0, "")
+# Connected clients kept between turns, each running a Claude CLI process
+MAX_POOLED_CLIENTS = 8
+# Seconds a pooled client may sit unused before it is disconnected
+CLIENT_IDLE_TIMEOUT = 600
+
+# Fixed updates, shared by every stream
+_PROGRESS_START = StreamUpdate(
+    type="progress",
+    content="Starting Claude Agent...",
+    progress={"percentage": 0},
+)
+_RESULT_DONE = StreamUpdate(
+    type="result",
+    content="Task completed",
+    progress={"percentage": 100},
+)
+
+# Failures connecting to Claude or sending it a query
+_CONNECTION_ERRORS = (ClaudeSDKError, OSError)
+
+ClientKey = Tuple[str, str]
+
+
+def _error_update(error: Exception) -> StreamUpdate:
+    """Create an error update reporting an exception."""
+    return StreamUpdate(
+        type="error",
+        content=str(error),
+        error_info={"message": str(error)},
+    )
+
+
+@dataclass
+class _PooledClient:
+    """An SDK client kept connected between the turns of a session.
+
+    The client is entered and exited in its own task, since the SDK's task
+    group must be closed by the task that opened it; turns only send
+    queries and read messages.
+    """
+
+    client: ClaudeSDKClient
+    task: "asyncio.Task[None]"
+    closing: asyncio.Event
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    last_used: float = field(default_factory=time.monotonic)
+
+    @classmethod
+    async def open(cls, options: ClaudeAgentOptions) -> "_PooledClient":
+        """Connect a client and keep it connected until closed."""
+        connected: "asyncio.Future[ClaudeSDKClient]" = (
+            asyncio.get_running_loop().create_future()
+        )
+        closing = asyncio.Event()
+
+        async def hold() -> None:
+            try:
+                async with ClaudeSDKClient(options=options) as client:
+                    connected.set_result(client)
+                    await closing.wait()
+            except Exception as e:
+                if not connected.done():
+                    connected.set_exception(e)
+                else:
+                    logger.warning("Claude client disconnected", error=str(e))
+
+        task = asyncio.create_task(hold())
+        try:
+            client = await connected
+        except BaseException:
+            task.cancel()
+            raise
+        return cls(client=client, task=task, closing=closing)
+
+    async def close(self) -> None:
+        """Disconnect the client and wait until it has shut down."""
+        self.closing.set()
+        await asyncio.gather(self.task, return_exceptions=True)
+
+
+@dataclass(slots=True)
+class _SessionState:
+    """What has already been sent for a session, to skip replayed history."""
+
+    # Tool use IDs already sent
+    emitted_ids: Set[str] = field(default_factory=set)
+    # (length, last TEXT_TAIL_LENGTH characters) of the text already sent in
+    # the current turn per segment, keyed by the ID of the tool use preceding
+    # it ("" before the first tool)
+    text_by_id: Dict[str, Tuple[int, str]] = field(default_factory=dict)
+    # Segment the last assistant message ended in
+    segment: str = ""
 
 
 class ClaudeAgentClient:
@@ -33,8 +150,21 @@ class ClaudeAgentClient:
         """Initialize Claude Agent client."""
         self.settings = settings
         # Store state per session to handle history replay
-        # Map session_id -> {"total_blocks_seen": int, "current_text_content": str}
-        self.session_states: Dict[str, Dict[str, Any]] = {}
+        self.session_states: "OrderedDict[str, _SessionState]" = OrderedDict()
+        # Connected clients by (session ID, working directory), least recently
+        # used first
+        self._clients: "OrderedDict[ClientKey, _PooledClient]" = OrderedDict()
+        # Connections in progress, shared by turns that need the same client
+        self._connecting: Dict[ClientKey, "asyncio.Task[_PooledClient]"] = {}
+        # Converters from SDK message types to stream updates, looked up by
+        # exact type; other messages (e.g. SystemMessage) yield nothing
+        self._message_handlers: Dict[
+            type, Callable[[Any, _SessionState], Iterator[StreamUpdate]]
+        ] = {
+            AssistantMessage: self._handle_assistant,
+            UserMessage: self._handle_user,
+            ResultMessage: self._handle_result,
+        }
 
     async def stream_message(
         self,
@@ -42,6 +172,7 @@ class ClaudeAgentClient:
         session_id: str,
         working_directory: Path,
         restart: bool = False,
+        system_prompt: Optional[str] = None,
     ) -> AsyncIterator[StreamUpdate]:
         """Stream a message to Claude and yield updates.
 
@@ -49,139 +180,339 @@ class ClaudeAgentClient:
             message: The message to send
             session_id: The session ID (used for context isolation)
             working_directory: The current working directory
-            restart: Whether to restart the session
+            restart: Whether to reconnect the session's client first
+            system_prompt: Fixed instructions appended to the Claude Code
+                system prompt; kept out of the message so they stay part of
+                the cached prompt prefix. Used when the session's client
+                connects, so it should be the same for every turn
 
         Yields:
             StreamUpdate objects
         """
-        # Configure options
+        # Turns of a session share one connected client (and Claude CLI
+        # process, with the session's history), as long as they run in the
+        # directory it was started in
+        key = (session_id, str(working_directory))
+
+        # Show progress before connecting, the slowest step of a first turn
+        yield _PROGRESS_START
+
+        # Only connecting and sending can fail here; errors while reading
+        # arrive as an error update from the reader task
+        try:
+            pooled = await self._acquire_client(
+                key, working_directory, system_prompt, restart
+            )
+        except _CONNECTION_ERRORS as e:
+            logger.error("Claude Agent error", error=str(e))
+            yield _error_update(e)
+            return
+
+        async with pooled.lock:
+            client = pooled.client
+            pump = None
+            completed = False
+            try:
+                # Send the query
+                try:
+                    await client.query(message)
+                except _CONNECTION_ERRORS as e:
+                    logger.error("Claude Agent error", error=str(e))
+                    yield _error_update(e)
+                    return
+
+                # Read the SDK in a separate task, so it keeps receiving
+                # while updates are handled, up to a bounded number ahead
+                queue: "asyncio.Queue[Optional[StreamUpdate]]" = asyncio.Queue(
+                    maxsize=STREAM_QUEUE_SIZE
+                )
+                pump = asyncio.create_task(
+                    self._pump(self._read_updates(client, session_id), queue)
+                )
+                while (update := await queue.get()) is not None:
+                    yield update
+                completed = await pump
+            finally:
+                if pump:
+                    pump.cancel()
+                pooled.last_used = time.monotonic()
+                # Unread messages of an unfinished turn would be taken as the
+                # reply to the next one
+                if not completed:
+                    await self._close_client(key, pooled)
+
+    def _build_options(
+        self, working_directory: Path, system_prompt: Optional[str]
+    ) -> ClaudeAgentOptions:
+        """Build the SDK options for a new client."""
         options_dict = {
             "cwd": working_directory,
             "allowed_tools": self.settings.claude_allowed_tools,
         }
-        
+
         # Use custom CLI path if configured
         if self.settings.claude_cli_path:
             options_dict["cli_path"] = self.settings.claude_cli_path
             logger.info("Using custom Claude CLI", path=self.settings.claude_cli_path)
-        
-        options = ClaudeAgentOptions(**options_dict)
 
-        # Initialize client
-        try:
-            async with ClaudeSDKClient(options=options) as client:
-                # Send the query
-                await client.query(message)
-                
-                # Yield initial progress
-                yield StreamUpdate(
-                    type="progress",
-                    content="Starting Claude Agent...",
-                    progress={"percentage": 0},
+        if system_prompt:
+            options_dict["system_prompt"] = {
+                "type": "preset",
+                "preset": "claude_code",
+                "append": system_prompt,
+            }
+
+        return ClaudeAgentOptions(**options_dict)
+
+    async def _acquire_client(
+        self,
+        key: ClientKey,
+        working_directory: Path,
+        system_prompt: Optional[str],
+        restart: bool,
+    ) -> "_PooledClient":
+        """Get the connected client for a session, connecting one if needed."""
+        await self._close_idle_clients()
+
+        pooled = self._clients.get(key)
+        if pooled is not None and (restart or pooled.task.done()):
+            await self._close_client(key, pooled)
+            pooled = None
+
+        if pooled is None:
+            # Concurrent turns wait for one connection rather than each
+            # starting a Claude CLI process, only one of which would be kept
+            connecting = self._connecting.get(key)
+            if connecting is None:
+                connecting = asyncio.create_task(
+                    self._connect(key, working_directory, system_prompt)
                 )
+                self._connecting[key] = connecting
+            pooled = await asyncio.shield(connecting)
+        else:
+            self._clients.move_to_end(key)
 
-                # Get or initialize state for this session
-                if session_id not in self.session_states:
-                    self.session_states[session_id] = {
-                        "total_blocks_seen": 0,
-                        "current_text_content": ""
-                    }
-                
-                state = self.session_states[session_id]
-                current_block_index = 0  # Track global block index across all messages
-
-                async for msg in client.receive_messages():
-                    msg_type = type(msg).__name__
-                    logger.info(
-                        "Received SDK message", 
-                        type=msg_type, 
-                    )
-                    
-                    if isinstance(msg, AssistantMessage):
-                        # Process each block
-                        for block in msg.content:
-                            # Skip blocks we've already processed
-                            if current_block_index < state["total_blocks_seen"]:
-                                current_block_index += 1
-                                continue
-                            
-                            if isinstance(block, TextBlock):
-                                # Calculate delta from last text state
-                                delta = block.text[len(state["current_text_content"]):]
-                                if delta:
-                                    yield StreamUpdate(
-                                        type="assistant",
-                                        content=delta,
-                                    )
-                                    state["current_text_content"] = block.text
-                                
-                                # Mark as processed only if it's complete (not the last block being streamed)
-                                # We check if there are more blocks or if this is final
-                                current_block_index += 1
-                                    
-                            elif isinstance(block, ToolUseBlock):
-                                # Yield tool call
-                                yield StreamUpdate(
-                                    type="assistant",
-                                    tool_calls=[{
-                                        "name": block.name,
-                                        "input": block.input,
-                                        "id": block.id,
-                                    }],
-                                )
-                                
-                                # Mark tool block as processed
-                                current_block_index += 1
-                                state["total_blocks_seen"] = current_block_index
-                                state["current_text_content"] = ""  # Reset text state after tool
-
-                    elif isinstance(msg, UserMessage):
-                        # Handle tool results
-                        tool_results = []
-                        for block in msg.content:
-                            if isinstance(block, ToolResultBlock):
-                                tool_results.append({
-                                    "tool_use_id": block.tool_use_id,
-                                    "is_error": block.is_error,
-                                })
-                        
-                        if tool_results:
-                            yield StreamUpdate(
-                                type="tool_result",
-                                tool_calls=tool_results,
-                            )
-
-                    elif isinstance(msg, ResultMessage):
-                        # Update state to mark all blocks as seen
-                        state["total_blocks_seen"] = current_block_index
-                        
-                        if msg.is_error:
-                            yield StreamUpdate(
-                                type="error",
-                                content=str(msg.result),
-                                error_info={"message": str(msg.result)},
-                            )
-                        else:
-                            yield StreamUpdate(
-                                type="result",
-                                content="Task completed",
-                                progress={"percentage": 100},
-                            )
-                        break
+        return pooled
+
+    async def _connect(
+        self, key: ClientKey, working_directory: Path, system_prompt: Optional[str]
+    ) -> "_PooledClient":
+        """Connect a client for a session and add it to the pool."""
+        try:
+            pooled = await _PooledClient.open(
+                self._build_options(working_directory, system_prompt)
+            )
+        finally:
+            del self._connecting[key]
+
+        displaced = self._clients.get(key)
+        self._clients[key] = pooled
+        if displaced is not None:
+            await displaced.close()
+
+        # Drop the least recently used idle clients past the limit
+        for old_key, old in list(self._clients.items()):
+            if len(self._clients) <= MAX_POOLED_CLIENTS:
+                break
+            if old is not pooled and not old.lock.locked():
+                await self._close_client(old_key, old)
+
+        return pooled
+
+    async def _close_client(self, key: ClientKey, pooled: "_PooledClient") -> None:
+        """Disconnect a pooled client and remove it from the pool."""
+        if self._clients.get(key) is pooled:
+            del self._clients[key]
+        await pooled.close()
+
+    async def _close_idle_clients(self) -> None:
+        """Disconnect clients unused for longer than CLIENT_IDLE_TIMEOUT."""
+        now = time.monotonic()
+        for key, pooled in list(self._clients.items()):
+            if not pooled.lock.locked() and (
+                now - pooled.last_used > CLIENT_IDLE_TIMEOUT
+            ):
+                await self._close_client(key, pooled)
 
+    async def close(self) -> None:
+        """Disconnect all pooled clients."""
+        for key, pooled in list(self._clients.items()):
+            await self._close_client(key, pooled)
+
+    def _get_session_state(self, session_id: str) -> _SessionState:
+        """Get or initialize the replay state for a session.
+
+        Only the most recently used MAX_SESSION_STATES sessions are kept.
+        """
+        state = self.session_states.get(session_id)
+        if state is not None:
+            self.session_states.move_to_end(session_id)
+            return state
+
+        state = _SessionState()
+        self.session_states[session_id] = state
+        if len(self.session_states) > MAX_SESSION_STATES:
+            self.session_states.popitem(last=False)
+        return state
+
+    @staticmethod
+    async def _pump(
+        updates: AsyncIterator[StreamUpdate],
+        queue: "asyncio.Queue[Optional[StreamUpdate]]",
+    ) -> bool:
+        """Move updates into the queue, then a None marking the end.
+
+        Blocks while the queue is full, so reading from the SDK pauses
+        until the consumer catches up. A failure is reported as a final
+        error update.
+
+        Returns:
+            Whether all updates were read without error
+        """
+        try:
+            async for update in updates:
+                await queue.put(update)
         except Exception as e:
             logger.error("Claude Agent error", error=str(e))
+            await queue.put(_error_update(e))
+            await queue.put(None)
+            return False
+        await queue.put(None)
+        return True
+
+    async def _read_updates(
+        self, client: ClaudeSDKClient, session_id: str
+    ) -> AsyncIterator[StreamUpdate]:
+        """Convert the SDK's messages for one query into stream updates."""
+        state = self._get_session_state(session_id)
+        # Text is only compared with this turn's, as a new turn may repeat it
+        state.segment = ""
+        state.text_by_id.clear()
+        # Bound once per turn rather than looked up for every message
+        get_handler = self._message_handlers.get
+        debug_enabled = _stdlib_logger.isEnabledFor(logging.DEBUG)
+
+        async for msg in client.receive_messages():
+            msg_type = type(msg)
+            if debug_enabled:
+                logger.debug("Received SDK message", type=msg_type.__name__)
+
+            handler = get_handler(msg_type)
+            if handler:
+                for update in handler(msg, state):
+                    yield update
+            if msg_type is ResultMessage:
+                break
+
+    def _handle_assistant(
+        self, msg: AssistantMessage, state: _SessionState
+    ) -> Iterator[StreamUpdate]:
+        """Convert new text and tool calls in an assistant message."""
+        emitted_ids = state.emitted_ids
+        text_by_id = state.text_by_id
+
+        # Process each block; replayed ones yield nothing.
+        # A message repeating an earlier tool call repeats the history from
+        # the start; others continue where the last message ended
+        if any(
+            type(block) is ToolUseBlock and block.id in emitted_ids
+            for block in msg.content
+        ):
+            segment = ""
+        else:
+            segment = state.segment
+        # Text deltas are sent together, once per message or before the
+        # next tool call, rather than one by one
+        pending_text = io.StringIO()
+        for block in msg.content:
+            match block:
+                case TextBlock(text=text):
+                    # Send only what extends the text already sent in this
+                    # segment; other text is a new block. Checking the tail
+                    # of what was sent, in place, keeps this independent of
+                    # the length of the text
+                    sent_len, sent_tail = text_by_id.get(segment, _NOTHING_SENT)
+                    if text.startswith(sent_tail, sent_len - len(sent_tail)):
+                        # Replayed unchanged within this segment of the
+                        # turn, with nothing new to slice out
+                        if len(text) == sent_len:
+                            continue
+                        delta = text[sent_len:]
+                    else:
+                        delta = text
+                    if delta:
+                        pending_text.write(delta)
+                        text_by_id[segment] = (len(text), text[-TEXT_TAIL_LENGTH:])
+
+                case ToolUseBlock(id=tool_id, name=name, input=tool_input):
+                    # Text after the tool starts a new segment
+                    segment = tool_id
+
+                    # Skip tool calls we've already sent
+                    if tool_id in emitted_ids:
+                        continue
+                    emitted_ids.add(tool_id)
+
+                    if pending_text.tell():
+                        yield StreamUpdate(
+                            type="assistant",
+                            content=pending_text.getvalue(),
+                        )
+                        pending_text.seek(0)
+                        pending_text.truncate()
+
+                    # Yield tool call
+                    yield StreamUpdate(
+                        type="assistant",
+                        tool_calls=[{
+                            "name": name,
+                            "input": tool_input,
+                            "id": tool_id,
+                        }],
+                    )
+
+        state.segment = segment
+        if pending_text.tell():
             yield StreamUpdate(
-                type="error",
-                content=str(e),
-                error_info={"message": str(e)},
+                type="assistant",
+                content=pending_text.getvalue(),
             )
 
-    def _convert_message_to_update(
-        self,
-        message: Union[AssistantMessage, UserMessage, SystemMessage, ResultMessage],
-    ) -> Optional[StreamUpdate]:
-        """Deprecated: Logic moved to stream_message for stateful processing."""
-        return None
-            
+    @staticmethod
+    def _handle_user(
+        msg: UserMessage, state: _SessionState
+    ) -> Iterator[StreamUpdate]:
+        """Convert tool results in a user message."""
+        # Plain text content (e.g. the prompt echoed back) has no results;
+        # iterating it would walk every character
+        if type(msg.content) is str:
+            return
+
+        tool_results = [
+            {
+                "tool_use_id": block.tool_use_id,
+                "is_error": block.is_error,
+            }
+            for block in msg.content
+            if type(block) is ToolResultBlock
+        ]
+
+        if tool_results:
+            yield StreamUpdate(
+                type="tool_result",
+                tool_calls=tool_results,
+            )
 
+    @staticmethod
+    def _handle_result(
+        msg: ResultMessage, state: _SessionState
+    ) -> Iterator[StreamUpdate]:
+        """Convert the final result message."""
+        if msg.is_error:
+            yield StreamUpdate(
+                type="error",
+                content=str(msg.result),
+                error_info={"message": str(msg.result)},
+            )
+        else:
+            yield _RESULT_DONE
@@ -40,8 +40,15 @@ class ClaudeIntegration:
         user_id: int,
         session_id: Optional[str] = None,
         on_stream: Optional[Callable[[StreamUpdate], None]] = None,
+        system_prompt: Optional[str] = None,
     ) -> ClaudeResponse:
-        """Run Claude Code command with full integration."""
+        """Run Claude Code command with full integration.
+
+        Args:
+            system_prompt: Fixed instructions to append to the system prompt;
+                dynamic content belongs in the prompt so this prefix can be
+                served from Claude's prompt cache
+        """
         logger.info(
             "Running Claude command",
             user_id=user_id,
@@ -152,6 +159,7 @@ class ClaudeIntegration:
                 message=prompt,
                 session_id=session.session_id,
                 working_directory=working_directory,
+                system_prompt=system_prompt,
             ):
                 await stream_handler(update)
 
@@ -309,8 +317,10 @@ class ClaudeIntegration:
     async def shutdown(self) -> None:
         """Shutdown integration and cleanup resources."""
         logger.info("Shutting down Claude integration")
-        # No specific cleanup needed for SDK client yet
-        
+
+        # Disconnect the clients kept between turns
+        await self.client.close()
+
         # Clean up expired sessions
         await self.cleanup_expired_sessions()
 
@@ -0,0 +1,58 @@
+"""Cache of Claude responses to repeated prompts.
+
+Used for file uploads, where users often re-send the same file with the same
+request ("review this file") and would otherwise pay for a full Claude run.
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+class ResponseCache:
+    """LRU cache of Claude response text keyed by the exact prompt.
+
+    Entries are namespaced (e.g. by user and working directory) so identical
+    prompts in different contexts never share a response, and expire after
+    ``ttl_seconds``. Keys are SHA-256 digests, so prompts are not kept in memory.
+    """
+
+    def __init__(self, ttl_seconds: float, maxsize: int = 256):
+        """Initialize the cache.
+
+        Args:
+            ttl_seconds: How long a response stays valid
+            maxsize: Maximum number of cached responses
+        """
+        self.ttl_seconds = ttl_seconds
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[bytes, Tuple[str, float]]" = OrderedDict()
+
+    @staticmethod
+    def _key(namespace: str, prompt: str) -> bytes:
+        """Hash a namespaced prompt into a cache key."""
+        return hashlib.sha256(f"{namespace}\0{prompt}".encode()).digest()
+
+    def get(self, namespace: str, prompt: str) -> Optional[str]:
+        """Get the cached response for a prompt, if still valid."""
+        key = self._key(namespace, prompt)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        content, stored_at = entry
+        if time.monotonic() - stored_at >= self.ttl_seconds:
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return content
+
+    def put(self, namespace: str, prompt: str, content: str) -> None:
+        """Cache the response to a prompt."""
+        key = self._key(namespace, prompt)
+        self._entries[key] = (content, time.monotonic())
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
@@ -18,9 +18,12 @@ class ClaudeResponse:
     tools_used: List[Dict[str, Any]] = field(default_factory=list)
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class StreamUpdate:
-    """Enhanced streaming update from Claude with richer context."""
+    """Enhanced streaming update from Claude with richer context.
+
+    Updates are immutable, so fixed ones can be shared between streams.
+    """
 
     type: str  # 'assistant', 'user', 'system', 'result', 'tool_result', 'error', 'progress'
     content: Optional[str] = None
@@ -93,6 +93,10 @@ class Settings(BaseSettings):
         default=["git commit", "git push"],
         description="List of explicitly disallowed Claude tools/commands",
     )
+    claude_prompt_cache_enabled: bool = Field(
+        True,
+        description="Send fixed bot instructions as a cacheable system prompt",
+    )
 
     # Rate limiting
     rate_limit_requests: int = Field(
@@ -129,6 +133,11 @@ class Settings(BaseSettings):
     )
     enable_git_integration: bool = Field(True, description="Enable git commands")
     enable_file_uploads: bool = Field(True, description="Enable file upload handling")
+    file_response_cache_ttl_seconds: int = Field(
+        3600,
+        description="Reuse Claude's reply to an identical file upload for this "
+        "long (0 disables)",
+    )
     enable_quick_actions: bool = Field(True, description="Enable quick action buttons")
 
     # Monitoring
@@ -8,6 +8,7 @@ import sys
 from pathlib import Path
 from typing import Any, Dict
 
+import orjson
 import structlog
 
 from src import __version__
@@ -34,6 +35,16 @@ from src.storage.facade import Storage
 from src.storage.session_storage import SQLiteSessionStorage
 
 
+def _orjson_dumps(obj: Any, **kwargs: Any) -> str:
+    """Serialize a log event with orjson for structlog's JSONRenderer.
+
+    The stdlib logging handlers expect text, so orjson's bytes are decoded.
+    """
+    return orjson.dumps(
+        obj, default=kwargs.get("default"), option=orjson.OPT_NON_STR_KEYS
+    ).decode()
+
+
 def setup_logging(debug: bool = False) -> None:
     """Configure structured logging."""
     level = logging.DEBUG if debug else logging.INFO
@@ -57,7 +68,7 @@ def setup_logging(debug: bool = False) -> None:
             structlog.processors.format_exc_info,
             structlog.processors.UnicodeDecoder(),
             (
-                structlog.processors.JSONRenderer()
+                structlog.processors.JSONRenderer(serializer=_orjson_dumps)
                 if not debug
                 else structlog.dev.ConsoleRenderer()
             ),
@@ -0,0 +1 @@
+"""Tests for Web App API module."""
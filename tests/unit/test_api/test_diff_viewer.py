@@ -0,0 +1,220 @@
+"""Tests for diff viewer token handling."""
+
+import subprocess
+from pathlib import Path
+
+import jwt
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from src.api import diff_viewer
+from src.api.diff_viewer import generate_diff_token, verify_diff_token
+from src.api.server import create_app
+from src.bot.features.git_integration import GitError
+from src.config import create_test_config
+
+SECRET = "0123456789abcdef0123456789abcdef"
+
+
+@pytest.fixture(autouse=True)
+def clear_token_cache():
+    """Start every test with an empty verification cache."""
+    diff_viewer._token_cache.clear()
+    yield
+    diff_viewer._token_cache.clear()
+
+
+class TestVerifyDiffToken:
+    """Test JWT verification and its cache."""
+
+    def test_roundtrip(self):
+        """Test generated token verifies to the same path."""
+        token = generate_diff_token(Path("/tmp/repo"), SECRET)
+        assert verify_diff_token(token, SECRET) == Path("/tmp/repo")
+
+    def test_repeat_verification_uses_cache(self, monkeypatch):
+        """Test second verification of the same token skips jwt.decode."""
+        token = generate_diff_token(Path("/tmp/repo"), SECRET)
+        verify_diff_token(token, SECRET)
+
+        def fail_decode(*args, **kwargs):
+            raise AssertionError("jwt.decode should not be called on cache hit")
+
+        monkeypatch.setattr(jwt, "decode", fail_decode)
+        assert verify_diff_token(token, SECRET) == Path("/tmp/repo")
+
+    def test_cache_does_not_store_raw_token(self):
+        """Test cache keys are digests, not the token itself."""
+        token = generate_diff_token(Path("/tmp/repo"), SECRET)
+        verify_diff_token(token, SECRET)
+        assert all(isinstance(key, bytes) for key in diff_viewer._token_cache)
+        assert token.encode() not in diff_viewer._token_cache
+
+    def test_cached_token_still_expires(self, monkeypatch):
+        """Test expiry is enforced even when the token is cached."""
+        token = generate_diff_token(Path("/tmp/repo"), SECRET)
+        verify_diff_token(token, SECRET)
+
+        key = next(iter(diff_viewer._token_cache))
+        repo_path, _, cached_at = diff_viewer._token_cache[key]
+        diff_viewer._token_cache[key] = (repo_path, cached_at - 1, cached_at)
+
+        with pytest.raises(HTTPException) as exc_info:
+            verify_diff_token(token, SECRET)
+        assert exc_info.value.status_code == 401
+
+    def test_different_secret_not_served_from_cache(self):
+        """Test a cached token does not verify under another secret."""
+        token = generate_diff_token(Path("/tmp/repo"), SECRET)
+        verify_diff_token(token, SECRET)
+
+        with pytest.raises(HTTPException) as exc_info:
+            verify_diff_token(token, "fedcba9876543210fedcba9876543210")
+        assert exc_info.value.status_code == 401
+
+    def test_invalid_token_not_cached(self):
+        """Test failed verifications are not cached."""
+        with pytest.raises(HTTPException):
+            verify_diff_token("not-a-jwt", SECRET)
+        assert not diff_viewer._token_cache
+
+    def test_token_without_repo_path_rejected(self):
+        """Test tokens missing required claims fail in the single decode."""
+        token = jwt.encode({"exp": 9999999999}, SECRET, algorithm="HS256")
+
+        with pytest.raises(HTTPException) as exc_info:
+            verify_diff_token(token, SECRET)
+        assert exc_info.value.status_code == 401
+
+
+@pytest.fixture
+def git_repo(tmp_path):
+    """Create a git repository with one uncommitted change."""
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    git = ["git", "-c", "user.name=test", "-c", "user.email=test@example.com"]
+    subprocess.run([*git, "init", "-q", "-b", "main"], cwd=repo, check=True)
+    (repo / "file.txt").write_text("one\n")
+    subprocess.run([*git, "add", "."], cwd=repo, check=True)
+    subprocess.run([*git, "commit", "-q", "-m", "init"], cwd=repo, check=True)
+    return repo
+
+
+@pytest.fixture
+def client(tmp_path):
+    """Create API test client rooted at tmp_path."""
+    settings = create_test_config(
+        approved_directory=str(tmp_path), diff_viewer_secret=SECRET
+    )
+    return TestClient(create_app(settings))
+
+
+class TestGetDiff:
+    """Test the streaming diff endpoint."""
+
+    def test_streams_diff_with_metadata_headers(self, client, git_repo):
+        """Test diff body is raw git output and metadata is in headers."""
+        (git_repo / "file.txt").write_text("two\n")
+        token = generate_diff_token(git_repo, SECRET)
+
+        response = client.get(f"/api/diff/{token}")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert response.headers["x-git-branch"] == "main"
+        assert "-one" in response.text
+        assert "+two" in response.text
+
+    def test_clean_repo_returns_no_changes(self, client, git_repo):
+        """Test an empty diff is reported as no changes."""
+        token = generate_diff_token(git_repo, SECRET)
+
+        response = client.get(f"/api/diff/{token}")
+
+        assert response.status_code == 200
+        assert response.text == "No changes to show"
+
+    def test_large_diff_is_gzipped(self, client, git_repo):
+        """Test diff responses are compressed when the client accepts gzip."""
+        (git_repo / "file.txt").write_text("line\n" * 2000)
+        token = generate_diff_token(git_repo, SECRET)
+
+        response = client.get(
+            f"/api/diff/{token}", headers={"Accept-Encoding": "gzip"}
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.text.count("+line") == 2000
+
+    def test_git_failure_returns_error(self, client, git_repo, monkeypatch):
+        """Test a failing git diff is a server error, not an empty diff."""
+        integration = client.app.state.git_integration
+        stream = integration.stream_git_command
+
+        async def failing_diff(command, cwd, chunk_size):
+            return await stream([*command, "no-such-ref"], cwd, chunk_size)
+
+        monkeypatch.setattr(integration, "stream_git_command", failing_diff)
+        token = generate_diff_token(git_repo, SECRET)
+
+        response = client.get(f"/api/diff/{token}")
+
+        assert response.status_code == 500
+        assert "no-such-ref" in response.json()["detail"]
+
+    async def test_failure_after_output_marked(self):
+        """Test a git failure mid-stream is appended to the diff body."""
+
+        async def chunks():
+            yield b"diff --git a/x b/x\n"
+            raise GitError("Git command failed: broken pipe")
+
+        body = b"".join([chunk async for chunk in diff_viewer._diff_body(chunks())])
+
+        assert body.startswith(b"diff --git")
+        assert body.endswith(
+            b"\nDiff incomplete, git error: Git command failed: broken pipe\n"
+        )
+
+    def test_invalid_token_rejected(self, client):
+        """Test bad tokens are rejected before git runs."""
+        response = client.get("/api/diff/not-a-jwt")
+        assert response.status_code == 401
+
+    def test_path_outside_approved_directory_denied(self, client, tmp_path):
+        """Test a sibling directory sharing the prefix is not approved."""
+        sibling = tmp_path.parent / (tmp_path.name + "-other")
+        sibling.mkdir()
+        token = generate_diff_token(sibling, SECRET)
+
+        response = client.get(f"/api/diff/{token}")
+
+        assert response.status_code == 403
+
+    def test_symlink_escape_denied(self, client, tmp_path):
+        """Test a symlink pointing outside the approved directory is denied."""
+        outside = tmp_path.parent / (tmp_path.name + "-outside")
+        outside.mkdir()
+        link = tmp_path / "link"
+        link.symlink_to(outside)
+        token = generate_diff_token(link, SECRET)
+
+        response = client.get(f"/api/diff/{token}")
+
+        assert response.status_code == 403
+
+    def test_retargeted_symlink_rechecked(self, client, tmp_path, git_repo):
+        """Test a symlink changed after an allowed request is checked anew."""
+        outside = tmp_path.parent / (tmp_path.name + "-elsewhere")
+        outside.mkdir()
+        link = tmp_path / "link"
+        link.symlink_to(git_repo)
+        token = generate_diff_token(link, SECRET)
+        assert client.get(f"/api/diff/{token}").status_code == 200
+
+        link.unlink()
+        link.symlink_to(outside)
+
+        assert client.get(f"/api/diff/{token}").status_code == 403
@@ -0,0 +1,64 @@
+"""Tests for the FastAPI application factory."""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.api.server import (
+    IMMUTABLE_CACHE_CONTROL,
+    REVALIDATE_CACHE_CONTROL,
+    CachedStaticFiles,
+    create_app,
+)
+from src.config import create_test_config
+
+
+@pytest.fixture
+def client(tmp_path):
+    """Test client for an app with default settings."""
+    return TestClient(create_app(create_test_config(approved_directory=str(tmp_path))))
+
+
+class TestStaticCaching:
+    """Test cache headers on the diff viewer assets."""
+
+    def test_index_must_revalidate(self, client):
+        """The entry HTML is served with no-cache and an ETag."""
+        response = client.get("/diff-viewer/")
+
+        assert response.status_code == 200
+        assert response.headers["cache-control"] == REVALIDATE_CACHE_CONTROL
+        assert response.headers["etag"]
+
+    def test_index_not_modified(self, client):
+        """A matching If-None-Match gets a bodiless 304."""
+        etag = client.get("/diff-viewer/").headers["etag"]
+
+        response = client.get("/diff-viewer/", headers={"If-None-Match": etag})
+
+        assert response.status_code == 304
+        assert response.content == b""
+
+    def test_unhashed_asset_must_revalidate(self, client):
+        """Assets without a content hash are revalidated via ETag."""
+        response = client.get("/static/diff-viewer/app.js")
+
+        assert response.headers["cache-control"] == REVALIDATE_CACHE_CONTROL
+        etag = response.headers["etag"]
+        response = client.get(
+            "/static/diff-viewer/app.js", headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 304
+
+    def test_hashed_asset_is_immutable(self, tmp_path):
+        """Assets with a content hash in the filename are cached for a year."""
+        static_dir = tmp_path / "webapp"
+        static_dir.mkdir()
+        (static_dir / "app.3f2a9c1b.js").write_text("console.log(1);")
+        app = FastAPI()
+        app.mount("/static", CachedStaticFiles(directory=str(static_dir)))
+
+        response = TestClient(app).get("/static/app.3f2a9c1b.js")
+
+        assert response.status_code == 200
+        assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
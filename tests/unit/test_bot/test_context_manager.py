@@ -0,0 +1,88 @@
+"""Tests for per-topic context state."""
+
+from pathlib import Path
+from unittest.mock import Mock
+
+import pytest
+
+from src.bot.context_manager import ContextManager
+
+
+def make_update(chat_id=100, thread_id=None):
+    """Create a mock update for a chat and optional topic."""
+    update = Mock()
+    update.effective_chat.id = chat_id
+    update.effective_message.message_thread_id = thread_id
+    return update
+
+
+@pytest.fixture
+def context():
+    """Create a mock bot context with empty chat_data."""
+    ctx = Mock()
+    ctx.chat_data = {}
+    return ctx
+
+
+@pytest.fixture
+def settings():
+    """Create mock settings with an approved directory."""
+    s = Mock()
+    s.approved_directory = Path("/projects")
+    return s
+
+
+class TestContextManager:
+    """Test topic-scoped state helpers."""
+
+    def test_context_key_without_thread(self):
+        """Test plain chats are keyed by chat id."""
+        assert ContextManager.get_context_key(make_update(100)) == "100"
+
+    def test_context_key_with_thread(self):
+        """Test topics are keyed by chat and thread id."""
+        assert ContextManager.get_context_key(make_update(100, 7)) == "100:7"
+
+    def test_defaults(self, context, settings):
+        """Test getters return defaults for a new topic."""
+        update = make_update()
+
+        assert ContextManager.get_current_directory(
+            update, context, settings
+        ) == Path("/projects")
+        assert ContextManager.get_session_id(update, context) is None
+        assert ContextManager.get_session_started(update, context) is False
+        assert ContextManager.get_current_status(update, context) == "ready"
+
+    def test_topics_are_isolated(self, context, settings):
+        """Test state set in one topic does not leak into another."""
+        topic_a = make_update(100, 1)
+        topic_b = make_update(100, 2)
+
+        ContextManager.set_session_id(topic_a, context, "session-a")
+        ContextManager.set_current_directory(topic_a, context, Path("/projects/a"))
+
+        assert ContextManager.get_session_id(topic_a, context) == "session-a"
+        assert ContextManager.get_session_id(topic_b, context) is None
+        assert ContextManager.get_current_directory(
+            topic_b, context, settings
+        ) == Path("/projects")
+
+    def test_topic_state_is_shared_dict(self, context):
+        """Test get_topic_state returns the dict the setters write to."""
+        update = make_update(100, 3)
+        state = ContextManager.get_topic_state(update, context)
+        state["claude_session_id"] = "abc"
+
+        assert ContextManager.get_session_id(update, context) == "abc"
+        assert context.chat_data["topic_states"]["100:3"] is state
+
+    def test_getters_do_not_create_state(self, context, settings):
+        """Test reading a topic's state leaves chat_data untouched."""
+        update = make_update(100, 3)
+
+        ContextManager.get_current_directory(update, context, settings)
+        ContextManager.get_session_id(update, context)
+        ContextManager.get_current_status(update, context)
+
+        assert context.chat_data == {}
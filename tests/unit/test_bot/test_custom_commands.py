@@ -0,0 +1,115 @@
+"""Tests for custom slash command loading."""
+
+import json
+import os
+
+import pytest
+
+from src.bot.features import custom_commands
+from src.bot.features.custom_commands import get_command_by_name, scan_commands
+
+
+@pytest.fixture(autouse=True)
+def isolated_home(tmp_path, monkeypatch):
+    """Point the global command directory at an empty temp home."""
+    home = tmp_path / "home"
+    home.mkdir()
+    monkeypatch.setattr(
+        custom_commands, "_GLOBAL_COMMANDS_DIR", home / ".claude" / "commands"
+    )
+    custom_commands._listing_cache.clear()
+    custom_commands._command_cache.clear()
+    return home
+
+
+@pytest.fixture
+def project(tmp_path):
+    """Create a project with a .claude/commands directory."""
+    project_dir = tmp_path / "project"
+    (project_dir / ".claude" / "commands").mkdir(parents=True)
+    return project_dir
+
+
+def write_command(project_dir, name, description, mtime_ns=None):
+    """Write a command file, optionally forcing its mtime."""
+    path = project_dir / ".claude" / "commands" / f"{name}.json"
+    path.write_text(json.dumps({"description": description, "prompt": "do it"}))
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    return path
+
+
+class TestScanCommands:
+    """Test command scanning and its caches."""
+
+    async def test_scan_finds_project_commands(self, project):
+        """Test project commands are discovered."""
+        write_command(project, "review", "Review code")
+
+        commands = await scan_commands(project)
+
+        assert [c.name for c in commands] == ["review"]
+        assert commands[0].source == "project"
+
+    async def test_unchanged_file_is_not_reparsed(self, project, monkeypatch):
+        """Test repeated scans reuse parsed commands."""
+        write_command(project, "review", "Review code")
+        await scan_commands(project)
+
+        async def fail_load(*args, **kwargs):
+            raise AssertionError("command file should not be re-read")
+
+        monkeypatch.setattr(custom_commands, "_load_command", fail_load)
+        assert [c.name for c in await scan_commands(project)] == ["review"]
+
+    async def test_edited_file_is_reloaded(self, project):
+        """Test editing a command file invalidates its cache entry."""
+        write_command(project, "review", "Old", mtime_ns=1_000_000_000)
+        assert (await scan_commands(project))[0].description == "Old"
+
+        write_command(project, "review", "Newer text", mtime_ns=2_000_000_000)
+        assert (await scan_commands(project))[0].description == "Newer text"
+
+    async def test_added_and_removed_files_are_seen(self, project):
+        """Test directory changes invalidate the cached listing."""
+        commands_dir = project / ".claude" / "commands"
+        path = write_command(project, "review", "Review code")
+        os.utime(commands_dir, ns=(1_000_000_000, 1_000_000_000))
+        assert len(await scan_commands(project)) == 1
+
+        write_command(project, "test", "Run tests")
+        os.utime(commands_dir, ns=(2_000_000_000, 2_000_000_000))
+        assert {c.name for c in await scan_commands(project)} == {"review", "test"}
+
+        path.unlink()
+        os.utime(commands_dir, ns=(3_000_000_000, 3_000_000_000))
+        assert [c.name for c in await scan_commands(project)] == ["test"]
+
+    async def test_invalid_json_is_skipped(self, project):
+        """Test malformed command files are ignored."""
+        write_command(project, "review", "Review code")
+        (project / ".claude" / "commands" / "broken.json").write_text("{not json")
+
+        assert [c.name for c in await scan_commands(project)] == ["review"]
+
+    async def test_get_command_by_name(self, project):
+        """Test single command lookup."""
+        write_command(project, "review", "Review code")
+
+        command = await get_command_by_name("review", project)
+        assert command.description == "Review code"
+        assert await get_command_by_name("missing", project) is None
+
+    async def test_project_overrides_global(self, project, isolated_home):
+        """Test global commands are found and project ones take precedence."""
+        (isolated_home / ".claude" / "commands").mkdir(parents=True)
+        write_command(isolated_home, "review", "Global review")
+        write_command(isolated_home, "deploy", "Global deploy")
+        write_command(project, "review", "Project review")
+
+        commands = {c.name: c for c in await scan_commands(project)}
+
+        assert commands["deploy"].source == "global"
+        assert commands["review"].description == "Project review"
+        command = await get_command_by_name("deploy", project)
+        assert command.source == "global"
@@ -0,0 +1,132 @@
+"""Tests for git integration."""
+
+import asyncio
+import gc
+import subprocess
+
+import pytest
+
+from src.bot.features.git_integration import GitError, GitIntegration
+from src.config import create_test_config
+
+
+def git(repo, *args):
+    """Run a git command in the test repository."""
+    subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        cwd=repo,
+        check=True,
+        capture_output=True,
+    )
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """Create a repository with a committed baseline."""
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    git(repo, "init", "-q", "-b", "feature/x")
+    (repo / "keep.txt").write_text("one\ntwo\n")
+    (repo / "gone.txt").write_text("bye\n")
+    (repo / "old name.txt").write_text("rename me\n")
+    git(repo, "add", ".")
+    git(repo, "commit", "-q", "-m", "init")
+    return repo
+
+
+@pytest.fixture
+def git_integration(tmp_path):
+    """Create git integration rooted at tmp_path."""
+    return GitIntegration(create_test_config(approved_directory=str(tmp_path)))
+
+
+class TestGetFullStatus:
+    """Test combined status + numstat collection."""
+
+    async def test_clean_repo(self, repo, git_integration):
+        """Test a clean repository reports branch and no changes."""
+        status, files = await git_integration.get_full_status(repo)
+
+        assert status.branch == "feature/x"
+        assert status.is_clean
+        assert files == []
+
+    async def test_changes(self, repo, git_integration):
+        """Test modified, deleted, added and untracked files are classified."""
+        (repo / "keep.txt").write_text("one\nTWO\nthree\n")
+        (repo / "gone.txt").unlink()
+        (repo / "staged.txt").write_text("new\n")
+        git(repo, "add", "staged.txt")
+        (repo / "untracked file.txt").write_text("?\n")
+
+        status, files = await git_integration.get_full_status(repo)
+
+        assert status.modified == ["keep.txt"]
+        assert status.deleted == ["gone.txt"]
+        assert status.added == ["staged.txt"]
+        assert status.untracked == ["untracked file.txt"]
+        assert sorted(files) == [("gone.txt", 0, 1), ("keep.txt", 2, 1)]
+
+    async def test_matches_individual_calls(self, repo, git_integration):
+        """Test results agree with the single-purpose git helpers."""
+        (repo / "keep.txt").write_text("changed\n")
+        (repo / "new.txt").write_text("new\n")
+        git(repo, "add", "new.txt")
+
+        status, files = await git_integration.get_full_status(repo)
+
+        assert status.branch == (await git_integration.get_status(repo)).branch
+        assert files == await git_integration.get_changed_files(repo)
+
+    async def test_staged_rename(self, repo, git_integration):
+        """Test renames do not confuse the NUL-separated parser."""
+        git(repo, "mv", "old name.txt", "new name.txt")
+        (repo / "keep.txt").write_text("changed\n")
+
+        status, files = await git_integration.get_full_status(repo)
+
+        assert status.modified == ["keep.txt"]
+        assert files == [("keep.txt", 1, 2)]
+
+
+class TestStreamGitCommand:
+    """Test streaming a git command's output."""
+
+    async def test_streams_output(self, repo, git_integration):
+        """Test stdout arrives in chunks of at most the given size."""
+        chunks = await git_integration.stream_git_command(
+            ["git", "log", "--format=%s"], repo, chunk_size=2
+        )
+
+        assert [chunk async for chunk in chunks] == [b"in", b"it", b"\n"]
+
+    async def test_failure_without_output_raised(self, repo, git_integration):
+        """Test a command failing before any output raises with git's error."""
+        with pytest.raises(GitError, match="no-such-ref"):
+            await git_integration.stream_git_command(
+                ["git", "diff", "no-such-ref"], repo
+            )
+
+    async def test_unread_stream_stops_git(self, repo, git_integration, monkeypatch):
+        """Test git is stopped when the stream is dropped before being read."""
+        processes = []
+        create = asyncio.create_subprocess_exec
+
+        async def record(*args, **kwargs):
+            processes.append(await create(*args, **kwargs))
+            return processes[-1]
+
+        monkeypatch.setattr(asyncio, "create_subprocess_exec", record)
+        # More output than a pipe holds, so git blocks until it is read
+        (repo / "big.txt").write_text("line\n" * 100_000)
+        git(repo, "add", "big.txt")
+        git(repo, "commit", "-q", "-m", "big")
+        chunks = await git_integration.stream_git_command(
+            ["git", "log", "-p"], repo, chunk_size=1
+        )
+
+        del chunks
+        gc.collect()
+        await asyncio.wait_for(processes[0].wait(), timeout=5)
+
+        assert processes[0].returncode < 0  # Killed
@@ -0,0 +1,983 @@
+"""Tests for streaming Claude output in the text message handler."""
+
+import asyncio
+from unittest.mock import AsyncMock, Mock
+
+import httpx
+import pytest
+from telegram.error import NetworkError, RetryAfter
+
+from src.bot.handlers import message as message_module
+from src.bot.handlers.message import handle_text_message
+from src.bot.utils.formatting import FormattedMessage
+from src.claude.exceptions import ClaudeTimeoutError
+from src.claude.types import ClaudeResponse, StreamUpdate
+from src.config import create_test_config
+
+
+class SentMessage:
+    """Telegram message stand-in that records every text it showed."""
+
+    def __init__(self, text):
+        self.texts = [text]
+        self.edit_text = AsyncMock(side_effect=self._edit)
+        self.delete = AsyncMock()
+
+    async def _edit(self, text, **kwargs):
+        self.texts.append(text)
+
+    @property
+    def text(self):
+        return self.texts[-1]
+
+
+@pytest.fixture(autouse=True)
+def fast_flush(monkeypatch):
+    """Keep the edit debounce short so tests run quickly."""
+    monkeypatch.setattr(message_module, "STREAM_FLUSH_INTERVAL", 0.01)
+
+
+@pytest.fixture
+def sent():
+    """Messages sent by the bot, in order."""
+    return []
+
+
+@pytest.fixture
+def update(sent):
+    """Create a mock update for a plain chat message."""
+
+    async def reply_text(text, **kwargs):
+        msg = SentMessage(text)
+        sent.append(msg)
+        return msg
+
+    upd = Mock()
+    upd.effective_user.id = 1
+    upd.effective_chat.id = 1
+    upd.effective_message.message_thread_id = None
+    upd.message.text = "hello"
+    upd.message.message_id = 10
+    upd.message.reply_text = AsyncMock(side_effect=reply_text)
+    upd.message.chat.send_action = AsyncMock()
+    return upd
+
+
+def make_context(tmp_path, events):
+    """Create a bot context whose Claude integration streams the given events.
+
+    A None entry pauses long enough for the pending events to be flushed.
+    """
+
+    async def run_command(on_stream=None, **kwargs):
+        for event in events:
+            if event is None:
+                await asyncio.sleep(0.05)
+            else:
+                await on_stream(event)
+        return ClaudeResponse(
+            content="done", session_id="s1", cost=0.0, duration_ms=1, num_turns=1
+        )
+
+    claude = Mock()
+    claude.run_command = AsyncMock(side_effect=run_command)
+    ctx = Mock()
+    ctx.chat_data = {}
+    ctx.bot_data = {
+        "settings": create_test_config(approved_directory=str(tmp_path)),
+        "claude_integration": claude,
+    }
+    return ctx
+
+
+def tool_call(tool_id, name, **tool_input):
+    """Create an assistant update announcing one tool call."""
+    return StreamUpdate(
+        type="assistant",
+        tool_calls=[{"id": tool_id, "name": name, "input": tool_input}],
+    )
+
+
+def tool_result(tool_id):
+    """Create a tool result update."""
+    return StreamUpdate(type="tool_result", tool_calls=[{"tool_use_id": tool_id}])
+
+
+def text(content):
+    """Create an assistant text update."""
+    return StreamUpdate(type="assistant", content=content)
+
+
+class TestStreaming:
+    """Test how streamed events are shown to the user."""
+
+    async def test_tools_and_text_rendered(self, tmp_path, update, sent):
+        """Test the final streamed message lists tools then the reply text."""
+        events = [
+            tool_call("t1", "Bash", command="ls"),
+            tool_result("t1"),
+            tool_call("t2", "Read", file_path="a.py"),
+            text("All "),
+            text("good"),
+            StreamUpdate(type="result"),
+        ]
+
+        await handle_text_message(update, make_context(tmp_path, events))
+
+        streamed = [m for m in sent if "Bash" in m.text]
+        assert len(streamed) == 1
+        assert streamed[0].text == (
+            "1. ✓ 💻 **Bash**: `ls`\n"
+            "2. ✓ 📄 **Read**: `a.py`\n"
+            "\n---\n\n"
+            "All good"
+        )
+
+    async def test_bot_system_prompt_sent(self, tmp_path, update, sent):
+        """Test text turns use the same system prompt as uploads."""
+        context = make_context(tmp_path, [text("hi")])
+
+        await handle_text_message(update, context)
+
+        kwargs = context.bot_data["claude_integration"].run_command.await_args.kwargs
+        assert kwargs["system_prompt"] == message_module.BOT_SYSTEM_PROMPT
+
+    async def test_placeholder_sent_first(self, tmp_path, update, sent):
+        """Test the first reply is a placeholder that streamed output replaces."""
+        await handle_text_message(update, make_context(tmp_path, [text("hi")]))
+
+        assert sent[0].texts == [message_module.STREAM_PLACEHOLDER, "hi"]
+
+    async def test_bursts_are_coalesced(self, tmp_path, update, sent):
+        """Test a burst of text events produces a single edit."""
+        events = [text(f"part{i} ") for i in range(50)]
+
+        await handle_text_message(update, make_context(tmp_path, events))
+
+        streamed = [m for m in sent if "part0" in m.text]
+        assert len(streamed) == 1
+        assert streamed[0].text.strip().endswith("part49")
+        assert streamed[0].edit_text.await_count == 1
+
+    async def test_no_stream_sends_response(self, tmp_path, update, sent):
+        """Test the final response replaces the placeholder if nothing streamed."""
+        await handle_text_message(update, make_context(tmp_path, []))
+
+        sent[0].delete.assert_awaited_once()
+        assert sent[1].text == "done"
+
+    async def test_long_output_split_across_messages(self, tmp_path, update, sent):
+        """Test output longer than one Telegram message continues in a new one."""
+        events = [text("x" * 3000), text("y" * 3000)]
+
+        await handle_text_message(update, make_context(tmp_path, events))
+
+        streamed = [m for m in sent if m.text[:1] in ("x", "y")]
+        assert "".join(m.text for m in streamed) == "x" * 3000 + "y" * 3000
+
+    async def test_status_flip_edits_earlier_message(self, tmp_path, update, sent):
+        """Test a finished tool is updated even when output moved on."""
+        events = [
+            tool_call("t1", "Bash", command="ls"),
+            text("x" * 5000),
+            None,
+            tool_result("t1"),
+            text("y"),
+        ]
+
+        await handle_text_message(update, make_context(tmp_path, events))
+
+        first, second = [m for m in sent if "x" in m.text]
+        assert first.texts[1].startswith("1. ⏳ 💻 **Bash**")
+        assert first.text.startswith("1. ✓ 💻 **Bash**")
+        assert second.text.endswith("xy")
+
+    async def test_status_flip_patched_in_place(
+        self, tmp_path, update, sent, monkeypatch
+    ):
+        """Test a finished tool is patched into the sent text, not re-rendered."""
+        render = Mock(side_effect=message_module._render_stream_event)
+        monkeypatch.setattr(message_module, "_render_stream_event", render)
+        events = [
+            tool_call("t1", "Bash", command="ls"),
+            tool_call("t2", "Read", file_path="a.py"),
+            None,
+            tool_result("t2"),
+            None,
+            StreamUpdate(type="result"),
+        ]
+
+        await handle_text_message(update, make_context(tmp_path, events))
+
+        assert sent[0].texts[1:] == [
+            "1. ⏳ 💻 **Bash**: `ls`\n2. ⏳ 📄 **Read**: `a.py`",
+            "1. ⏳ 💻 **Bash**: `ls`\n2. ✓ 📄 **Read**: `a.py`",
+            "1. ✓ 💻 **Bash**: `ls`\n2. ✓ 📄 **Read**: `a.py`",
+        ]
+        assert render.call_count == 2
+
+    async def test_old_events_retired(self, tmp_path, update, sent, monkeypatch):
+        """Test folding old events into plain text does not change the output."""
+        monkeypatch.setattr(message_module, "MAX_STREAM_EVENTS", 2)
+        events = []
+        for i in range(6):
+            events += [tool_call(f"t{i}", "Bash", command=f"echo {i}"), None]
+            events += [tool_result(f"t{i}"), None]
+        events += [text("done!")]
+
+        await handle_text_message(update, make_context(tmp_path, events))
+
+        lines = [f"{i + 1}. ✓ 💻 **Bash**: `echo {i}`" for i in range(6)]
+        assert sent[0].text == "\n".join(lines) + "\n\n---\n\ndone!"
+
+    async def test_rejected_markdown_sent_as_plain_text(
+        self, tmp_path, update, sent
+    ):
+        """Test Markdown Telegram cannot parse is resent once without it."""
+
+        class StrictMessage(SentMessage):
+            async def _edit(self, text, parse_mode=None):
+                if parse_mode == "Markdown" and text.count("*") % 2:
+                    raise Exception("Can't parse entities: unclosed bold")
+                self.texts.append(text)
+
+        async def reply_text(text, **kwargs):
+            msg = StrictMessage(text)
+            sent.append(msg)
+            return msg
+
+        update.message.reply_text.side_effect = reply_text
+        events = [text("a *b"), None, text(" c_d")]
+
+        await handle_text_message(update, make_context(tmp_path, events))
+
+        assert sent[0].text == "a b cd"
+        calls = sent[0].edit_text.await_args_list
+        assert [c.kwargs["parse_mode"] for c in calls] == ["Markdown", None]
+
+    async def test_rejected_final_edit_resent(self, tmp_path, update, sent):
+        """Test a final edit with rejected Markdown is resent as plain text."""
+
+        class StrictMessage(SentMessage):
+            async def _edit(self, text, parse_mode=None):
+                if parse_mode == "Markdown" and text.count("*") % 2:
+                    raise Exception("Can't parse entities: unclosed bold")
+                self.texts.append(text)
+
+        async def reply_text(text, **kwargs):
+            msg = StrictMessage(text)
+            sent.append(msg)
+            return msg
+
+        update.message.reply_text.side_effect = reply_text
+
+        await handle_text_message(update, make_context(tmp_path, [text("a *b")]))
+
+        assert sent[0].text == "a b"
+
+    async def test_failed_final_edit_sends_response(self, tmp_path, update, sent):
+        """Test the response is sent if the streamed reply cannot be shown."""
+
+        class FailingMessage(SentMessage):
+            async def _edit(self, text, **kwargs):
+                raise Exception("Timed out")
+
+        async def reply_text(text, **kwargs):
+            msg = FailingMessage(text) if not sent else SentMessage(text)
+            sent.append(msg)
+            return msg
+
+        update.message.reply_text.side_effect = reply_text
+
+        await handle_text_message(update, make_context(tmp_path, [text("hi")]))
+
+        sent[0].delete.assert_awaited_once()
+        assert sent[-1].text == "done"
+
+
+class TestStorage:
+    """Test logging of interactions to storage."""
+
+    async def test_save_does_not_block_reply(self, tmp_path, update, sent):
+        """Test the reply is sent while the interaction is still being saved."""
+        saved = asyncio.Event()
+
+        async def save(**kwargs):
+            await saved.wait()
+
+        context = make_context(tmp_path, [])
+        context.bot_data["storage"] = Mock(
+            save_claude_interaction=AsyncMock(side_effect=save)
+        )
+
+        await asyncio.wait_for(handle_text_message(update, context), 1)
+
+        assert sent[-1].text == "done"
+        saved.set()
+        await asyncio.sleep(0)
+
+    async def test_save_failure_logged(self, tmp_path, update, monkeypatch):
+        """Test a failed background save is logged, not raised."""
+        warning = Mock()
+        monkeypatch.setattr(message_module.logger, "warning", warning)
+        context = make_context(tmp_path, [])
+        context.bot_data["storage"] = Mock(
+            save_claude_interaction=AsyncMock(side_effect=OSError("db down"))
+        )
+
+        await handle_text_message(update, context)
+        await asyncio.sleep(0)
+
+        warning.assert_any_call("Failed to log interaction to storage", error="db down")
+        assert not message_module._background_tasks
+
+    async def test_shutdown_waits_for_save(self, tmp_path, update):
+        """Test pending interaction saves are finished on shutdown."""
+        saved = asyncio.Event()
+        done = []
+
+        async def save(**kwargs):
+            await saved.wait()
+            done.append(kwargs["prompt"])
+
+        context = make_context(tmp_path, [])
+        context.bot_data["storage"] = Mock(
+            save_claude_interaction=AsyncMock(side_effect=save)
+        )
+        await handle_text_message(update, context)
+
+        waiting = asyncio.create_task(message_module.wait_background_tasks())
+        await asyncio.sleep(0)
+        assert not waiting.done()
+        saved.set()
+        await asyncio.wait_for(waiting, 1)
+
+        assert len(done) == 1
+
+
+@pytest.fixture
+def document_update(update):
+    """Turn the update into an upload of a small text file."""
+    file = Mock(download_as_bytearray=AsyncMock(return_value=bytearray(b"x = 1")))
+    update.message.document = Mock(file_name="a.py", file_size=5, file_unique_id="f1")
+    update.message.document.get_file = AsyncMock(return_value=file)
+    update.message.caption = None
+    return update
+
+
+class TestDocumentCache:
+    """Test reuse of Claude's reply to a repeated file upload."""
+
+    async def test_single_progress_message(self, tmp_path, document_update, sent):
+        """Test one progress message is edited in place, then deleted."""
+        await message_module.handle_document(
+            document_update, make_context(tmp_path, [])
+        )
+
+        progress, reply = sent
+        assert progress.texts == ["📄 Processing file: `a.py`..."]
+        progress.delete.assert_awaited_once()
+        assert reply.text == "done"
+
+    async def test_repeat_upload_uses_cache(self, tmp_path, document_update, sent):
+        """Test the same file and caption is only sent to Claude once."""
+        context = make_context(tmp_path, [])
+
+        await message_module.handle_document(document_update, context)
+        await message_module.handle_document(document_update, context)
+
+        assert context.bot_data["claude_integration"].run_command.await_count == 1
+        assert [m.text for m in sent].count("done") == 2
+
+    async def test_reply_with_edits_not_cached(self, tmp_path, document_update):
+        """Test a reply that changed files is not replayed for a repeat upload."""
+        context = make_context(tmp_path, [])
+        run_command = context.bot_data["claude_integration"].run_command
+        run_command.side_effect = None
+        run_command.return_value = ClaudeResponse(
+            content="Fixed it",
+            session_id="s1",
+            cost=0.0,
+            duration_ms=1,
+            num_turns=1,
+            tools_used=[{"name": "Edit", "input": {"file_path": "a.py"}}],
+        )
+
+        await message_module.handle_document(document_update, context)
+        await message_module.handle_document(document_update, context)
+
+        assert run_command.await_count == 2
+
+    async def test_new_session_not_served_from_cache(
+        self, tmp_path, document_update
+    ):
+        """Test a new Claude session gets the file instead of a cached reply."""
+        context = make_context(tmp_path, [])
+
+        await message_module.handle_document(document_update, context)
+        context.chat_data.clear()
+        await message_module.handle_document(document_update, context)
+
+        assert context.bot_data["claude_integration"].run_command.await_count == 2
+
+    async def test_nocache_caption(self, tmp_path, document_update):
+        """Test "#nocache" asks Claude again, without the tag in the prompt."""
+        context = make_context(tmp_path, [])
+
+        await message_module.handle_document(document_update, context)
+        document_update.message.caption = "#nocache"
+        await message_module.handle_document(document_update, context)
+
+        run_command = context.bot_data["claude_integration"].run_command
+        assert run_command.await_count == 2
+        assert "#nocache" not in run_command.await_args.kwargs["prompt"]
+
+    async def test_repeat_upload_not_downloaded(self, tmp_path, document_update):
+        """Test a re-sent file with the same caption reuses its prompt."""
+        context = make_context(tmp_path, [])
+
+        await message_module.handle_document(document_update, context)
+        document_update.message.caption = "#nocache"
+        await message_module.handle_document(document_update, context)
+        document_update.message.caption = "Explain this"
+        await message_module.handle_document(document_update, context)
+
+        assert document_update.message.document.get_file.await_count == 2
+
+
+class TestDocumentErrors:
+    """Test which upload failures are reported to the user."""
+
+    async def test_download_failure_reported(self, tmp_path, document_update, sent):
+        """Test a failed download replaces the progress message with an error."""
+        file = document_update.message.document.get_file.return_value
+        file.download_as_bytearray.side_effect = httpx.ConnectError("offline")
+
+        await message_module.handle_document(
+            document_update, make_context(tmp_path, [])
+        )
+
+        progress, reply = sent
+        progress.delete.assert_awaited_once()
+        assert reply.text == "❌ **Error processing file**\n\noffline"
+
+    async def test_claude_failure_reported(self, tmp_path, document_update, sent):
+        """Test a Claude error is shown in the progress message."""
+        context = make_context(tmp_path, [])
+        claude = context.bot_data["claude_integration"]
+        claude.run_command.side_effect = ClaudeTimeoutError("timed out")
+
+        await message_module.handle_document(document_update, context)
+
+        (progress,) = sent
+        assert "timed out" in progress.texts[-1].lower()
+
+    async def test_cancellation_propagates(self, tmp_path, document_update, sent):
+        """Test cancelling the handler is not reported as an upload error."""
+        context = make_context(tmp_path, [])
+        claude = context.bot_data["claude_integration"]
+        claude.run_command.side_effect = asyncio.CancelledError
+
+        with pytest.raises(asyncio.CancelledError):
+            await message_module.handle_document(document_update, context)
+
+        assert len(sent) == 1
+
+    async def test_unexpected_error_reported(self, tmp_path, document_update, sent):
+        """Test a bug in handling the upload still answers the user."""
+        context = make_context(tmp_path, [])
+        claude = context.bot_data["claude_integration"]
+        claude.run_command.side_effect = KeyError("content")
+
+        await message_module.handle_document(document_update, context)
+
+        (progress,) = sent
+        assert progress.text == (
+            "❌ **Error processing file**\n\nAn unexpected error occurred."
+        )
+
+
+class TestDecodeAndBuildPrompt:
+    """Test building prompts from uploaded file contents."""
+
+    def test_prompt(self):
+        """Test the caption, file name and contents are combined."""
+        prompt = message_module._decode_and_build_prompt(
+            b"x = 1", "a.py", "Review", 100
+        )
+
+        assert prompt == "Review\n\n**File:** `a.py`\n\n```\nx = 1\n```"
+
+    def test_truncated(self):
+        """Test long contents are cut to the limit."""
+        prompt = message_module._decode_and_build_prompt(b"abcdef", "a", "c", 3)
+
+        assert "abc\n... (file truncated for processing)\n```" in prompt
+
+    def test_not_utf8(self):
+        """Test binary contents produce no prompt."""
+        assert message_module._decode_and_build_prompt(b"\xff", "a", "c", 3) is None
+
+    def test_partial_download_cut_mid_character(self):
+        """Test a download cut inside a character is decoded up to it."""
+        prompt = message_module._decode_and_build_prompt(
+            "aé".encode()[:2], "a", "c", 10, complete=False
+        )
+
+        assert "a\n... (file truncated for processing)" in prompt
+
+
+    def test_binary_after_text_prefix(self):
+        """Test invalid bytes past the probed prefix still produce no prompt."""
+        file_bytes = b"a" * (message_module.DECODE_PROBE_SIZE + 10) + b"\xff"
+
+        assert (
+            message_module._decode_and_build_prompt(file_bytes, "a", "c", 10**6)
+            is None
+        )
+
+    def test_only_needed_bytes_decoded(self):
+        """Test bytes beyond what the limit can show are ignored."""
+        prompt = message_module._decode_and_build_prompt(
+            b"abcd" + b"\xff" * 100, "a", "c", 1
+        )
+
+        assert "a\n... (file truncated for processing)" in prompt
+
+
+class TestDownloadCapped:
+    """Test downloading uploads up to a size limit."""
+
+    @pytest.fixture
+    def served(self, monkeypatch):
+        """Serve 100 KB for any URL and record how much was requested."""
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            return httpx.Response(200, content=b"x" * 100_000)
+
+        transport = httpx.MockTransport(handler)
+        client = httpx.AsyncClient
+
+        monkeypatch.setattr(
+            message_module.httpx,
+            "AsyncClient",
+            lambda **kwargs: client(transport=transport, **kwargs),
+        )
+        return requests
+
+    async def test_large_file_cut_off(self, served):
+        """Test a file over the limit is streamed and cut at the limit."""
+        file = Mock(file_path="https://example.org/file")
+
+        data, complete = await message_module._download_capped(file, 100_000, 1000)
+
+        assert (len(data), complete) == (1000, False)
+        file.download_as_bytearray.assert_not_called()
+
+    async def test_shared_client_used(self, monkeypatch):
+        """Test a given client is streamed with instead of a new one."""
+        transport = httpx.MockTransport(lambda r: httpx.Response(200, content=b"x"))
+        client = httpx.AsyncClient(transport=transport)
+        monkeypatch.setattr(message_module.httpx, "AsyncClient", None)
+        file = Mock(file_path="https://example.org/file")
+
+        async with client:
+            data, complete = await message_module._download_capped(
+                file, None, 1000, client
+            )
+
+        assert (data, complete) == (b"x", True)
+
+    async def test_small_file_downloaded(self, served):
+        """Test a file within the limit is downloaded through Telegram."""
+        file = Mock(file_path="https://example.org/file")
+        file.download_as_bytearray = AsyncMock(return_value=bytearray(b"x"))
+
+        data, complete = await message_module._download_capped(file, 1, 1000)
+
+        assert (data, complete) == (b"x", True)
+        assert not served
+
+    @pytest.mark.parametrize("status", [404, 502])
+    async def test_failed_download_hides_url(self, status):
+        """Test a failed download is reported without the tokened file URL."""
+        transport = httpx.MockTransport(lambda r: httpx.Response(status))
+        file = Mock(file_path="https://api.telegram.org/file/bot123:SECRET/doc")
+
+        async with httpx.AsyncClient(transport=transport) as client:
+            with pytest.raises(NetworkError) as exc_info:
+                await message_module._download_capped(file, None, 1000, client)
+
+        assert str(status) in str(exc_info.value)
+        assert "SECRET" not in str(exc_info.value)
+        assert exc_info.value.__cause__ is None
+
+
+class TestSendFormatted:
+    """Test sending the parts of a formatted response."""
+
+    async def test_parts_sent_in_order_without_delay(self, update, sent, monkeypatch):
+        """Test parts go out back to back, only the first as a reply."""
+        sleep = AsyncMock()
+        monkeypatch.setattr(message_module.asyncio, "sleep", sleep)
+        parts = [FormattedMessage("a"), FormattedMessage("b"), FormattedMessage("c")]
+
+        await message_module._send_formatted(update, parts)
+
+        assert [m.text for m in sent] == ["a", "b", "c"]
+        replies = [
+            c.kwargs["reply_to_message_id"]
+            for c in update.message.reply_text.await_args_list
+        ]
+        assert replies == [10, None, None]
+        sleep.assert_not_awaited()
+
+    async def test_flood_control_retried(self, update, monkeypatch):
+        """Test a part rejected by flood control is resent after the wait."""
+        sleep = AsyncMock()
+        monkeypatch.setattr(message_module.asyncio, "sleep", sleep)
+        update.message.reply_text.side_effect = [Mock(), RetryAfter(3), Mock()]
+
+        await message_module._send_formatted(
+            update, [FormattedMessage("a"), FormattedMessage("b")]
+        )
+
+        sleep.assert_awaited_once_with(3)
+        assert update.message.reply_text.await_count == 3
+
+
+class TestUpdateWorkingDirectory:
+    """Test following directory changes mentioned by Claude."""
+
+    def follow(self, tmp_path, update, content, tools=("Bash",)):
+        """Apply a Claude response and return the new current directory."""
+        context = make_context(tmp_path, [])
+        settings = context.bot_data["settings"]
+        response = ClaudeResponse(
+            content=content,
+            session_id="s1",
+            cost=0.0,
+            duration_ms=1,
+            num_turns=1,
+            tools_used=[{"name": name, "input": {}} for name in tools],
+        )
+
+        message_module._update_working_directory_from_claude_response(
+            response, update, context, settings, 1
+        )
+        return message_module.ContextManager.get_current_directory(
+            update, context, settings
+        )
+
+    def test_mixed_case_path(self, tmp_path, update):
+        """Test a path is followed with its original case."""
+        (tmp_path / "MyProj").mkdir()
+
+        assert self.follow(tmp_path, update, "Ran cd MyProj") == tmp_path / "MyProj"
+
+    def test_first_valid_match_in_text_order(self, tmp_path, update):
+        """Test the earliest existing directory mentioned is followed."""
+        (tmp_path / "a").mkdir()
+        (tmp_path / "b").mkdir()
+        content = "cd missing\nChanged directory to: b\nthen cd a"
+
+        assert self.follow(tmp_path, update, content) == tmp_path / "b"
+
+    def test_outside_approved_directory_ignored(self, tmp_path, update):
+        """Test a directory outside the approved one is not followed."""
+        current = self.follow(tmp_path, update, "Working directory: /")
+
+        assert current == tmp_path
+
+    def test_symlink_out_of_approved_directory_ignored(self, tmp_path, update):
+        """Test a link inside the approved directory to outside is not followed."""
+        approved = tmp_path / "approved"
+        approved.mkdir()
+        (approved / "escape").symlink_to(tmp_path)
+
+        current = self.follow(approved, update, "cd escape")
+
+        assert current == approved
+
+
+    def test_upper_case_command(self, tmp_path, update):
+        """Test directory changes are found regardless of case."""
+        (tmp_path / "a").mkdir()
+
+        assert self.follow(tmp_path, update, "CD a") == tmp_path / "a"
+
+    def test_without_shell_tool_ignored(self, tmp_path, update):
+        """Test mentions are not followed when no shell command was run."""
+        (tmp_path / "a").mkdir()
+
+        assert self.follow(tmp_path, update, "cd a", tools=("Read",)) == tmp_path
+
+    def test_no_mention_skips_lookup(self, tmp_path, update, monkeypatch):
+        """Test replies without a directory change do no path work."""
+        get_current_directory = Mock()
+        monkeypatch.setattr(
+            message_module.ContextManager,
+            "get_current_directory",
+            get_current_directory,
+        )
+        context = make_context(tmp_path, [])
+        response = ClaudeResponse(
+            content="All tests pass.",
+            session_id="s1",
+            cost=0.0,
+            duration_ms=1,
+            num_turns=1,
+            tools_used=[{"name": "Bash", "input": {}}],
+        )
+
+        message_module._update_working_directory_from_claude_response(
+            response, update, context, context.bot_data["settings"], 1
+        )
+
+        get_current_directory.assert_not_called()
+
+
+class TestQueuedPerChat:
+    """Test running handlers in per-topic queues."""
+
+    def make_update(self, chat_id):
+        """Create an update for the given chat."""
+        upd = Mock()
+        upd.effective_chat.id = chat_id
+        upd.effective_message.message_thread_id = None
+        return upd
+
+    async def test_order_kept_within_chat(self):
+        """Test updates for one chat run one at a time, in order."""
+        log = []
+
+        async def handler(update, context):
+            log.append(("start", context))
+            await asyncio.sleep(0.01)
+            log.append(("end", context))
+
+        queued = message_module.queued_per_chat(handler)
+        await queued(self.make_update(1), "a")
+        await queued(self.make_update(1), "b")
+        await asyncio.sleep(0.05)
+
+        assert log == [("start", "a"), ("end", "a"), ("start", "b"), ("end", "b")]
+        assert not message_module._chat_queues
+
+    async def test_chats_run_concurrently(self):
+        """Test a slow update in one chat does not hold up another chat."""
+        release = asyncio.Event()
+        done = []
+
+        async def handler(update, context):
+            if context == "slow":
+                await release.wait()
+            done.append(context)
+
+        queued = message_module.queued_per_chat(handler)
+        await queued(self.make_update(1), "slow")
+        await queued(self.make_update(2), "fast")
+        await asyncio.sleep(0.01)
+
+        assert done == ["fast"]
+        release.set()
+        await asyncio.sleep(0.01)
+        assert done == ["fast", "slow"]
+
+    async def test_failure_does_not_stop_queue(self):
+        """Test a failing update goes to the error handlers and the next runs."""
+        done = []
+        error = ValueError("boom")
+        bad, good = Mock(), Mock()
+        bad.application.process_error = AsyncMock()
+
+        async def handler(update, context):
+            if context is bad:
+                raise error
+            done.append(context)
+
+        queued = message_module.queued_per_chat(handler)
+        update = self.make_update(1)
+        await queued(update, bad)
+        await queued(self.make_update(1), good)
+        await asyncio.sleep(0.01)
+
+        assert done == [good]
+        bad.application.process_error.assert_awaited_once_with(update, error)
+
+    async def test_cancel_stops_workers(self):
+        """Test cancelling the queues stops running and pending updates."""
+        started = []
+
+        async def handler(update, context):
+            started.append(context)
+            await asyncio.Event().wait()
+
+        queued = message_module.queued_per_chat(handler)
+        await queued(self.make_update(1), "a")
+        await queued(self.make_update(1), "b")
+        await asyncio.sleep(0.01)
+
+        await message_module.cancel_chat_queues()
+
+        assert started == ["a"]
+        assert not message_module._chat_queues
+        assert not message_module._chat_workers
+
+
+class TestFormatToolDetails:
+    """Test the detail suffix shown for each tool call."""
+
+    @pytest.mark.parametrize(
+        "name,tool_input,expected",
+        [
+            ("Bash", {"command": " ls -la "}, ": `ls -la`"),
+            ("Bash", {"command": "x" * 50}, ": `" + "x" * 37 + "...`"),
+            ("Read", {"file_path": "a.py"}, ": `a.py`"),
+            ("Edit", {"path": "b.py", "file_path": "c.py"}, ": `b.py`"),
+            ("Write", {"paths": ["a", "b", "c"]}, ": `a (+2)`"),
+            ("Write", {}, ""),
+            ("Glob", {"pattern": "*.py"}, ": `*.py`"),
+            ("Grep", {"pattern": "x"}, ""),
+        ],
+    )
+    def test_details(self, name, tool_input, expected):
+        """Test each tool shows the argument it is known by."""
+        assert message_module._format_tool_details(name, tool_input) == expected
+
+
+class TestTyping:
+    """Test the typing indicator while Claude runs."""
+
+    async def test_typing_repeated_while_idle(self, tmp_path, update, monkeypatch):
+        """Test typing is re-sent when nothing visible has been sent."""
+        monkeypatch.setattr(message_module, "TYPING_INTERVAL", 0.01)
+
+        await handle_text_message(update, make_context(tmp_path, [None]))
+
+        # One initial action plus at least one from the background task
+        assert update.message.chat.send_action.await_count >= 2
+
+
+class TestFormatErrorMessage:
+    """Test mapping of Claude errors to user-facing messages."""
+
+    @pytest.mark.parametrize(
+        "error,expected",
+        [
+            ("Usage limit reached, resets at 5pm", "Usage limit reached"),
+            ("Tool not allowed: Bash", "Tool not allowed"),
+            ("No conversation found with session ID", "Session Not Found"),
+            ("Rate limit exceeded", "Rate Limit Reached"),
+            ("Request TIMEOUT after 60s", "Request Timeout"),
+            ("Something broke", "Failed to process your request: Something broke"),
+        ],
+    )
+    def test_known_errors(self, error, expected):
+        """Test each known error is recognised case-insensitively."""
+        assert expected in message_module._format_error_message(error)
+
+    def test_priority_not_position(self):
+        """Test the higher-priority error wins regardless of where it appears."""
+        result = message_module._format_error_message("timeout hit a rate limit")
+
+        assert "Rate Limit Reached" in result
+
+
+class TestEstimateTextCost:
+    """Test the rate-limit cost estimate for text prompts."""
+
+    def test_keywords_raise_cost(self):
+        """Test complex requests cost more than plain ones of equal length."""
+        plain = message_module._estimate_text_processing_cost("look at this file")
+        complex_ = message_module._estimate_text_processing_cost("refactor this file")
+
+        assert complex_ > plain
+
+    @pytest.mark.parametrize(
+        "text,multiplier",
+        [
+            ("Refactoring needed", 1.5),
+            ("refactor and refactor", 1.5),
+            ("Create this and create that", 1.5),
+            ("analyze, debug and explain, then document it", 3.0),
+        ],
+    )
+    def test_keyword_multiplier(self, text, multiplier):
+        """Test each distinct keyword adds to the cost, up to a cap."""
+        estimate = message_module._estimate_text_processing_cost
+        base = 0.001 + len(text) * 0.00001
+
+        assert estimate(text) == pytest.approx(base * multiplier)
+
+    def test_repeated_prompt_cached(self):
+        """Test the same prompt is only scanned once."""
+        estimate = message_module._estimate_text_processing_cost
+        estimate.cache_clear()
+
+        first = estimate("continue")
+        second = estimate("continue")
+
+        assert first == second
+        assert estimate.cache_info().hits == 1
+
+
+class TestPlaceholderResponse:
+    """Test the placeholder reply chosen for a message."""
+
+    @pytest.mark.parametrize(
+        "text,expected",
+        [
+            ("Show me the files", "want to see files"),
+            ("please build an app", "want to create something"),
+            ("how does this work?", "I'm here to help"),
+            ("whatever, thanks", "I received your message"),
+        ],
+    )
+    async def test_intent_by_word(self, tmp_path, text, expected):
+        """Test the reply follows the first intent sharing a whole word."""
+        context = make_context(tmp_path, [])
+        context.user_data = {}
+
+        result = await message_module._generate_placeholder_response(text, context)
+
+        assert expected in result["text"]
+
+    async def test_default_preview_truncated(self, tmp_path):
+        """Test long unclassified messages are quoted up to 100 characters."""
+        context = make_context(tmp_path, [])
+        context.user_data = {}
+
+        result = await message_module._generate_placeholder_response(
+            "x" * 150, context
+        )
+
+        assert f'"{"x" * 100}..."' in result["text"]
+
+
+class TestGetFormatter:
+    """Test the formatter shared by the message handlers."""
+
+    def test_shared_through_bot_data(self, tmp_path):
+        """Test one response formatter is created and reused across requests."""
+        context = make_context(tmp_path, [])
+        settings = context.bot_data["settings"]
+
+        first = message_module._get_formatter(context, settings)
+
+        assert message_module._get_formatter(context, settings) is first
+        assert context.bot_data["response_formatter"] is first
+
+
+class TestHandlePhoto:
+    """Test photo uploads."""
+
+    async def test_unsupported_without_image_handler(self, tmp_path, update, sent):
+        """Test photos are declined when no image handler is configured."""
+        await message_module.handle_photo(update, make_context(tmp_path, []))
+
+        (reply,) = sent
+        assert reply.text == message_module._PHOTO_UNSUPPORTED_MSG
+        assert update.message.reply_text.await_args.kwargs["parse_mode"] == "Markdown"
@@ -0,0 +1,229 @@
+"""Tests for pinned status message formatting and management."""
+
+from pathlib import Path
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from src.bot.features.git_integration import GitError
+from src.bot.features.status_pin import (
+    PinnedMessageManager,
+    StatusFormatter,
+    get_pinned_message_manager,
+)
+
+
+@pytest.fixture
+def git_integration():
+    """Create a mock git integration with one changed file."""
+    git = Mock()
+    git.get_full_status = AsyncMock(
+        return_value=(Mock(branch="main"), [("a.py", 3, 1), ("b.py", 2, 0)])
+    )
+    return git
+
+
+class TestStatusFormatter:
+    """Test compact status formatting."""
+
+    @pytest.mark.parametrize(
+        "branch,expected",
+        [
+            ("main", "main"),
+            ("feature/login", "feat/login"),
+            ("feature/authentication", "feat/auth..."),
+            ("release/v1.2.3", "rel/v1.2.3"),
+            ("team/area/fix-it", ".../fix-it"),
+            ("averyveryverylongbranch", "averyvery..."),
+        ],
+    )
+    def test_shorten_branch(self, branch, expected):
+        """Test branch names are shortened to fit the display."""
+        assert StatusFormatter._shorten_branch(branch) == expected
+
+    def test_file_lines(self):
+        """Test changed files are listed, shortened and capped."""
+        long_name = "src/" + "x" * 50 + ".py"
+        changed = [(long_name, 1, 2)] + [(f"f{i}.py", i, 0) for i in range(24)]
+
+        text = StatusFormatter.format_compact_status(
+            "🟢", "main", 1, 2, Path("/p"), Path("/p"), changed
+        )
+        lines = text.split("\n")
+
+        assert lines[1] == "..." + long_name[-37:] + " +1/-2"
+        assert lines[2] == "f0.py +0/-0"
+        assert len(lines) == 22
+        assert lines[-1] == "... and 5 more files"
+
+
+class TestGitStats:
+    """Test git stats collection for the pinned message."""
+
+    async def test_collects_stats(self, git_integration):
+        """Test branch, diff totals and files are returned together."""
+        manager = PinnedMessageManager(git_integration=git_integration)
+
+        stats = await manager._get_git_stats(Path("/repo"))
+
+        assert stats == ("main", 5, 1, [("a.py", 3, 1), ("b.py", 2, 0)])
+
+    async def test_repeat_calls_use_cache(self, git_integration):
+        """Test back-to-back updates for a repo share one round of git calls."""
+        manager = PinnedMessageManager(git_integration=git_integration)
+
+        await manager._get_git_stats(Path("/repo"))
+        await manager._get_git_stats(Path("/repo"))
+
+        assert git_integration.get_full_status.await_count == 1
+
+    async def test_cache_expires(self, git_integration):
+        """Test stats are refreshed once the TTL has passed."""
+        manager = PinnedMessageManager(git_integration=git_integration)
+        manager.GIT_STATS_TTL_SECONDS = 0
+
+        await manager._get_git_stats(Path("/repo"))
+        await manager._get_git_stats(Path("/repo"))
+
+        assert git_integration.get_full_status.await_count == 2
+
+    async def test_expired_entries_pruned(self, git_integration):
+        """Test stale stats for other repos are dropped on insert."""
+        manager = PinnedMessageManager(git_integration=git_integration)
+        manager.GIT_STATS_TTL_SECONDS = 0
+
+        await manager._get_git_stats(Path("/repo1"))
+        await manager._get_git_stats(Path("/repo2"))
+
+        assert [path for path, _ in manager._git_cache] == [Path("/repo2")]
+
+    async def test_git_state_change_bypasses_cache(self, git_integration, tmp_path):
+        """Test a changed HEAD or index is not served stale stats."""
+        (tmp_path / ".git").mkdir()
+        head = tmp_path / ".git" / "HEAD"
+        head.write_text("ref: refs/heads/main\n")
+        subdir = tmp_path / "src"
+        subdir.mkdir()
+        manager = PinnedMessageManager(git_integration=git_integration)
+
+        await manager._get_git_stats(subdir)
+        (tmp_path / ".git" / "index").write_bytes(b"")
+        await manager._get_git_stats(subdir)
+
+        assert git_integration.get_full_status.await_count == 2
+
+    async def test_not_a_repo(self, git_integration):
+        """Test git errors produce empty stats."""
+        git_integration.get_full_status.side_effect = GitError("not a git repository")
+        manager = PinnedMessageManager(git_integration=git_integration)
+
+        assert await manager._get_git_stats(Path("/repo")) == (None,) * 4
+
+    async def test_without_git_integration(self):
+        """Test missing git integration produces empty stats."""
+        manager = PinnedMessageManager()
+
+        assert await manager._get_git_stats(Path("/repo")) == (None,) * 4
+
+
+class TestGetPinnedMessageManager:
+    """Test lookup of the shared pinned message manager."""
+
+    def test_uses_registry_instance(self):
+        """Test the feature registry's manager is returned."""
+        manager = PinnedMessageManager()
+        features = Mock()
+        features.get_pinned_message_manager.return_value = manager
+        context = Mock(bot_data={"features": features})
+
+        assert get_pinned_message_manager(context) is manager
+
+    def test_fallback_is_shared(self):
+        """Test one fallback manager is reused without a registry."""
+        context = Mock(bot_data={})
+
+        first = get_pinned_message_manager(context)
+
+        assert get_pinned_message_manager(context) is first
+
+
+class TestUpdateLocks:
+    """Test per-topic update locks."""
+
+    def test_lock_per_context_key(self):
+        """Test each topic gets its own lock, reused across calls."""
+        manager = PinnedMessageManager()
+
+        lock_a = manager._get_lock("1")
+
+        assert manager._get_lock("1") is lock_a
+        assert manager._get_lock("1:5") is not lock_a
+
+    async def test_idle_locks_pruned(self, monkeypatch):
+        """Test idle locks are dropped once the limit is exceeded."""
+        monkeypatch.setattr(PinnedMessageManager, "MAX_LOCKS", 2)
+        manager = PinnedMessageManager()
+        busy = manager._get_lock("busy")
+        manager._get_lock("idle1")
+        manager._get_lock("idle2")
+
+        async with busy:
+            manager._get_lock("new")
+
+        assert set(manager._locks) == {"busy", "new"}
+
+
+class TestUpdateStatus:
+    """Test pinned status message updates."""
+
+    @pytest.fixture
+    def context(self):
+        """Create a bot context with an existing pinned message."""
+        ctx = Mock()
+        ctx.chat_data = {"topic_states": {"1": {"pinned_message_id": 42}}}
+        ctx.bot.edit_message_text = AsyncMock()
+        return ctx
+
+    @pytest.fixture
+    def settings(self):
+        """Create settings without the web app configured."""
+        return Mock(
+            approved_directory=Path("/p"),
+            webapp_base_url=None,
+            diff_viewer_secret_str=None,
+        )
+
+    async def update(self, context, settings, status="ready"):
+        """Run update_status for topic "1"."""
+        await PinnedMessageManager().update_status(
+            chat=Mock(id=1),
+            context=context,
+            context_key="1",
+            current_path=Path("/p"),
+            settings=settings,
+            status=status,
+        )
+
+    async def test_unchanged_text_not_edited(self, context, settings):
+        """Test a repeated status does not call Telegram again."""
+        await self.update(context, settings)
+        await self.update(context, settings)
+
+        assert context.bot.edit_message_text.await_count == 1
+
+    async def test_changed_text_edited(self, context, settings):
+        """Test a different status is sent."""
+        await self.update(context, settings)
+        await self.update(context, settings, status="processing")
+
+        assert context.bot.edit_message_text.await_count == 2
+
+    async def test_unchanged_text_refreshed_after_interval(self, context, settings):
+        """Test an old pinned message is re-sent to refresh its diff link."""
+        await self.update(context, settings)
+        state = context.chat_data["topic_states"]["1"]
+        state["pinned_message_sent_at"] -= PinnedMessageManager.REFRESH_INTERVAL_SECONDS
+
+        await self.update(context, settings)
+
+        assert context.bot.edit_message_text.await_count == 2
@@ -0,0 +1,71 @@
+"""Tests for the forum topic creation conversation."""
+
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from telegram.error import BadRequest
+from telegram.ext import ConversationHandler
+
+from src.bot.handlers.topic_creation import (
+    WAITING_FOR_TOPIC_NAME,
+    CreateTopicHandler,
+)
+
+
+@pytest.fixture
+def update():
+    """Create a mock update carrying a topic name."""
+    upd = Mock()
+    upd.effective_chat.id = -100
+    upd.message.reply_text = AsyncMock()
+    return upd
+
+
+@pytest.fixture
+def context():
+    """Create a mock context whose bot creates topics."""
+    ctx = Mock()
+    ctx.bot.create_forum_topic = AsyncMock(return_value=Mock(message_thread_id=7))
+    ctx.bot.send_message = AsyncMock()
+    return ctx
+
+
+class TestHandleTopicName:
+    """Test validating the name and creating the topic."""
+
+    async def test_name_stripped(self, update, context):
+        """Test surrounding whitespace is not part of the topic name."""
+        update.message.text = "  Project Alpha \n"
+
+        state = await CreateTopicHandler.handle_topic_name(update, context)
+
+        assert state == ConversationHandler.END
+        kwargs = context.bot.create_forum_topic.await_args.kwargs
+        assert kwargs["name"] == "Project Alpha"
+
+    @pytest.mark.parametrize("name", [" " * 129, "x" * 129])
+    async def test_invalid_name_asks_again(self, update, context, name):
+        """Test blank or overlong names are rejected before calling Telegram."""
+        update.message.text = name
+
+        state = await CreateTopicHandler.handle_topic_name(update, context)
+
+        assert state == WAITING_FOR_TOPIC_NAME
+        context.bot.create_forum_topic.assert_not_awaited()
+
+    @pytest.mark.parametrize(
+        "error,expected",
+        [
+            ("Not enough rights to create a topic", "Permission Error"),
+            ("Chat is not a forum", "Topics Not Enabled"),
+            ("Something else", "Failed to create topic: Something else"),
+        ],
+    )
+    async def test_failure_reply(self, update, context, error, expected):
+        """Test known failures get a specific explanation."""
+        update.message.text = "Project Alpha"
+        context.bot.create_forum_topic.side_effect = BadRequest(error)
+
+        await CreateTopicHandler.handle_topic_name(update, context)
+
+        assert expected in update.message.reply_text.await_args.args[0]
@@ -0,0 +1,496 @@
+"""Tests for the Claude Agent SDK client."""
+
+import asyncio
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from claude_agent_sdk import (
+    AssistantMessage,
+    CLIConnectionError,
+    ResultMessage,
+    TextBlock,
+    ToolResultBlock,
+    ToolUseBlock,
+    UserMessage,
+)
+
+from src.claude.agent import ClaudeAgentClient
+from src.claude.types import StreamUpdate
+from src.config import create_test_config
+
+
+class FakeSDKClient:
+    """ClaudeSDKClient stand-in that records its options and replies with
+    the messages in ``replies``."""
+
+    instances = []
+    replies = []
+    received = 0
+    connect_error = None
+    query_error = None
+
+    def __init__(self, options):
+        self.options = options
+        self.queries = []
+        self.connected = False
+        FakeSDKClient.instances.append(self)
+
+    async def __aenter__(self):
+        if self.connect_error:
+            raise self.connect_error
+        self.connected = True
+        return self
+
+    async def __aexit__(self, *exc):
+        self.connected = False
+        return False
+
+    async def query(self, message):
+        if self.query_error:
+            raise self.query_error
+        self.queries.append(message)
+
+    async def receive_messages(self):
+        for reply in self.replies:
+            if isinstance(reply, Exception):
+                raise reply
+            FakeSDKClient.received += 1
+            yield reply
+
+
+@pytest.fixture
+def sdk_client():
+    """Patch the SDK client and return the instances it creates."""
+    FakeSDKClient.instances = []
+    FakeSDKClient.replies = []
+    FakeSDKClient.received = 0
+    FakeSDKClient.connect_error = None
+    FakeSDKClient.query_error = None
+    with patch("src.claude.agent.ClaudeSDKClient", FakeSDKClient):
+        yield FakeSDKClient.instances
+
+
+async def run(client, **kwargs):
+    """Drain stream_message and return its updates."""
+    return [
+        update
+        async for update in client.stream_message(
+            message="hi", session_id="s1", working_directory=Path("/p"), **kwargs
+        )
+    ]
+
+
+class TestStreamMessage:
+    """Test how messages are sent through the SDK."""
+
+    async def test_system_prompt_appended_to_preset(self, tmp_path, sdk_client):
+        """Test fixed instructions extend the Claude Code system prompt."""
+        client = ClaudeAgentClient(create_test_config(approved_directory=str(tmp_path)))
+
+        await run(client, system_prompt="Be brief.")
+
+        assert sdk_client[0].options.system_prompt == {
+            "type": "preset",
+            "preset": "claude_code",
+            "append": "Be brief.",
+        }
+        assert sdk_client[0].queries == ["hi"]
+
+    async def test_default_system_prompt(self, tmp_path, sdk_client):
+        """Test no system prompt is set unless one is given."""
+        client = ClaudeAgentClient(create_test_config(approved_directory=str(tmp_path)))
+
+        await run(client)
+
+        assert sdk_client[0].options.system_prompt is None
+
+
+def assistant(*blocks):
+    """Create an assistant message with the given content blocks."""
+    return AssistantMessage(content=list(blocks), model="claude")
+
+
+def result():
+    """Create a successful final result message."""
+    return ResultMessage(
+        subtype="success",
+        duration_ms=1,
+        duration_api_ms=1,
+        is_error=False,
+        num_turns=1,
+        session_id="s1",
+    )
+
+
+def emitted(updates):
+    """Summarize the text and tool calls in a list of updates."""
+    return [
+        u.content if u.content else u.tool_calls[0]["id"]
+        for u in updates
+        if u.type == "assistant"
+    ]
+
+
+class TestReplay:
+    """Test blocks delivered more than once are only streamed once."""
+
+    async def test_growing_text_streams_deltas(self, tmp_path, sdk_client):
+        """Test a text block re-sent with more text yields only the new part."""
+        FakeSDKClient.replies = [
+            assistant(TextBlock("Look")),
+            assistant(TextBlock("Looking")),
+            result(),
+        ]
+        client = ClaudeAgentClient(create_test_config(approved_directory=str(tmp_path)))
+
+        assert emitted(await run(client)) == ["Look", "ing"]
+
+    async def test_long_text_streams_deltas(self, tmp_path, sdk_client):
+        """Test text longer than the remembered tail still streams deltas."""
+        first = "x" * 100 + "y" * 100
+        FakeSDKClient.replies = [
+            assistant(TextBlock(first)),
+            assistant(TextBlock(first + "z")),
+            assistant(TextBlock("x" * 300)),
+            result(),
+        ]
+        client = ClaudeAgentClient(create_test_config(approved_directory=str(tmp_path)))
+
+        assert emitted(await run(client)) == [first, "z", "x" * 300]
+
+    async def test_replayed_history_skipped(self, tmp_path, sdk_client):
+        """Test earlier text and tool calls are not sent again."""
+        tool = ToolUseBlock(id="t1", name="Read", input={})
+        FakeSDKClient.replies = [
+            assistant(TextBlock("A"), tool),
+            assistant(TextBlock("A"), tool, TextBlock("B")),
+            result(),
+        ]
+        client = ClaudeAgentClient(create_test_config(approved_directory=str(tmp_path)))
+
+        assert emitted(await run(client)) == ["A", "t1", "B"]
+
+    async def test_separate_text_blocks_kept(self, tmp_path, sdk_client):
+        """Test a new text block that does not extend the last one is sent."""
+        FakeSDKClient.replies = [
+            assistant(TextBlock("First")),
+            assistant(TextBlock("Second")),
+            result(),
+        ]
+        client = ClaudeAgentClient(create_test_config(approved_directory=str(tmp_path)))
+
+        assert emitted(await run(client)) == ["First", "Second"]
+
+    async def test_next_turn_not_skipped(self, tmp_path, sdk_client):
+        """Test a later turn in the session streams all of its new blocks."""
+        client = ClaudeAgentClient(create_test_config(approved_directory=str(tmp_path)))
+        FakeSDKClient.replies = [
+            assistant(TextBlock("A"), ToolUseBlock(id="t1", name="Read", input={})),
+            result(),
+        ]
+        await run(client)
+
+        FakeSDKClient.replies = [
+            assistant(ToolUseBlock(id="t2", name="Bash", input={})),
+            result(),
+        ]
+
+        assert emitted(await run(client)) == ["t2"]
+
+    async def test_text_after_tool_message_kept(self, tmp_path, sdk_client):
+        """Test text in its own message after a tool call is a new segment."""
+        FakeSDKClient.replies = [
+            assistant(TextBlock("Running the tests.")),
+            assistant(ToolUseBlock(id="t1", name="Bash", input={})),
+            assistant(TextBlock("Running the tests.")),
+            assistant(TextBlock("Running the tests. All pass.")),
+            result(),
+        ]
+        client = ClaudeAgentClient(create_test_config(approved_directory=str(tmp_path)))
+
+        assert emitted(await run(client)) == [
+            "Running the tests.",
+            "t1",
+            "Running the tests.",
+            " All pass.",
+        ]
+
+    async def test_repeated_reply_in_next_turn_kept(self, tmp_path, sdk_client):
+        """Test a turn replying with the same text as the last one sends it."""
+        client = ClaudeAgentClient(create_test_config(approved_directory=str(tmp_path)))
+        FakeSDKClient.replies = [assistant(TextBlock("Done.")), result()]
+        await run(client)
+
+        assert emitted(await run(client)) == ["Done."]
+
+    async def test_same_text_around_tool_kept(self, tmp_path, sdk_client):
+        """Test the same text before and after a tool call is sent twice."""
+        tool = ToolUseBlock(id="t1", name="Read", input={})
+        FakeSDKClient.replies = [
+            assistant(TextBlock("Checking."), tool, TextBlock("Checking.")),
+            assistant(TextBlock("Checking."), tool, TextBlock("Checking.")),
+            result(),
+        ]
+        client = ClaudeAgentClient(create_test_config(approved_directory=str(tmp_path)))
+
+        assert emitted(await run(client)) == ["Checking.", "t1", "Checking."]
+
+
+class TestCoalescing:
+    """Test text deltas are batched into as few updates as possible."""
+
+    async def test_text_blocks_in_one_message_joined(self, tmp_path, sdk_client):
+        """Test consecutive text in a message arrives as one update."""
+        FakeSDKClient.replies = [
+            assistant(TextBlock("One. "), TextBlock("Two.")),
+            result(),
+        ]
+        client = ClaudeAgentClient(create_test_config(approved_directory=str(tmp_path)))
+
+        assert emitted(await run(client)) == ["One. Two."]
+
+    async def test_tool_call_flushes_text(self, tmp_path, sdk_client):
+        """Test text before a tool call is sent before the call."""
+        FakeSDKClient.replies = [
+            assistant(
+                TextBlock("Reading."),
+                ToolUseBlock(id="t1", name="Read", input={}),
+                TextBlock("Done."),
+            ),
+            result(),
+        ]
+        client = ClaudeAgentClient(create_test_config(approved_directory=str(tmp_path)))
+
+        assert emitted(await run(client)) == ["Reading.", "t1", "Done."]
+
+
+class TestToolResults:
+    """Test tool results reported in user messages."""
+
+    async def test_results_collected(self, tmp_path, sdk_client):
+        """Test the results in a user message arrive as one update."""
+        FakeSDKClient.replies = [
+            UserMessage(content="hi"),
+            UserMessage(
+                content=[
+                    ToolResultBlock(tool_use_id="t1", is_error=False),
+                    TextBlock("note"),
+                    ToolResultBlock(tool_use_id="t2", is_error=True),
+                ]
+            ),
+            result(),
+        ]
+        client = ClaudeAgentClient(create_test_config(approved_directory=str(tmp_path)))
+
+        updates = [u for u in await run(client) if u.type == "tool_result"]
+
+        assert len(updates) == 1
+        assert updates[0].tool_calls == [
+            {"tool_use_id": "t1", "is_error": False},
+            {"tool_use_id": "t2", "is_error": True},
+        ]
+
+
+class TestReadAhead:
+    """Test the SDK is read in the background with bounded read-ahead."""
+
+    async def test_read_ahead_bounded(self, tmp_path, sdk_client, monkeypatch):
+        """Test reading pauses once the queue is full."""
+        monkeypatch.setattr("src.claude.agent.STREAM_QUEUE_SIZE", 2)
+        FakeSDKClient.replies = [
+            assistant(ToolUseBlock(id=f"t{i}", name="Read", input={}))
+            for i in range(10)
+        ]
+        client = ClaudeAgentClient(create_test_config(approved_directory=str(tmp_path)))
+        stream = client.stream_message(
+            message="hi", session_id="s1", working_directory=Path("/p")
+        )
+
+        await anext(stream)  # Starting progress
+        await anext(stream)
+        await asyncio.sleep(0.01)
+        await stream.aclose()
+
+        assert FakeSDKClient.received < 10
+
+    async def test_read_error_reported(self, tmp_path, sdk_client):
+        """Test a failure while reading ends the stream with an error update."""
+        FakeSDKClient.replies = [
+            assistant(TextBlock("Hi")),
+            RuntimeError("connection lost"),
+        ]
+        client = ClaudeAgentClient(create_test_config(approved_directory=str(tmp_path)))
+
+        updates = await run(client)
+
+        assert emitted(updates) == ["Hi"]
+        assert updates[-1].type == "error"
+        assert updates[-1].content == "connection lost"
+
+
+    @pytest.mark.parametrize("stage", ["connect_error", "query_error"])
+    async def test_connection_error_reported(self, tmp_path, sdk_client, stage):
+        """Test failing to connect or send ends the stream with an error."""
+        setattr(FakeSDKClient, stage, CLIConnectionError("CLI not ready"))
+        client = ClaudeAgentClient(create_test_config(approved_directory=str(tmp_path)))
+
+        updates = await run(client)
+
+        assert [(u.type, u.content) for u in updates] == [
+            ("progress", "Starting Claude Agent..."),
+            ("error", "CLI not ready"),
+        ]
+        assert not sdk_client[0].connected
+
+
+class TestSessionStates:
+    """Test replay state is only kept for recently used sessions."""
+
+    async def test_least_recently_used_dropped(self, tmp_path, monkeypatch):
+        """Test the oldest session's state is evicted past the limit."""
+        monkeypatch.setattr("src.claude.agent.MAX_SESSION_STATES", 2)
+        client = ClaudeAgentClient(create_test_config(approved_directory=str(tmp_path)))
+
+        first = client._get_session_state("a")
+        client._get_session_state("b")
+        assert client._get_session_state("a") is first
+        client._get_session_state("c")
+
+        assert list(client.session_states) == ["a", "c"]
+
+
+class TestClientPool:
+    """Test SDK clients are kept connected between turns of a session."""
+
+    @pytest.fixture
+    def client(self, tmp_path, sdk_client):
+        """Create a client whose turns each end with a result."""
+        FakeSDKClient.replies = [assistant(TextBlock("ok")), result()]
+        return ClaudeAgentClient(create_test_config(approved_directory=str(tmp_path)))
+
+    async def test_session_reuses_client(self, client, sdk_client):
+        """Test later turns of a session are sent through the same client."""
+        await run(client)
+        await run(client)
+
+        assert len(sdk_client) == 1
+        assert sdk_client[0].queries == ["hi", "hi"]
+        assert sdk_client[0].connected
+
+    @pytest.mark.parametrize(
+        "kwargs",
+        [
+            {"session_id": "s2"},
+            {"working_directory": Path("/other")},
+            {"restart": True},
+        ],
+    )
+    async def test_new_client_when_options_change(self, client, sdk_client, kwargs):
+        """Test a different session or directory gets its own client."""
+        await run(client)
+        params = {"session_id": "s1", "working_directory": Path("/p"), **kwargs}
+
+        async for _ in client.stream_message(message="hi", **params):
+            pass
+
+        assert len(sdk_client) == 2
+
+    async def test_system_prompt_does_not_split_session(self, client, sdk_client):
+        """Test turns with another system prompt still share the session."""
+        await run(client)
+        await run(client, system_prompt="Be brief.")
+
+        assert len(sdk_client) == 1
+        assert sdk_client[0].queries == ["hi", "hi"]
+
+    async def test_concurrent_turns_share_connection(self, client, sdk_client):
+        """Test turns starting together for one session connect only once."""
+        await asyncio.gather(run(client), run(client))
+
+        assert len(sdk_client) == 1
+        assert sdk_client[0].queries == ["hi", "hi"]
+        assert not client._connecting
+
+    async def test_unfinished_turn_disconnects(self, client, sdk_client):
+        """Test a turn abandoned before its result does not leak into the next."""
+        stream = client.stream_message(
+            message="hi", session_id="s1", working_directory=Path("/p")
+        )
+        await anext(stream)  # Starting progress
+        await anext(stream)
+        await stream.aclose()
+
+        await run(client)
+
+        assert not sdk_client[0].connected
+        assert len(sdk_client) == 2
+
+    async def test_idle_client_disconnected(self, client, sdk_client, monkeypatch):
+        """Test a client unused past the idle timeout is replaced."""
+        monkeypatch.setattr("src.claude.agent.CLIENT_IDLE_TIMEOUT", -1)
+
+        await run(client)
+        await run(client)
+
+        assert not sdk_client[0].connected
+        assert len(sdk_client) == 2
+
+    async def test_pool_bounded(self, client, sdk_client, monkeypatch):
+        """Test the least recently used client is dropped past the limit."""
+        monkeypatch.setattr("src.claude.agent.MAX_POOLED_CLIENTS", 1)
+
+        await run(client)
+        async for _ in client.stream_message(
+            message="hi", session_id="s2", working_directory=Path("/p")
+        ):
+            pass
+
+        assert [c.connected for c in sdk_client] == [False, True]
+
+    async def test_close_disconnects_all(self, client, sdk_client):
+        """Test closing the client disconnects every pooled client."""
+        await run(client)
+
+        await client.close()
+
+        assert not sdk_client[0].connected
+
+
+class TestProgress:
+    """Test the progress shown when a turn starts."""
+
+    async def test_progress_before_connecting(self, tmp_path, sdk_client):
+        """Test the first update arrives before the SDK is connected."""
+        client = ClaudeAgentClient(create_test_config(approved_directory=str(tmp_path)))
+        stream = client.stream_message(
+            message="hi", session_id="s1", working_directory=Path("/p")
+        )
+
+        first = await anext(stream)
+        await stream.aclose()
+
+        assert first.type == "progress"
+        assert sdk_client == []
+
+
+class TestFixedUpdates:
+    """Test the updates shared between streams."""
+
+    async def test_progress_and_result_shared(self, tmp_path, sdk_client):
+        """Test every stream starts and ends with the same update objects."""
+        FakeSDKClient.replies = [result()]
+        client = ClaudeAgentClient(create_test_config(approved_directory=str(tmp_path)))
+
+        first = await run(client)
+        second = await run(client)
+
+        assert first == second
+        assert all(a is b for a, b in zip(first, second))
+
+    def test_updates_immutable(self):
+        """Test a shared update cannot be changed by one of its consumers."""
+        update = StreamUpdate(type="assistant", content="hi")
+
+        with pytest.raises(AttributeError):
+            update.content = "changed"
@@ -0,0 +1,43 @@
+"""Tests for the cache of Claude responses."""
+
+from unittest.mock import patch
+
+from src.claude.response_cache import ResponseCache
+
+
+class TestResponseCache:
+    """Test caching of responses by prompt."""
+
+    def test_hit(self):
+        """Test a cached response is returned for the same prompt."""
+        cache = ResponseCache(ttl_seconds=60)
+        cache.put("u1", "review a.py", "looks good")
+
+        assert cache.get("u1", "review a.py") == "looks good"
+        assert cache.get("u1", "review b.py") is None
+
+    def test_namespaces_are_separate(self):
+        """Test the same prompt in another namespace misses."""
+        cache = ResponseCache(ttl_seconds=60)
+        cache.put("u1", "review a.py", "looks good")
+
+        assert cache.get("u2", "review a.py") is None
+
+    def test_expiry(self):
+        """Test responses expire after the TTL."""
+        cache = ResponseCache(ttl_seconds=60)
+        with patch("src.claude.response_cache.time.monotonic", return_value=0):
+            cache.put("u1", "p", "r")
+        with patch("src.claude.response_cache.time.monotonic", return_value=60):
+            assert cache.get("u1", "p") is None
+
+    def test_least_recently_used_evicted(self):
+        """Test the oldest unused entry is dropped when full."""
+        cache = ResponseCache(ttl_seconds=60, maxsize=2)
+        cache.put("u1", "a", "A")
+        cache.put("u1", "b", "B")
+        cache.get("u1", "a")
+        cache.put("u1", "c", "C")
+
+        assert cache.get("u1", "a") == "A"
+        assert cache.get("u1", "b") is None
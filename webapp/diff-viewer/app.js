@@ -20,6 +20,9 @@ const tg = window.Telegram.WebApp;
     const branchNameEl = document.getElementById('branch-name');
     const repoPathEl = document.getElementById('repo-path');
 
+    // Starts the line the server appends when git fails mid-diff
+    const DIFF_ERROR_MARKER = 'Diff incomplete, git error:';
+
     // Get token from URL
     const urlParams = new URLSearchParams(window.location.search);
     const token = urlParams.get('token');
@@ -43,27 +46,38 @@ const tg = window.Telegram.WebApp;
                 throw new Error(errorData.detail || `HTTP ${response.status}: ${response.statusText}`);
             }
 
-            const data = await response.json();
+            // Branch and repo path arrive as headers; the body is the raw diff
+            const branch = response.headers.get('X-Git-Branch');
+            const repoPath = response.headers.get('X-Repo-Path');
 
             // Update header info
-            if (data.branch) {
-                branchNameEl.textContent = data.branch;
+            if (branch) {
+                branchNameEl.textContent = decodeURIComponent(branch);
             }
-            if (data.repo_path) {
-                repoPathEl.textContent = shortenPath(data.repo_path);
+            if (repoPath) {
+                repoPathEl.textContent = shortenPath(decodeURIComponent(repoPath));
             }
 
+            const diffText = await response.text();
+
             // Hide loading
             loadingEl.classList.add('hidden');
 
+            // A git failure after the diff started is appended to the body
+            const errorAt = diffText.lastIndexOf('\n' + DIFF_ERROR_MARKER);
+            if (errorAt !== -1) {
+                showError(diffText.slice(errorAt + 1).trim());
+                return;
+            }
+
             // Check if there are changes
-            if (!data.diff || data.diff === 'No changes to show') {
+            if (!diffText.trim() || diffText === 'No changes to show') {
                 showEmptyState();
                 return;
             }
 
             // Render diff
-            renderDiff(data.diff);
+            renderDiff(diffText);
 
         } catch (error) {
             console.error('Error fetching diff:', error);